@@ -0,0 +1,169 @@
+"""
+Ejecución sin interfaz gráfica (servidor, tareas programadas, benchmarks).
+
+    python -m app.cli --entrada data/input --salida data/output --ocr --workers 4 --json resumen.json
+
+Usa exactamente el mismo pipeline que el botón "INICIAR PROCESAMIENTO".
+
+Código de salida (para scripts y cron): 0 todo guardado, 1 hubo errores,
+2 carpeta de entrada inexistente o argumentos inválidos, 3 sin errores pero
+con documentos esperando en Revision_Manual.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from app.core.pipeline import PipelineLotes
+from app.core.vigilante import VigilanteCarpeta
+from app.utils.logger import exportar_historial_csv
+from app.config import (DEFAULT_INPUT_DIR, DEFAULT_OUTPUT_DIR, TITULO_APP, VERSION_ACTUAL,
+                        PIPELINE_WORKERS_DIVISION, PIPELINE_WORKERS_ANALISIS, PIPELINE_TAM_COLA,
+                        PIPELINE_DIVIDIR_LOTES,
+                        METRICAS_INFORME_PATH, PERFIL_UMBRAL_S, PERFIL_DIR)
+
+# Códigos de salida
+SALIDA_OK = 0
+SALIDA_ERRORES = 1
+SALIDA_ENTRADA = 2  # Como argparse con argumentos inválidos
+SALIDA_REVISION = 3
+
+
+def construir_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli",
+                                     description=f"{TITULO_APP} {VERSION_ACTUAL} - procesamiento por lotes sin GUI",
+                                     epilog=f"Código de salida: {SALIDA_OK} todo guardado, {SALIDA_ERRORES} errores, "
+                                            f"{SALIDA_ENTRADA} entrada inválida, {SALIDA_REVISION} documentos "
+                                            f"pendientes en Revision_Manual.")
+    parser.add_argument("--entrada", default=DEFAULT_INPUT_DIR, help="Carpeta con los PDFs a procesar")
+    parser.add_argument("--salida", default=DEFAULT_OUTPUT_DIR, help="Carpeta base de destino")
+    parser.add_argument("--ocr", action="store_true",
+                        help="Habilitar OCR en las páginas sin texto nativo fiable")
+    parser.add_argument("--workers", type=int, default=PIPELINE_WORKERS_DIVISION,
+                        help="Hilos para las etapas de división y extracción")
+    parser.add_argument("--workers-analisis", type=int, default=PIPELINE_WORKERS_ANALISIS,
+                        help="Hilos para la etapa de análisis")
+    parser.add_argument("--cola", type=int, default=PIPELINE_TAM_COLA, help="Tamaño de las colas entre etapas")
+    parser.add_argument("--sin-dividir", dest="dividir", action="store_false", default=PIPELINE_DIVIDIR_LOTES,
+                        help="Cada PDF es un único documento: no se buscan cortes y se deja de leer "
+                             "en cuanto aparecen proveedor, Nº y fecha")
+    parser.add_argument("--json", dest="ruta_json", help="Guardar el resumen JSON en este archivo")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="No terminar: procesar cada PDF nuevo que llegue a la carpeta de entrada "
+                             "(Ctrl+C para parar tras vaciar la cola)")
+    parser.add_argument("--reprocesar", action="store_true",
+                        help="Ignorar el diario y el índice de salida: procesar también los archivos "
+                             "ya terminados o ya guardados")
+    parser.add_argument("--silencioso", action="store_true", help="No mostrar el registro de eventos")
+    parser.add_argument("--informe", dest="ruta_informe", default=METRICAS_INFORME_PATH,
+                        help="Dónde guardar los tiempos por etapa y documento (p50/p95/máx)")
+    parser.add_argument("--perfilar", type=float, metavar="SEGUNDOS", default=PERFIL_UMBRAL_S,
+                        help=f"Guardar un perfil cProfile de cada etapa que tarde más de SEGUNDOS en {PERFIL_DIR}")
+    parser.add_argument("--exportar-historial", metavar="CSV",
+                        help="No procesa nada: vuelca el historial a este CSV (formato clásico)")
+    parser.add_argument("--proveedor", help="Con --exportar-historial: solo este proveedor")
+    parser.add_argument("--desde", help="Con --exportar-historial: desde esta fecha (YYYY-MM-DD)")
+    parser.add_argument("--hasta", help="Con --exportar-historial: hasta esta fecha (YYYY-MM-DD)")
+    return parser
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+
+    if args.exportar_historial:
+        filas = exportar_historial_csv(args.exportar_historial, proveedor=args.proveedor,
+                                       desde=args.desde, hasta=args.hasta)
+        print(f"📤 Historial exportado: {filas} filas -> {args.exportar_historial}", file=sys.stderr)
+        return SALIDA_OK
+
+    if not os.path.isdir(args.entrada):
+        print(f"❌ Error: Comprueba la carpeta de origen, no existe: {args.entrada}", file=sys.stderr)
+        return SALIDA_ENTRADA
+
+    # El registro va a stderr para dejar stdout limpio para el JSON
+    log = (lambda mensaje: None) if args.silencioso else (lambda mensaje: print(f">> {mensaje}", file=sys.stderr))
+
+    # Y los print de progreso del splitter, el OCR, el historial... también
+    with contextlib.redirect_stdout(sys.stderr):
+        resumen = _procesar(args, log)
+
+    duracion = resumen["duracion"]
+    informe = {
+        "entrada": os.path.abspath(args.entrada),
+        "salida": os.path.abspath(args.salida),
+        "ocr": args.ocr,
+        "workers": args.workers,
+        "dividir": args.dividir,
+        "archivos": resumen["archivos"],
+        "documentos": resumen["procesados"],
+        "errores": resumen["errores"],
+        "omitidos": resumen["omitidos"],
+        "duplicados": resumen["duplicados"],
+        "revision": resumen["revision"],
+        "duracion_s": round(duracion, 3),
+        "docs_por_segundo": round(resumen["procesados"] / duracion, 3) if duracion > 0 else None,
+        "tiempos_etapa_s": {etapa: round(t, 3) for etapa, t in resumen["tiempos_etapa"].items()},
+        "metricas_etapa": resumen["metricas"]["etapas"],
+        "rutas_paginas": resumen["rutas"],
+    }
+
+    log(f"🏁 Finalizado. Docs: {resumen['procesados']} | Errores: {resumen['errores']} | "
+        f"En revisión: {resumen['revision']}")
+    texto_json = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.ruta_json:
+        with open(args.ruta_json, "w", encoding="utf-8") as f:
+            f.write(texto_json)
+    print(texto_json)
+    if resumen["errores"]:
+        return SALIDA_ERRORES
+    if resumen["revision"]:
+        return SALIDA_REVISION
+    return SALIDA_OK
+
+
+def _procesar(args, log):
+    if args.vigilar:
+        vigilante = VigilanteCarpeta(args.entrada, log=log).iniciar()
+        _parar_con_senales(vigilante, log)
+        rutas = vigilante.rutas()
+        log("🚀 INICIO DE PROCESO | Modo vigilancia")
+    else:
+        archivos = sorted(f for f in os.listdir(args.entrada) if f.lower().endswith(".pdf"))
+        rutas = [os.path.join(args.entrada, f) for f in archivos]
+        log(f"🚀 INICIO DE PROCESO | Archivos: {len(rutas)}")
+
+    pipeline = PipelineLotes(
+        args.salida,
+        usar_ocr=args.ocr,
+        workers_division=args.workers,
+        workers_extraccion=args.workers,
+        workers_analisis=args.workers_analisis,
+        tam_cola=args.cola,
+        dividir=args.dividir,
+        log=log,
+        reanudar=not args.reprocesar,
+        filtrar_duplicados=not args.reprocesar,
+        ruta_informe=args.ruta_informe,
+        umbral_perfil=args.perfilar
+    )
+    return pipeline.ejecutar(rutas)
+
+
+def _parar_con_senales(vigilante, log):
+    """Ctrl+C / SIGTERM: cierre ordenado. Un segundo Ctrl+C corta en seco."""
+    def parar(signum, frame):
+        if vigilante.detenido:
+            raise KeyboardInterrupt
+        log("🛑 Parando: se termina lo que ya está en cola (Ctrl+C otra vez para salir ya)")
+        vigilante.detener()
+
+    signal.signal(signal.SIGINT, parar)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, parar)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
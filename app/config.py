@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 
 # ==========================================
@@ -19,6 +20,9 @@ else:
 # Archivo de base de datos
 PROVIDERS_JSON_PATH = os.path.join(BASE_DIR, "data", "proveedores.json")
 
+# Cada cuántos segundos, como máximo, se mira si proveedores.json ha cambiado (Hot-Swap)
+PROVIDERS_RELOAD_INTERVAL = 2.0
+
 # Carpetas de trabajo
 DEFAULT_INPUT_DIR = os.path.join(BASE_DIR, "data", "input")
 DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, "data", "output")
@@ -36,11 +40,124 @@ TESSERACT_CMD = os.path.join(BIN_DIR, "Tesseract-OCR", "tesseract.exe")
 POPPLER_PATH = os.path.join(BIN_DIR, "poppler", "Library", "bin")
 # ^^^ VERIFICA ESTA RUTA EN TU EXPLORADOR DE ARCHIVOS ^^^
 
+# Servidor Linux / sin carpeta 'bin': usamos los motores instalados en el sistema
+if not os.path.exists(TESSERACT_CMD) and shutil.which("tesseract"):
+    TESSERACT_CMD = shutil.which("tesseract")
+if not os.path.exists(POPPLER_PATH) and shutil.which("pdftoppm"):
+    POPPLER_PATH = os.path.dirname(shutil.which("pdftoppm"))
+
+# Motor de Tesseract (app/core/ocr_engine.py): "auto" usa tesserocr si está instalado
+# (Tesseract dentro de cada worker, el modelo se carga una sola vez) y si no
+# pytesseract (un proceso tesseract por lectura). "tesserocr" / "pytesseract" fuerzan uno.
+OCR_MOTOR = "auto"
+# Carpeta tessdata para tesserocr (None = la que trae compilada la librería)
+TESSDATA_DIR = os.path.join(os.path.dirname(TESSERACT_CMD), "tessdata")
+if not os.path.isdir(TESSDATA_DIR):
+    TESSDATA_DIR = None
+
+# Procesos en paralelo para el OCR de páginas (por defecto, todos los núcleos)
+OCR_WORKERS = os.cpu_count() or 1
+
+# Rasterizado de páginas para OCR: páginas preparadas por adelantado y
+# si se escriben en un temporal en vez de tenerlas en memoria
+RASTER_PREFETCH = 1
+RASTER_A_DISCO = False
+# Páginas contiguas por cada llamada a pdftoppm al pasar por OCR varias páginas
+# escaneadas. 1 = una página cada vez: la memoria no crece con el documento.
+# Más de 1 ahorra arranques de pdftoppm (cada llamada re-parsea el PDF entero),
+# pero el bloque entero se decodifica de golpe: con 8, hasta 8 páginas a
+# resolución completa en memoria por documento (≈4 MB cada una a 200 dpi en gris).
+RASTER_TAM_BLOQUE = 1
+
+# Escalera de OCR: primero una pasada barata y, solo donde no aparece lo necesario
+# (proveedor + Nº documento + fecha, o texto legible en páginas de continuación),
+# se vuelve a leer con el siguiente escalón. Cada escalón son cambios sobre la receta
+# base (PARAMETROS_OCR / PARAMETROS_OCR_SPLITTER). Se para en el primero que funciona y
+# el informe de la ejecución cuenta qué escalón resolvió cada página.
+OCR_ESCALERA = [
+    {"dpi": 150},  # 1. Pasada barata
+    {},  # 2. Receta base
+    {"dpi": 300},  # 3. Más resolución
+    {"dpi": 300, "psm": 11},  # 4. Otra segmentación (texto disperso)
+    {"dpi": 300, "umbral": 128},  # 5. Otro umbral: impresiones claras o tóner gastado
+]
+# Una página sin firma de proveedor (separador, continuación, proveedor desconocido)
+# no pasa de este escalón: los de 300 dpi son para leer la cabecera de un documento.
+# Tampoco sigue la que sale vacía o igual que en el escalón anterior.
+OCR_ESCALERA_MAX_SIN_PROVEEDOR = 2
+
+# OCR por regiones: primero la franja superior de la página (fracción de la altura)
+# y solo si faltan proveedor/Nº documento/fecha, el resto. Cada proveedor puede
+# ampliar su franja con la clave "roi_cabecera" en proveedores.json.
+OCR_ROI_ACTIVO = True
+OCR_ROI_CABECERA = 0.3
+
+# Caché persistente de resultados OCR (clave = contenido de la página + parámetros OCR)
+OCR_CACHE_ENABLED = True
+OCR_CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "ocr_cache.sqlite")
+OCR_CACHE_MAX_MB = 256
+
+# Diario de ejecuciones: qué archivos de entrada ya están terminados (por huella
+# de contenido) y qué documentos quedaron a medio mover, para reanudar tras un cierre
+DIARIO_ACTIVO = True
+DIARIO_PATH = os.path.join(BASE_DIR, "data", "cache", "diario.sqlite")
+
+# Índice de lo ya guardado en cada carpeta de salida (huella del contenido y
+# proveedor + Nº documento + fecha): los duplicados no se vuelven a procesar ni guardar
+INDICE_SALIDA_ACTIVO = True
+INDICE_SALIDA_PATH = os.path.join(BASE_DIR, "data", "cache", "indice_salida.sqlite")
+
+# Segundos que vale la lista en memoria de una carpeta de destino antes de
+# volver a leerla (en modo vigilancia cada tanda de escaneos la relee)
+DIRECTORIOS_VIGENCIA_S = 30
+
+# --- SPLITTER ---
+# Los fragmentos de un lote se escriben directamente en su destino final desde
+# memoria. Si el PDF del lote supera este tamaño, todos sus fragmentos pasan por
+# _TEMP_SPLIT (un fragmento en memoria retiene el lote entero, cargado por pypdf).
+FRAGMENTO_MAX_MEMORIA_MB = 50
+# False: cada PDF de entrada es un único documento (escáner que ya separa). No
+# hay cortes que buscar y se deja de leer en cuanto aparecen proveedor, Nº y fecha.
+PIPELINE_DIVIDIR_LOTES = True
+
+# Pipeline de lotes: hilos por etapa y tamaño de las colas entre etapas
+PIPELINE_WORKERS_DIVISION = 2
+PIPELINE_WORKERS_EXTRACCION = 2
+PIPELINE_WORKERS_ANALISIS = 1
+PIPELINE_TAM_COLA = 4
+
+# Modo vigilancia (python -m app.cli --vigilar): cada cuánto se mira la carpeta si no
+# hay inotify, segundos que un PDF debe estar sin cambios para darlo por escrito y
+# PDFs que pueden esperar en cola a que el pipeline los admita
+VIGILANCIA_INTERVALO = 1.0
+VIGILANCIA_ESPERA = 2.0
+VIGILANCIA_TAM_COLA = 16
+
 # Logs
 LOG_DIR = os.path.join(BASE_DIR, "data", "logs")
 
+# Métricas de cada ejecución (app/utils/metrics.py): informe JSON con tiempos por
+# etapa (p50/p95/máx) y por documento. PERFIL_UMBRAL_S en segundos activa cProfile
+# y guarda el perfil de cada documento más lento que eso (None = desactivado).
+METRICAS_INFORME_PATH = os.path.join(LOG_DIR, "ultima_ejecucion.json")
+METRICAS_MUESTRAS = 10000  # Muestras por etapa para los percentiles
+METRICAS_DOCUMENTOS = 1000  # Documentos con desglose en el informe (los más recientes)
+PERFIL_UMBRAL_S = None
+PERFIL_DIR = os.path.join(LOG_DIR, "perfiles")
+
+# Historial de procesos (SQLite). Los eventos se guardan por lotes desde un hilo
+# aparte; el CSV antiguo se importa la primera vez y se puede regenerar con exportar_csv.
+HISTORIAL_DB_PATH = os.path.join(LOG_DIR, "historial.sqlite")
+HISTORIAL_CSV_LEGADO = os.path.join(LOG_DIR, "historial_procesos.csv")
+HISTORIAL_LOTE = 200  # Filas por transacción
+HISTORIAL_INTERVALO = 0.5  # Segundos máximos que espera una fila antes de guardarse
+
 #Título APP
 TITULO_APP ="⚙️ Doc Engine"
 
 #Versión actual
-VERSION_ACTUAL = "v2.6 (OCR)"
\ No newline at end of file
+VERSION_ACTUAL = "v2.6 (OCR)"
+# Interfaz gráfica: cada cuántos ms se vuelcan a pantalla los eventos del
+# procesamiento y cuántas líneas como mucho guarda el registro de eventos
+GUI_REFRESCO_MS = 50
+GUI_MAX_LINEAS_LOG = 2000
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.config import DIARIO_ACTIVO, DIARIO_PATH
+
+# Estados de un archivo de entrada
+DIVIDIDO = "dividido"  # Fragmentos y textos guardados; quedan movimientos pendientes
+COMPLETADO = "completado"  # Todos sus documentos están en su carpeta final
+
+# Estados de un fragmento
+PENDIENTE = "pendiente"
+MOVIENDO = "moviendo"  # Destino reservado; el archivo puede estar o no escrito
+MOVIDO = "movido"
+
+
+def huella_archivo(ruta, tam_bloque=1024 * 1024):
+    """sha256 del contenido del PDF de entrada (el nombre no cuenta)."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class DiarioProcesos:
+    """
+    Diario persistente de ejecuciones (SQLite) para poder reanudar tras un cierre
+    o un fallo. Se indexa por huella del PDF de entrada + carpeta de salida:
+
+    - archivos: en qué punto está cada PDF de entrada (dividido / completado).
+    - fragmentos: cada documento cortado (rango de páginas), con su texto ya
+      extraído y el estado de su movimiento a la carpeta final.
+
+    El movimiento se anota en dos pasos (MOVIENDO con la ruta reservada y luego
+    MOVIDO), así al reanudar se sabe si un documento llegó a escribirse.
+    """
+
+    def __init__(self, ruta=DIARIO_PATH):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._con = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        with self._con:
+            self._con.execute("""CREATE TABLE IF NOT EXISTS archivos (
+                                     huella TEXT NOT NULL,
+                                     salida TEXT NOT NULL,
+                                     ruta TEXT,
+                                     estado TEXT NOT NULL,
+                                     ocr INTEGER NOT NULL DEFAULT 0,
+                                     actualizado REAL NOT NULL,
+                                     PRIMARY KEY (huella, salida))""")
+            self._con.execute("""CREATE TABLE IF NOT EXISTS fragmentos (
+                                     huella TEXT NOT NULL,
+                                     salida TEXT NOT NULL,
+                                     pagina_inicio INTEGER NOT NULL,
+                                     pagina_fin INTEGER NOT NULL,
+                                     proveedor TEXT,
+                                     textos TEXT NOT NULL,
+                                     metodos TEXT NOT NULL,
+                                     estado TEXT NOT NULL,
+                                     ruta_final TEXT,
+                                     PRIMARY KEY (huella, salida, pagina_inicio, pagina_fin))""")
+
+    @staticmethod
+    def _salida(carpeta_salida):
+        return os.path.normcase(os.path.abspath(carpeta_salida))
+
+    def archivo(self, huella, carpeta_salida):
+        """{"estado": ..., "ocr": bool} del archivo, o None si nunca se ha visto."""
+        with self._lock:
+            fila = self._con.execute("SELECT estado, ocr FROM archivos WHERE huella = ? AND salida = ?",
+                                     (huella, self._salida(carpeta_salida))).fetchone()
+        return {"estado": fila[0], "ocr": bool(fila[1])} if fila else None
+
+    def fragmentos(self, huella, carpeta_salida):
+        """Fragmentos anotados de un archivo, en orden de página, como lista de dict."""
+        with self._lock:
+            filas = self._con.execute(
+                """SELECT pagina_inicio, pagina_fin, proveedor, textos, metodos, estado, ruta_final
+                   FROM fragmentos WHERE huella = ? AND salida = ? ORDER BY pagina_inicio""",
+                (huella, self._salida(carpeta_salida))).fetchall()
+        return [{"pagina_inicio": ini, "pagina_fin": fin, "proveedor": prov,
+                 "textos": json.loads(textos), "metodos": json.loads(metodos),
+                 "estado": estado, "ruta_final": ruta_final}
+                for ini, fin, prov, textos, metodos, estado, ruta_final in filas]
+
+    def registrar_division(self, huella, carpeta_salida, ruta, fragmentos, ocr=False):
+        """
+        Anota el corte de un archivo (y el texto de cada página) en una sola transacción.
+        Si el archivo ya se había cortado antes (ej: ahora con OCR), los documentos
+        con el mismo rango de páginas conservan su estado de movimiento.
+        """
+        salida = self._salida(carpeta_salida)
+        with self._lock, self._con:
+            previos = {(ini, fin): (estado, ruta_final) for ini, fin, estado, ruta_final in self._con.execute(
+                """SELECT pagina_inicio, pagina_fin, estado, ruta_final FROM fragmentos
+                   WHERE huella = ? AND salida = ?""", (huella, salida))}
+            self._con.execute("DELETE FROM fragmentos WHERE huella = ? AND salida = ?", (huella, salida))
+            self._con.executemany(
+                """INSERT INTO fragmentos (huella, salida, pagina_inicio, pagina_fin, proveedor,
+                                           textos, metodos, estado, ruta_final)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(huella, salida, f.pagina_inicio, f.pagina_fin, f.proveedor,
+                  json.dumps(f.textos, ensure_ascii=False), json.dumps(f.metodos),
+                  *previos.get((f.pagina_inicio, f.pagina_fin), (PENDIENTE, None)))
+                 for f in fragmentos])
+            self._con.execute("INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?)",
+                              (huella, salida, ruta, DIVIDIDO, int(ocr), time.time()))
+
+    def marcar_fragmento(self, huella, carpeta_salida, fragmento, estado, ruta_final=None):
+        with self._lock, self._con:
+            self._con.execute(
+                """UPDATE fragmentos SET estado = ?, ruta_final = ?
+                   WHERE huella = ? AND salida = ? AND pagina_inicio = ? AND pagina_fin = ?""",
+                (estado, ruta_final, huella, self._salida(carpeta_salida),
+                 fragmento.pagina_inicio, fragmento.pagina_fin))
+
+    def completar_archivo(self, huella, carpeta_salida):
+        """Archivo terminado: ya no hace falta guardar los textos de sus fragmentos."""
+        salida = self._salida(carpeta_salida)
+        with self._lock, self._con:
+            self._con.execute("UPDATE archivos SET estado = ?, actualizado = ? WHERE huella = ? AND salida = ?",
+                              (COMPLETADO, time.time(), huella, salida))
+            self._con.execute("DELETE FROM fragmentos WHERE huella = ? AND salida = ?", (huella, salida))
+
+
+# Instancia compartida por toda la aplicación
+_diario = None
+_lock_diario = threading.Lock()
+
+
+def obtener_diario():
+    """Diario compartido, o None si está desactivado en config."""
+    global _diario
+    if not DIARIO_ACTIVO:
+        return None
+    if _diario is None:
+        with _lock_diario:
+            if _diario is None:
+                _diario = DiarioProcesos()
+    return _diario
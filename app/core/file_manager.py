@@ -1,7 +1,24 @@
 import shutil
 import os
+import threading
+import time
 from datetime import datetime
-from app.config import DEFAULT_ERROR_DIR
+from app.config import DEFAULT_ERROR_DIR, DIRECTORIOS_VIGENCIA_S
+from app.utils.metrics import cronometrado
+
+# Subcarpeta de la salida para lo que no se pudo clasificar
+CARPETA_REVISION = os.path.basename(DEFAULT_ERROR_DIR)
+
+
+def va_a_revision(datos):
+    """Sin proveedor o sin Nº documento el documento acaba en Revision_Manual."""
+    return not (datos and datos.get("proveedor_detectado") and datos.get("id_documento"))
+
+
+def en_revision(carpeta_base_salida, ruta):
+    """¿Está `ruta` en la carpeta de revisión manual de esa salida?"""
+    revision = os.path.normcase(os.path.abspath(os.path.join(carpeta_base_salida, CARPETA_REVISION)))
+    return os.path.normcase(os.path.abspath(ruta)).startswith(revision + os.sep)
 
 
 def obtener_fecha_creacion_archivo(ruta_archivo):
@@ -19,49 +36,172 @@ def obtener_fecha_creacion_archivo(ruta_archivo):
         return "0000-00-00"
 
 
-def mover_y_renombrar(ruta_origen, datos, carpeta_base_salida):
+class IndiceDirectorios:
+    """
+    Nombres de las carpetas de destino en memoria, para una ejecución.
+    Cada carpeta se lee (o se crea) una sola vez, la primera vez que se usa;
+    después los choques de nombre, los sufijos y la creación de carpetas se
+    resuelven aquí y el disco (a menudo un recurso de red) solo se toca para
+    escribir cada archivo.
+
+    Si otro proceso escribe en esas carpetas mientras tanto, la lista se queda
+    atrás: cada carpeta se relee pasados `vigencia` segundos y, hasta entonces,
+    publicar_sin_pisar() se niega a escribir encima y se prueba el siguiente nombre.
+    """
+
+    def __init__(self, vigencia=DIRECTORIOS_VIGENCIA_S):
+        self.vigencia = vigencia
+        self._lock = threading.Lock()
+        self._carpetas = {}  # carpeta -> {nombre en minúsculas}
+        self._leidas = {}  # carpeta -> instante de la última lectura
+
+    @staticmethod
+    def _clave(nombre):
+        # Windows y los recursos SMB no distinguen mayúsculas
+        return nombre.lower()
+
+    def _nombres(self, carpeta):
+        nombres = self._carpetas.get(carpeta)
+        if nombres is not None and time.monotonic() - self._leidas[carpeta] > self.vigencia:
+            nombres = None  # Lista vieja: otra ejecución o alguien a mano puede haber escrito
+        if nombres is None:
+            try:
+                with os.scandir(carpeta) as entradas:
+                    nombres = {self._clave(e.name) for e in entradas}
+            except FileNotFoundError:
+                os.makedirs(carpeta, exist_ok=True)
+                nombres = set()
+            self._carpetas[carpeta] = nombres
+            self._leidas[carpeta] = time.monotonic()
+        return nombres
+
+    def reservar(self, carpeta, nombre):
+        """Ruta libre para `nombre` en `carpeta` (con sufijo _DUPLICADO_n si hace falta)."""
+        base, ext = os.path.splitext(nombre)
+        with self._lock:
+            nombres = self._nombres(carpeta)
+            candidato, n = nombre, 2
+            while self._clave(candidato) in nombres:
+                candidato = f"{base}_DUPLICADO_{n}{ext}"
+                n += 1
+            nombres.add(self._clave(candidato))
+        return os.path.join(carpeta, candidato)
+
+    def anotar(self, ruta):
+        """Marca una ruta como ocupada (creando su carpeta si hace falta)."""
+        carpeta, nombre = os.path.split(ruta)
+        with self._lock:
+            self._nombres(carpeta).add(self._clave(nombre))
+
+    def liberar(self, ruta):
+        """Devuelve una ruta reservada que al final no se escribió."""
+        carpeta, nombre = os.path.split(ruta)
+        with self._lock:
+            self._carpetas.get(carpeta, set()).discard(self._clave(nombre))
+
+
+def publicar_sin_pisar(ruta_origen, ruta_destino):
+    """
+    Mueve un archivo ya completo a su destino sin sobrescribir nunca lo que haya
+    allí: FileExistsError si el nombre está ocupado, aunque otro proceso lo haya
+    creado hace un instante. (os.rename pisa el destino en Linux sin avisar.)
+
+    - Windows: os.rename ya falla si el destino existe y, en el mismo volumen,
+      es atómico y no copia nada.
+    - POSIX: enlace duro, que falla si el destino existe. Sin enlaces (FAT,
+      algunos recursos de red) se reserva el nombre con O_EXCL y se sustituye
+      la reserva con os.replace.
+    Entre volúmenes distintos se copia a la reserva (shutil.move).
     """
-    Renombra a: YYYY-MM-DD_NoDocumento.pdf
+    if os.name == "nt":
+        try:
+            os.rename(ruta_origen, ruta_destino)
+            return
+        except FileExistsError:
+            raise
+        except OSError:
+            pass  # Otro volumen: copia sobre una reserva, como en POSIX
+    else:
+        try:
+            os.link(ruta_origen, ruta_destino)
+        except FileExistsError:
+            raise
+        except OSError:
+            pass
+        else:
+            os.remove(ruta_origen)
+            return
+
+    os.close(os.open(ruta_destino, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    try:
+        try:
+            os.replace(ruta_origen, ruta_destino)
+        except OSError:
+            shutil.move(ruta_origen, ruta_destino)
+    except Exception:
+        os.remove(ruta_destino)
+        raise
+
+
+def normalizar_fecha(fecha_raw):
+    """
+    Fecha leída del documento -> "YYYY-MM-DD".
+    Retorna None si no hay fecha o no encaja con ningún formato conocido.
+    """
+    if not fecha_raw:
+        return None
+
+    # 1. Limpieza: Estandarizamos separadores.
+    # Cambiamos puntos (.) y guiones (-) por barras (/)
+    # Ej: "28.05.2025" -> "28/05/2025"
+    fecha_limpia = fecha_raw.replace('.', '/').replace('-', '/')
+
+    # 2. Lista de formatos probables (Orden de prioridad)
+    formatos_posibles = [
+        "%d/%m/%Y",  # 28/05/2025 (El más común)
+        "%d/%m/%y",  # 28/05/25   (Año corto)
+        "%Y/%m/%d"  # 2025/05/28 (Formato ISO con barras)
+    ]
+
+    for fmt in formatos_posibles:
+        try:
+            objeto_fecha = datetime.strptime(fecha_limpia, fmt)
+            return objeto_fecha.strftime("%Y-%m-%d")  # ¡Éxito!
+        except ValueError:
+            continue  # Si falla, probamos el siguiente formato
+    return None
+
+
+@cronometrado("archivos.destino")
+def calcular_destino(origen, datos, carpeta_base_salida, directorios=None):
+    """
+    Ruta final (YYYY-MM-DD_NoDocumento.pdf en la carpeta del proveedor, o
+    Revision_Manual) sin mover nada todavía. Crea la carpeta y evita duplicados.
     Soporta fallback de fecha si el OCR falla.
+    Con `directorios` (IndiceDirectorios) la ruta se reserva en memoria sin mirar el disco.
     """
-    nombre_original = os.path.basename(ruta_origen)
+    if isinstance(origen, str):
+        ruta_fecha = origen
+        nombre_original = os.path.basename(origen)
+    else:
+        # Fragmento: la fecha buena es la del lote original, no la del temporal
+        ruta_fecha = origen.ruta_lote
+        nombre_original = origen.nombre
 
     # CONDICIÓN DE ÉXITO: Basta con tener Proveedor + ID Documento
-    if datos["proveedor_detectado"] and datos["id_documento"]:
+    if not va_a_revision(datos):
 
         proveedor = datos["proveedor_detectado"]
         doc_id = datos["id_documento"]
         fecha_raw = datos.get("fecha_documento")
-        formato_origen = datos.get("formato_fecha")
 
         # --- LÓGICA DE FECHA (MEJORADA) ---
-        fecha_str_final = None
-
-        if fecha_raw:
-            # 1. Limpieza: Estandarizamos separadores.
-            # Cambiamos puntos (.) y guiones (-) por barras (/)
-            # Ej: "28.05.2025" -> "28/05/2025"
-            fecha_limpia = fecha_raw.replace('.', '/').replace('-', '/')
-
-            # 2. Lista de formatos probables (Orden de prioridad)
-            formatos_posibles = [
-                "%d/%m/%Y",  # 28/05/2025 (El más común)
-                "%d/%m/%y",  # 28/05/25   (Año corto)
-                "%Y/%m/%d"  # 2025/05/28 (Formato ISO con barras)
-            ]
-
-            for fmt in formatos_posibles:
-                try:
-                    objeto_fecha = datetime.strptime(fecha_limpia, fmt)
-                    fecha_str_final = objeto_fecha.strftime("%Y-%m-%d")
-                    break  # ¡Éxito! Salimos del bucle si funciona
-                except ValueError:
-                    continue  # Si falla, probamos el siguiente formato
-
-            # 2. Intento: Plan B (Metadatos del archivo)
-            # Si la lectura falló o no coincide con ninguna fecha lógica
+        fecha_str_final = normalizar_fecha(fecha_raw)
+
+        # 2. Intento: Plan B (Metadatos del archivo)
+        # Si la lectura falló o no coincide con ninguna fecha lógica
         if not fecha_str_final:
-            fecha_str_final = obtener_fecha_creacion_archivo(ruta_origen)
+            fecha_str_final = obtener_fecha_creacion_archivo(ruta_fecha)
 
             # NUEVO NOMBRE
         nuevo_nombre = f"{fecha_str_final}_{doc_id}.pdf"
@@ -72,20 +212,63 @@ def mover_y_renombrar(ruta_origen, datos, carpeta_base_salida):
 
     else:
         # Fallo Crítico (Falta proveedor o ID) -> Revisión Manual
-        dir_final = os.path.join(carpeta_base_salida, "Revision_Manual")
+        dir_final = os.path.join(carpeta_base_salida, CARPETA_REVISION)
         nuevo_nombre = nombre_original
 
-    # --- LÓGICA DE MOVER ---
+    if directorios is not None:
+        return directorios.reservar(dir_final, nuevo_nombre)
+
     os.makedirs(dir_final, exist_ok=True)
     ruta_destino = os.path.join(dir_final, nuevo_nombre)
 
-    # Evitar duplicados
-    if os.path.exists(ruta_destino):
-        base, ext = os.path.splitext(nuevo_nombre)
-        ruta_destino = os.path.join(dir_final, f"{base}_DUPLICADO_{os.urandom(2).hex()}{ext}")
+    # Mismo nombre pero otro documento (los duplicados de verdad ya los filtra
+    # app/core/indice_salida.py): sufijo numerado, siempre el mismo para el mismo orden
+    base, ext = os.path.splitext(nuevo_nombre)
+    n = 2
+    while os.path.exists(ruta_destino):
+        ruta_destino = os.path.join(dir_final, f"{base}_DUPLICADO_{n}{ext}")
+        n += 1
+    return ruta_destino
+
 
+@cronometrado("archivos.mover")
+def mover_y_renombrar(origen, datos, carpeta_base_salida, ruta_destino=None, directorios=None):
+    """
+    Renombra a: YYYY-MM-DD_NoDocumento.pdf (ver calcular_destino)
+
+    `origen` puede ser una ruta o un Fragmento del splitter. El fragmento en
+    memoria se escribe directamente en su destino (una única escritura); si se
+    volcó a un temporal, se mueve como un archivo más.
+    `ruta_destino` permite fijar el destino de antemano (reanudación de una ejecución).
+    `directorios` (IndiceDirectorios): carpetas y choques de nombre resueltos en memoria.
+    Nunca escribe encima de un archivo existente: si el nombre resulta ocupado
+    (lo ha creado otro proceso después de leer la carpeta), se usa el siguiente libre.
+    """
+    ruta_origen = origen if isinstance(origen, str) else origen.ruta
     try:
-        shutil.move(ruta_origen, ruta_destino)
-        return True, ruta_destino
+        if ruta_destino is None:
+            ruta_destino = calcular_destino(origen, datos, carpeta_base_salida, directorios)
+        elif directorios is not None:
+            directorios.anotar(ruta_destino)
+        else:
+            os.makedirs(os.path.dirname(ruta_destino), exist_ok=True)
     except Exception as e:
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
+
+    while True:
+        try:
+            if ruta_origen:
+                publicar_sin_pisar(ruta_origen, ruta_destino)
+            else:
+                origen.escribir(ruta_destino)
+            return True, ruta_destino
+        except FileExistsError:
+            # Ocupado a nuestras espaldas: queda anotado y se reserva el siguiente nombre
+            try:
+                ruta_destino = calcular_destino(origen, datos, carpeta_base_salida, directorios)
+            except Exception as e:
+                return False, str(e)
+        except Exception as e:
+            if directorios is not None:
+                directorios.liberar(ruta_destino)
+            return False, str(e)
\ No newline at end of file
@@ -0,0 +1,135 @@
+import re
+from collections import defaultdict
+
+# Tamaño de los n-gramas del índice
+TAM_NGRAMA = 3
+
+# Firmas más cortas que esto (tras normalizar) solo se buscan de forma exacta:
+# "VOLVO" o "TURIA" con 1 error coincidirían con demasiadas palabras.
+LONGITUD_MINIMA = 7
+
+# Confusiones típicas de Tesseract entre letras y dígitos.
+# Se aplican igual a firmas y texto, así "A9659B917" y "A96598917" quedan idénticos.
+_CONFUSIONES = str.maketrans({
+    "o": "0", "q": "0",
+    "i": "1", "l": "1", "|": "1", "!": "1",
+    "z": "2",
+    "s": "5",
+    "g": "6",
+    "b": "8",
+})
+
+# Todo lo que no sea letra o dígito (espacios, guiones, puntos...) se descarta:
+# "976 465 540" -> "976465540"
+_RE_NO_ALFANUMERICO = re.compile(r"[^0-9a-zñ]+")
+
+
+def normalizar(texto):
+    """Minúsculas + confusiones OCR + solo alfanuméricos."""
+    return _RE_NO_ALFANUMERICO.sub("", texto.lower().translate(_CONFUSIONES))
+
+
+def errores_permitidos(firma_normalizada):
+    """
+    Distancia de edición máxima aceptada para una firma ya normalizada.
+    Las firmas solo numéricas (teléfonos, CIF sin letra) solo toleran la
+    normalización: con 1 error cualquier número vecino del documento coincidiría.
+    """
+    if firma_normalizada.isdigit():
+        return 0
+    return 1 if len(firma_normalizada) < 11 else 2
+
+
+def distancia_en_texto(patron, texto, maximo):
+    """
+    Distancia de edición mínima entre `patron` y cualquier subcadena de `texto`
+    (algoritmo de Sellers con el corte de Ukkonen): en cada columna solo se
+    calculan las filas hasta la última que aún no supera `maximo` (las de debajo
+    ya no pueden bajar de ahí), y se para al encontrar una coincidencia exacta.
+    Retorna la distancia o None si es mayor que `maximo`.
+    """
+    m = len(patron)
+    tope = maximo + 1  # Cualquier valor por encima de `maximo` vale lo mismo
+    # Columna de la DP sobre el patrón; fila 0 a cero = el match puede empezar en cualquier sitio
+    columna = [min(i, tope) for i in range(m + 1)]
+    ultima = min(maximo, m)  # Última fila de la columna con valor <= maximo
+    mejor = columna[m]
+    for c in texto:
+        anterior_diag = columna[0]
+        for i in range(1, min(ultima + 1, m) + 1):
+            actual = columna[i]
+            coste = anterior_diag if patron[i - 1] == c else anterior_diag + 1
+            columna[i] = min(coste, actual + 1, columna[i - 1] + 1)
+            anterior_diag = actual
+        ultima = min(ultima + 1, m)
+        while columna[ultima] > maximo:
+            ultima -= 1
+        if ultima == m and columna[m] < mejor:
+            mejor = columna[m]
+            if mejor == 0:
+                return 0
+    return mejor if mejor <= maximo else None
+
+
+class IndiceFirmasDifuso:
+    """
+    Índice de n-gramas sobre las firmas de proveedores para tolerar ruido de OCR.
+
+    1. Cada n-grama del texto normalizado "vota" por (firma, diagonal), donde la
+       diagonal es la posición en el texto en la que empezaría la firma.
+    2. Solo las diagonales con suficientes votos (lema de q-gramas) se verifican
+       con distancia de edición acotada sobre una ventana pequeña del texto.
+    """
+
+    def __init__(self, patrones):
+        """patrones: iterable de (firma, etiqueta)."""
+        self._firmas = []  # (normalizada, etiqueta, firma_original, errores_max)
+        self._ngramas = defaultdict(list)  # ngrama -> [(id_firma, desplazamiento)]
+
+        vistas = set()
+        for firma, etiqueta in patrones:
+            norm = normalizar(firma)
+            if len(norm) < LONGITUD_MINIMA or (norm, etiqueta) in vistas:
+                continue
+            vistas.add((norm, etiqueta))
+            id_firma = len(self._firmas)
+            self._firmas.append((norm, etiqueta, firma, errores_permitidos(norm)))
+            for desp in range(len(norm) - TAM_NGRAMA + 1):
+                self._ngramas[norm[desp:desp + TAM_NGRAMA]].append((id_firma, desp))
+
+    def buscar(self, texto):
+        """
+        Retorna lista de (distancia, posicion_normalizada, etiqueta, firma_original),
+        ordenada por distancia y posición. Como mucho un resultado por firma.
+        """
+        if not self._firmas or not texto:
+            return []
+
+        norm = normalizar(texto)
+        ngramas = self._ngramas
+        votos = defaultdict(int)
+        for pos in range(len(norm) - TAM_NGRAMA + 1):
+            entradas = ngramas.get(norm[pos:pos + TAM_NGRAMA])
+            if entradas:
+                for id_firma, desp in entradas:
+                    votos[(id_firma, pos - desp)] += 1
+
+        mejores = {}
+        for (id_firma, diagonal), n in votos.items():
+            firma_norm, etiqueta, original, k = self._firmas[id_firma]
+            # Lema de q-gramas: con k errores sobreviven al menos (m - q + 1) - k*q n-gramas.
+            # Sumamos las diagonales vecinas porque inserciones/borrados desplazan la diagonal.
+            minimo = max(1, len(firma_norm) - TAM_NGRAMA + 1 - k * TAM_NGRAMA)
+            total = sum(votos.get((id_firma, diagonal + d), 0) for d in range(-k, k + 1))
+            if total < minimo:
+                continue
+            if id_firma in mejores and mejores[id_firma][0] == 0:
+                continue
+
+            inicio = max(0, diagonal - k)
+            ventana = norm[inicio:diagonal + len(firma_norm) + k]
+            dist = distancia_en_texto(firma_norm, ventana, k)
+            if dist is not None and (id_firma not in mejores or (dist, diagonal) < mejores[id_firma][:2]):
+                mejores[id_firma] = (dist, diagonal, etiqueta, original)
+
+        return sorted(mejores.values(), key=lambda r: (r[0], r[1]))
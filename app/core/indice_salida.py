@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from app.core.ocr_cache import huella_pagina
+from app.core.file_manager import normalizar_fecha, en_revision
+from app.config import INDICE_SALIDA_ACTIVO, INDICE_SALIDA_PATH
+
+
+def huella_documento(paginas):
+    """
+    Huella del contenido de un documento: la de cada página (ocr_cache.huella_pagina)
+    en orden. No depende del nombre ni de cómo se serializó el PDF, así que el
+    mismo documento sacado de otro lote o reescrito por pypdf da la misma huella.
+    """
+    h = hashlib.sha256()
+    for pagina in paginas:
+        h.update(huella_pagina(pagina).encode())
+    return h.hexdigest()
+
+
+def clave_documento(datos):
+    """
+    (proveedor, Nº documento, fecha YYYY-MM-DD) leídos del texto, o None si falta
+    alguno: sin los tres no se puede decir que sea el mismo albarán.
+    """
+    if not datos:
+        return None
+    fecha = normalizar_fecha(datos.get("fecha_documento"))
+    if not (datos.get("proveedor_detectado") and datos.get("id_documento") and fecha):
+        return None
+    return datos["proveedor_detectado"], datos["id_documento"], fecha
+
+
+class IndiceSalida:
+    """
+    Índice persistente (SQLite) de los documentos guardados en cada carpeta de
+    salida, por huella de contenido y por (proveedor, Nº documento, fecha).
+
+    El pipeline lo consulta antes de dividir (un PDF que ya está guardado tal
+    cual no pasa ni por OCR) y antes de escribir cada documento (el mismo
+    albarán escaneado dos veces no se guarda dos veces).
+    Las entradas cuyo archivo ya no existe se descartan al consultarlas.
+
+    Lo que está en Revision_Manual no cuenta como guardado: es justo lo que
+    hay que volver a clasificar (ej: tras añadir la regla del proveedor).
+    """
+
+    def __init__(self, ruta=INDICE_SALIDA_PATH):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._con = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        with self._con:
+            self._con.execute("""CREATE TABLE IF NOT EXISTS documentos (
+                                     salida TEXT NOT NULL,
+                                     ruta TEXT NOT NULL,
+                                     huella TEXT NOT NULL,
+                                     proveedor TEXT,
+                                     id_documento TEXT,
+                                     fecha TEXT,
+                                     registrado REAL NOT NULL,
+                                     PRIMARY KEY (salida, ruta))""")
+            self._con.execute("CREATE INDEX IF NOT EXISTS idx_documentos_huella ON documentos (salida, huella)")
+            self._con.execute("""CREATE INDEX IF NOT EXISTS idx_documentos_clave
+                                 ON documentos (salida, proveedor, id_documento, fecha)""")
+
+    @staticmethod
+    def _salida(carpeta_salida):
+        return os.path.normcase(os.path.abspath(carpeta_salida))
+
+    def buscar(self, carpeta_salida, huella=None, clave=None):
+        """Ruta de un documento ya guardado con esa huella o esa clave, o None."""
+        salida = self._salida(carpeta_salida)
+        with self._lock:
+            filas = []
+            if huella:
+                filas += self._con.execute("SELECT ruta FROM documentos WHERE salida = ? AND huella = ?",
+                                           (salida, huella)).fetchall()
+            if clave:
+                filas += self._con.execute(
+                    """SELECT ruta FROM documentos
+                       WHERE salida = ? AND proveedor = ? AND id_documento = ? AND fecha = ?""",
+                    (salida, *clave)).fetchall()
+
+            for (ruta,) in filas:
+                if os.path.exists(ruta) and not en_revision(carpeta_salida, ruta):
+                    return ruta
+            # Borrados a mano o sin clasificar (de antes de que no se registraran)
+            perdidas = [(salida, ruta) for (ruta,) in filas]
+            if perdidas:
+                with self._con:
+                    self._con.executemany("DELETE FROM documentos WHERE salida = ? AND ruta = ?", perdidas)
+        return None
+
+    def registrar(self, carpeta_salida, ruta, huella, clave=None):
+        if en_revision(carpeta_salida, ruta):
+            return
+        proveedor, id_documento, fecha = clave or (None, None, None)
+        with self._lock, self._con:
+            self._con.execute("INSERT OR REPLACE INTO documentos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (self._salida(carpeta_salida), ruta, huella, proveedor, id_documento, fecha,
+                               time.time()))
+
+
+# Instancia compartida por toda la aplicación
+_indice = None
+_lock_indice = threading.Lock()
+
+
+def obtener_indice():
+    """Índice compartido, o None si está desactivado en config."""
+    global _indice
+    if not INDICE_SALIDA_ACTIVO:
+        return None
+    if _indice is None:
+        with _lock_indice:
+            if _indice is None:
+                _indice = IndiceSalida()
+    return _indice
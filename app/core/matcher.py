@@ -0,0 +1,64 @@
+from collections import deque
+
+
+class AutomataFirmas:
+    """
+    Autómata Aho-Corasick sobre todas las firmas de proveedores.
+    Recorre el texto UNA sola vez, sin importar cuántos proveedores/firmas haya,
+    y devuelve todas las apariciones con su posición.
+
+    Las firmas y el texto deben llegar ya normalizados (minúsculas).
+    """
+
+    def __init__(self, patrones):
+        """patrones: iterable de (firma, etiqueta). La etiqueta es libre (ej: nombre del proveedor)."""
+        self._goto = [{}]
+        self._fallo = [0]
+        self._salida = [[]]
+
+        for firma, etiqueta in patrones:
+            if firma:
+                self._insertar(firma, etiqueta)
+        self._construir_fallos()
+
+    def _insertar(self, firma, etiqueta):
+        estado = 0
+        for c in firma:
+            siguiente = self._goto[estado].get(c)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto.append({})
+                self._fallo.append(0)
+                self._salida.append([])
+                self._goto[estado][c] = siguiente
+            estado = siguiente
+        self._salida[estado].append((etiqueta, firma))
+
+    def _construir_fallos(self):
+        """BFS clásico: enlaces de fallo + propagación de salidas."""
+        cola = deque(self._goto[0].values())  # Los hijos de la raíz fallan a la raíz
+        while cola:
+            estado = cola.popleft()
+            for c, hijo in self._goto[estado].items():
+                cola.append(hijo)
+                f = self._fallo[estado]
+                while f and c not in self._goto[f]:
+                    f = self._fallo[f]
+                self._fallo[hijo] = self._goto[f].get(c, 0)
+                self._salida[hijo] = self._salida[hijo] + self._salida[self._fallo[hijo]]
+
+    def buscar(self, texto):
+        """
+        Retorna lista de (posicion_inicio, etiqueta, firma) en orden de aparición.
+        """
+        goto, fallo, salida = self._goto, self._fallo, self._salida
+        coincidencias = []
+        estado = 0
+        for pos, c in enumerate(texto):
+            while estado and c not in goto[estado]:
+                estado = fallo[estado]
+            estado = goto[estado].get(c, 0)
+            if salida[estado]:
+                for etiqueta, firma in salida[estado]:
+                    coincidencias.append((pos - len(firma) + 1, etiqueta, firma))
+        return coincidencias
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.config import OCR_CACHE_ENABLED, OCR_CACHE_PATH, OCR_CACHE_MAX_MB
+from app.core.preprocess import VERSION_PREPROCESO
+
+# Profundidad máxima al recorrer Form XObjects anidados
+_MAX_PROFUNDIDAD = 4
+
+
+def huella_pagina(page):
+    """
+    Hash del contenido visual de una página PDF (pypdf), sin rasterizarla:
+    stream de contenido + datos de imágenes/formularios + geometría.
+    Dos escaneos idénticos (aunque estén en archivos distintos) dan la misma huella.
+    """
+    h = hashlib.sha256()
+    h.update(repr([float(x) for x in page.mediabox]).encode())
+    h.update(str(page.get("/Rotate", 0)).encode())
+
+    contenido = page.get_contents()
+    if contenido is not None:
+        h.update(contenido.get_data())
+
+    _hash_recursos(h, page.get("/Resources"), 0)
+    return h.hexdigest()
+
+
+def _hash_recursos(h, recursos, profundidad):
+    if recursos is None or profundidad > _MAX_PROFUNDIDAD:
+        return
+    recursos = recursos.get_object()
+    xobjects = recursos.get("/XObject")
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for nombre in sorted(xobjects.keys()):
+        xobj = xobjects[nombre].get_object()
+        h.update(nombre.encode())
+        try:
+            h.update(xobj.get_data())
+        except Exception:
+            # Filtro no soportado por pypdf: usamos el stream tal cual
+            h.update(getattr(xobj, "_data", b"") or b"")
+        if xobj.get("/Subtype") == "/Form":
+            _hash_recursos(h, xobj.get("/Resources"), profundidad + 1)
+
+
+def clave_ocr(huella, parametros):
+    """
+    Clave de caché = huella de la página + receta de OCR (dpi, umbral, psm, lang...)
+    + versión del pre-procesado (ver preprocess.VERSION_PREPROCESO).
+    """
+    receta = json.dumps({**parametros, "preproceso": VERSION_PREPROCESO}, sort_keys=True)
+    return hashlib.sha256(f"{huella}|{receta}".encode()).hexdigest()
+
+
+class CacheOCR:
+    """
+    Caché persistente de textos OCR en SQLite con tope de tamaño y expulsión LRU.
+    Segura entre hilos (una conexión por hilo) y entre procesos (WAL + timeout).
+    """
+
+    def __init__(self, ruta=OCR_CACHE_PATH, max_mb=OCR_CACHE_MAX_MB):
+        self.ruta = ruta
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tam_total = None
+
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        con = self._conexion()
+        con.execute("""CREATE TABLE IF NOT EXISTS ocr (
+                           clave TEXT PRIMARY KEY,
+                           texto TEXT NOT NULL,
+                           tam INTEGER NOT NULL,
+                           ultimo_acceso REAL NOT NULL)""")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_ocr_acceso ON ocr(ultimo_acceso)")
+        con.commit()
+
+    def _conexion(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=10)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def obtener(self, clave):
+        """Texto guardado para la clave, o None si no está."""
+        try:
+            con = self._conexion()
+            fila = con.execute("SELECT texto FROM ocr WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            con.execute("UPDATE ocr SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave))
+            con.commit()
+            return fila[0]
+        except sqlite3.Error as e:
+            print(f"   ⚠️ Caché OCR no disponible: {e}")
+            return None
+
+    def guardar(self, clave, texto):
+        tam = len(texto.encode("utf-8")) + len(clave)
+        try:
+            con = self._conexion()
+            con.execute("INSERT OR REPLACE INTO ocr (clave, texto, tam, ultimo_acceso) VALUES (?, ?, ?, ?)",
+                        (clave, texto, tam, time.time()))
+            con.commit()
+            with self._lock:
+                if self._tam_total is not None:
+                    self._tam_total += tam
+            self._podar_si_hace_falta()
+        except sqlite3.Error as e:
+            print(f"   ⚠️ No se pudo guardar en caché OCR: {e}")
+
+    def _podar_si_hace_falta(self):
+        con = self._conexion()
+        with self._lock:
+            if self._tam_total is None:
+                self._tam_total = con.execute("SELECT COALESCE(SUM(tam), 0) FROM ocr").fetchone()[0]
+            if self._tam_total <= self.max_bytes:
+                return
+
+            # Recalculamos (otro proceso puede haber escrito) y liberamos hasta el 90%
+            self._tam_total = con.execute("SELECT COALESCE(SUM(tam), 0) FROM ocr").fetchone()[0]
+            objetivo = int(self.max_bytes * 0.9)
+            liberado = 0
+            claves = []
+            for clave, tam in con.execute("SELECT clave, tam FROM ocr ORDER BY ultimo_acceso"):
+                if self._tam_total - liberado <= objetivo:
+                    break
+                claves.append((clave,))
+                liberado += tam
+            con.executemany("DELETE FROM ocr WHERE clave = ?", claves)
+            con.commit()
+            self._tam_total -= liberado
+
+
+_cache = None
+_lock_cache = threading.Lock()
+
+
+def obtener_cache():
+    """Caché compartida, o None si está desactivada en config o no se puede abrir."""
+    global _cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _lock_cache:
+            if _cache is None:
+                try:
+                    _cache = CacheOCR()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"⚠️ Caché OCR desactivada: {e}")
+                    return None
+    return _cache
@@ -0,0 +1,111 @@
+import os
+import threading
+from app.config import OCR_MOTOR, TESSDATA_DIR
+
+# Importación condicional: tesserocr es opcional (enlaza con libtesseract)
+try:
+    import tesserocr
+
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    import pytesseract
+
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+
+class MotorPytesseract:
+    """
+    Un proceso `tesseract` por llamada (imagen temporal + carga del modelo cada vez).
+    Siempre funciona si está el ejecutable: es el motor de respaldo.
+    """
+    nombre = "pytesseract"
+
+    def leer(self, img, lang, psm):
+        return pytesseract.image_to_string(img, lang=lang, config=f"--psm {psm}")
+
+
+class MotorTesserocr:
+    """
+    Tesseract dentro del proceso (tesserocr). Cada hilo de cada worker del pool
+    OCR inicializa una vez el modelo por (idioma, psm) y lo reutiliza en todas
+    sus páginas: sin procesos ni archivos temporales por página.
+    Si el modelo no se puede cargar (ej: falta el idioma), pasa al motor de respaldo.
+    """
+    nombre = "tesserocr"
+
+    def __init__(self, tessdata=TESSDATA_DIR, respaldo=None):
+        self.tessdata = tessdata
+        self.respaldo = respaldo
+        self._local = threading.local()
+        self._fallidos = set()  # (lang, psm) que no se pudieron inicializar
+
+    def _api(self, lang, psm):
+        apis = self._local.__dict__.setdefault("apis", {})
+        api = apis.get((lang, psm))
+        if api is None:
+            opciones = {"path": self.tessdata} if self.tessdata else {}
+            api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm, **opciones)
+            apis[(lang, psm)] = api
+        return api
+
+    def leer(self, img, lang, psm):
+        if (lang, psm) not in self._fallidos:
+            try:
+                api = self._api(lang, psm)
+            except RuntimeError as e:
+                if self.respaldo is None:
+                    raise
+                self._fallidos.add((lang, psm))
+                print(f"   ⚠️ tesserocr no pudo cargar '{lang}' ({e}). Se usa {self.respaldo.nombre}.")
+            else:
+                api.SetImage(img)
+                return api.GetUTF8Text()
+        return self.respaldo.leer(img, lang, psm)
+
+
+def crear_motor(nombre=OCR_MOTOR):
+    """
+    "auto": tesserocr si está instalado (con pytesseract de respaldo), si no pytesseract.
+    "tesserocr" / "pytesseract": ese motor, sin alternativas.
+    """
+    if nombre == "pytesseract":
+        return MotorPytesseract()
+    if nombre == "tesserocr":
+        if not TESSEROCR_AVAILABLE:
+            raise RuntimeError("OCR_MOTOR = 'tesserocr' pero tesserocr no está instalado")
+        return MotorTesserocr()
+    if nombre != "auto":
+        raise ValueError(f"Motor OCR desconocido: {nombre}")
+    if TESSEROCR_AVAILABLE:
+        return MotorTesserocr(respaldo=MotorPytesseract() if PYTESSERACT_AVAILABLE else None)
+    return MotorPytesseract()
+
+
+# Un motor por proceso (los workers del pool OCR crean el suyo al primer uso)
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def motor_ocr():
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = crear_motor()
+    return _motor
+
+
+def _reiniciar_en_hijo():
+    # Las instancias de Tesseract del padre no se comparten con los workers
+    global _motor, _lock_motor
+    _motor = None
+    _lock_motor = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
@@ -1,8 +1,9 @@
-import re
-from app.core.provider_manager import cargar_proveedores
+from app.core.rule_engine import obtener_motor
+from app.utils.metrics import cronometrado
 
 
-def analizar_documento(texto_pdf):
+@cronometrado("parser.analizar")
+def analizar_documento(texto_pdf, motor=None):
     """
     1. Identifica proveedor.
     2. Extrae Nº Documento.
@@ -20,46 +21,79 @@ def analizar_documento(texto_pdf):
     if not texto_pdf:
         return resultado
 
-    diccionario_proveedores = cargar_proveedores()
-    proveedor_encontrado = None
+    motor = motor or obtener_motor()
 
-    # 1. IDENTIFICACIÓN
-    for nombre_prov, reglas in diccionario_proveedores.items():
-        firmas = reglas.get("firma", [])
-        for firma in firmas:
-            if firma.lower() in texto_pdf.lower():
-                proveedor_encontrado = nombre_prov
-                break
-        if proveedor_encontrado: break
+    # 1. IDENTIFICACIÓN (una sola pasada del autómata sobre el texto en minúsculas)
+    regla, coincidencias = motor.identificar(texto_pdf.lower())
+
+    if regla:
+        proveedores_con_firma = list(dict.fromkeys(c[1] for c in coincidencias))
+        if len(proveedores_con_firma) > 1:
+            resultado["log_info"] = (f"Firmas de varios proveedores ({', '.join(proveedores_con_firma)}). "
+                                     f"Prioridad a {regla.nombre}.")
+    else:
+        # 1b. Segunda fase: firmas deformadas por el OCR (ej: "A9659B917" -> "A96598917")
+        regla, aproximadas = motor.identificar_aproximado(texto_pdf)
+        if regla:
+            distancia, _, _, firma = min(c for c in aproximadas if c[2] == regla.nombre)
+            resultado["log_info"] = f"Firma aproximada (OCR): '{firma}' con {distancia} error(es)."
+
+    proveedor_encontrado = regla.nombre if regla else None
 
     if not proveedor_encontrado:
         resultado["log_info"] = "Proveedor desconocido."
         return resultado
 
     resultado["proveedor_detectado"] = proveedor_encontrado
-    reglas = diccionario_proveedores[proveedor_encontrado]
 
     # 2. EXTRACCIÓN DOCUMENTO (Albarán/Factura)
-    patron_doc = reglas.get("patron_documento")
-    if patron_doc:
-        match_doc = re.search(patron_doc, texto_pdf, re.IGNORECASE | re.MULTILINE)
+    if regla.patron_documento:
+        match_doc = regla.patron_documento.search(texto_pdf)
         if match_doc:
             raw_doc = match_doc.group(1).strip()
             # [MEJORA] Limpieza: Quitamos espacios intermedios (ej: "49 51 667" -> "4951667")
             resultado["id_documento"] = raw_doc.replace(" ", "").replace(".", "")
 
     # 3. EXTRACCIÓN FECHA
-    patron_fecha = reglas.get("patron_fecha")
-    if patron_fecha:
-        match_fecha = re.search(patron_fecha, texto_pdf, re.IGNORECASE | re.MULTILINE)
+    if regla.patron_fecha:
+        match_fecha = regla.patron_fecha.search(texto_pdf)
         if match_fecha:
             raw_fecha = match_fecha.group(1).strip()
             # [MEJORA] Limpieza: Quitamos espacios en la fecha (ej: "19/ 01 / 2026" -> "19/01/2026")
             fecha_limpia = raw_fecha.replace(" ", "")
 
             resultado["fecha_documento"] = fecha_limpia
-            resultado["formato_fecha"] = reglas.get("formato_fecha_origen", "%d/%m/%Y")
+            resultado["formato_fecha"] = regla.formato_fecha
+
+    resultado["carpeta_destino"] = regla.carpeta_destino
+
+    return resultado
+
+
+def documento_completo(datos):
+    """Proveedor + Nº documento + fecha: ya no hace falta leer más."""
+    return bool(datos.get("proveedor_detectado") and datos.get("id_documento") and datos.get("fecha_documento"))
+
+
+class AnalizadorIncremental:
+    """
+    Analiza un documento a medida que llega su texto, página a página.
+    En cuanto están proveedor, Nº documento y fecha (`completo`), el resto de
+    páginas ya no hace falta leerlas (ni pasarlas por OCR).
+    """
+
+    def __init__(self, motor=None):
+        self.motor = motor
+        self.texto = ""
+        self.datos = analizar_documento("")
 
-    resultado["carpeta_destino"] = reglas.get("carpeta_destino")
+    def agregar(self, texto_pagina):
+        """Añade una página (mismo formato que extraer_texto_pdf) y retorna el análisis acumulado."""
+        if texto_pagina:
+            self.texto += texto_pagina + "\n"
+            self.datos = analizar_documento(self.texto, self.motor)
+        return self.datos
 
-    return resultado
\ No newline at end of file
+    @property
+    def completo(self):
+        return documento_completo(self.datos)
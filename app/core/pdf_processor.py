@@ -1,13 +1,27 @@
 from pypdf import PdfReader
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import atexit
 import os
+import re
 import sys
-from app.config import TESSERACT_CMD, POPPLER_PATH
+import threading
+from app.config import (TESSERACT_CMD, POPPLER_PATH, OCR_WORKERS, RASTER_TAM_BLOQUE, OCR_ESCALERA,
+                        OCR_ESCALERA_MAX_SIN_PROVEEDOR)
+from app.core.parser import analizar_documento, documento_completo, AnalizadorIncremental
+from app.core.ocr_cache import obtener_cache, huella_pagina
+from app.core.rasterizer import renderizar_paginas
+from app.core.preprocess import PARAMETROS_PREPROCESO
+from app.core.roi import ocr_por_regiones, texto_desde_cache, guardar_en_cache
+from app.core.ocr_engine import motor_ocr
+from app.core.rule_engine import obtener_motor
+from app.utils.metrics import span, cronometrado, contar, capturar_spans, registrar_spans
 
 # Importación condicional
 try:
     import pytesseract
-    from pdf2image import convert_from_path
-    from PIL import Image, ImageOps, ImageEnhance, ImageFilter # <--- NUEVO
+    from pdf2image import pdfinfo_from_path
 
     OCR_AVAILABLE = True
 except ImportError as e:
@@ -18,86 +32,567 @@ except Exception as e:
     OCR_AVAILABLE = False
 
 
-def extraer_texto_pdf(ruta_archivo, forzar_ocr=False):
+# Receta del OCR de documentos. Forma parte de la clave de la caché:
+# si cambia cualquier valor, las páginas se vuelven a leer.
+# psm 3 (Auto-detectar bloques, bueno para docs torcidos)
+# psm 6 (Bloque uniforme de texto) suele ir mejor para listas/tablas
+# psm 11 (Texto disperso) a veces encuentra cosas perdidas
+# lang='spa' es vital si tienes el paquete español instalado
+PARAMETROS_OCR = {
+    **PARAMETROS_PREPROCESO,
+    "dpi": 200,
+    "gris": True,  # Poppler entrega la página ya en escala de grises
+    "psm": 3,
+    "lang": "spa",
+}
+
+# ==========================================
+# POOL DE PROCESOS PARA OCR
+# ==========================================
+# Uno solo para toda la aplicación, de OCR_WORKERS procesos: se crea la primera
+# vez que hace falta y se reutiliza entre documentos y entre los hilos del
+# pipeline, así no pagamos el arranque de procesos en cada PDF. Con tesserocr
+# cada worker carga además el modelo de Tesseract una sola vez (ver ocr_engine.py).
+# Cuántas páginas tiene en vuelo cada llamada lo decide _ocr_paginas, no el pool.
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def _obtener_pool():
+    """El pool compartido, o None si no se pueden crear procesos."""
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_iniciar_worker_ocr,
+                                            initargs=(TESSERACT_CMD,))
+            except OSError as e:
+                print(f"   ⚠️ Pool OCR no disponible ({e}). Continuando en secuencial.")
+                return None
+        return _pool
+
+
+def _descartar_pool(pool=None):
     """
-    Extrae texto del PDF.
-    - Modo Rápido (Default): Usa pypdf.
-    - Modo OCR: Usa Tesseract + Pre-procesamiento de imagen.
+    Cierra el pool compartido. Con `pool`, solo si sigue siendo ese: si dos
+    hilos lo ven roto a la vez, el segundo no tira el que ya rehízo el primero.
     """
-    if not os.path.exists(ruta_archivo):
-        return None, "Archivo no encontrado"
+    global _pool
+    with _lock_pool:
+        if _pool is not None and (pool is None or _pool is pool):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
 
-    # ==========================================
-    # MODO 1: OCR VISUAL
-    # ==========================================
-    if forzar_ocr:
-        if not OCR_AVAILABLE:
-            return None, "Librerías OCR no instaladas."
 
-        if not os.path.exists(TESSERACT_CMD): return None, f"❌ Falta Tesseract: {TESSERACT_CMD}"
-        if not os.path.exists(POPPLER_PATH): return None, f"❌ Falta Poppler: {POPPLER_PATH}"
+atexit.register(_descartar_pool)
 
-        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
+def _iniciar_worker_ocr(tesseract_cmd):
+    """Se ejecuta una vez en cada proceso del pool."""
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    # Cada página ya va en su propio proceso: que Tesseract no abra además
+    # sus propios hilos OpenMP y se pisen entre ellos.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_pagina(img, conocidas=None, parametros=PARAMETROS_OCR):
+    """
+    Pre-procesa y lee una página empezando por la cabecera (ver app/core/roi.py).
+    Función de módulo para poder enviarla al pool.
+    Retorna ((texto, bandas_nuevas, fraccion_leida), tiempos): los span() del
+    worker (preprocesado, Tesseract) viajan con el resultado para que
+    _ocr_paginas los sume al informe del proceso principal.
+    """
+    with capturar_spans() as tiempos:
+        resultado = ocr_por_regiones(img, parametros, conocidas)
+    return resultado, tiempos
+
+
+def _con_tiempos(resultados):
+    """Registra los tiempos que trae cada resultado de _ocr_pagina y los quita (los fallos pasan tal cual)."""
+    paginas = []
+    for resultado in resultados:
+        if isinstance(resultado, Exception):
+            paginas.append(resultado)
+            continue
+        resultado, tiempos = resultado
+        registrar_spans(tiempos)
+        paginas.append(resultado)
+    return paginas
+
+
+def _sin_cortar(fuente, total):
+    """
+    Las entradas de `fuente()`. Si el rasterizado falla a mitad, la excepción
+    ocupa el sitio de cada página que faltaba en vez de cortar la llamada.
+    """
+    n = 0
+    try:
+        for entrada in fuente():
+            n += 1
+            yield entrada
+    except Exception as e:
+        yield from [e] * (total - n)
+
+
+def _resultado(futuro):
+    """Resultado de una página del pool, o la excepción si esa página falló."""
+    if isinstance(futuro, Exception):
+        return futuro
+    try:
+        return futuro.result()
+    except BrokenProcessPool:
+        raise  # No es cosa de la página: el pool entero no sirve
+    except Exception as e:
+        return e
+
+
+def _ocr_local(entrada, parametros):
+    """_ocr_pagina en este proceso, con el fallo de la página como resultado."""
+    if isinstance(entrada, Exception):
+        return entrada
+    try:
+        return _ocr_pagina(*entrada, parametros)
+    except Exception as e:
+        return e
+
+
+def _ocr_paginas(fuente, total, workers, parametros=PARAMETROS_OCR):
+    """
+    OCR de las páginas que va entregando `fuente()` (un iterable de
+    (imagen, bandas_conocidas), normalmente desde el rasterizador en streaming),
+    en paralelo si hay más de una página y más de un worker.
+    Devuelve (texto, bandas_nuevas, fraccion_leida) por página, en el orden de entrada.
+    Una página que no se puede rasterizar o leer no tira las demás: en su
+    lugar va la excepción.
+
+    Mientras los workers leen unas páginas, el rasterizador ya prepara las
+    siguientes; como mucho hay min(workers, total) + 1 páginas de esta llamada
+    en vuelo. El pool es el compartido (OCR_WORKERS procesos), sea cual sea `workers`.
+    """
+    en_paralelo = min(workers, total)
+    pool = _obtener_pool() if en_paralelo > 1 else None
+    if pool is not None:
         try:
-            print(f"   👁️ Motor OCR arrancando... (Procesando imagen)")
-            images = convert_from_path(ruta_archivo, poppler_path=POPPLER_PATH)
+            futuros = []
+            en_vuelo = deque()
+            for entrada in _sin_cortar(fuente, total):
+                if isinstance(entrada, Exception):
+                    futuros.append(entrada)
+                    continue
+                if len(en_vuelo) > en_paralelo:
+                    en_vuelo.popleft().exception()  # Contrapresión: no acumular imágenes
+                futuro = pool.submit(_ocr_pagina, *entrada, parametros)
+                futuros.append(futuro)
+                en_vuelo.append(futuro)
+            return _con_tiempos([_resultado(f) for f in futuros])
+        except BrokenProcessPool as e:
+            # Un worker ha muerto (memoria, señal...): el pool no sirve. Se
+            # rehará en la próxima llamada; estas páginas, en secuencial.
+            print(f"   ⚠️ Pool OCR roto ({e}). Continuando en secuencial.")
+            _descartar_pool(pool)
+    return _con_tiempos(_ocr_local(entrada, parametros) for entrada in _sin_cortar(fuente, total))
+
+
+@cronometrado("ocr.huellas")
+def _huellas(ruta_archivo):
+    """Huella de contenido de cada página, o None si el PDF no se puede inspeccionar."""
+    try:
+        reader = PdfReader(ruta_archivo)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        return [huella_pagina(page) for page in reader.pages]
+    except Exception:
+        return None
+
+
+@cronometrado("ocr.documento")
+def ocr_documento(ruta_archivo, workers, paginas=None, parametros=PARAMETROS_OCR,
+                  huellas=None, tam_bloque=1, a_escalar=None, escalera=OCR_ESCALERA, primer_escalon=1):
+    """
+    OCR de las páginas indicadas (índices 0-based; todas si None) consultando
+    antes la caché: solo se rasterizan y leen las que no estaban guardadas,
+    y de esas solo las franjas que no estaban ya leídas.
+    `huellas` (indexable por página) evita releer el PDF si el llamante ya lo tiene abierto.
+
+    Con `a_escalar(leidas, indices)` se sube por la escalera de OCR: cada escalón
+    (cambios sobre `parametros`) solo relee las páginas que esa función devuelve
+    como aún no resueltas y que merece la pena releer (ver _merece_escalar).
+    Cada página se queda con el texto del primer escalón que la resuelve, o con
+    el mejor si no la resuelve ninguno. `primer_escalon` > 1 empieza más arriba
+    (los anteriores ya se leyeron en otra parte).
+
+    Retorna una lista de (texto, metodo) alineada con `paginas`,
+    con metodo "ocr", "cache" o "error" (no se pudo leer: texto vacío).
+    """
+    cache = obtener_cache()
+    if not cache:
+        huellas = None
+    elif huellas is None:
+        huellas = _huellas(ruta_archivo)
+
+    if paginas is None:
+        if huellas is not None:
+            paginas = list(range(len(huellas)))
+        else:
+            paginas = list(range(pdfinfo_from_path(ruta_archivo, poppler_path=POPPLER_PATH)["Pages"]))
+
+    if a_escalar is None or not escalera:
+        leidas = _ocr_pasada(ruta_archivo, workers, paginas, parametros, cache, huellas, tam_bloque)
+        return [leidas[i] for i in paginas]
+
+    resultado = {}
+    anteriores = {}  # Texto de cada página en el escalón anterior
+    pendientes = list(paginas)
+    for n, cambios in enumerate(escalera[primer_escalon - 1:], start=primer_escalon):
+        if n > 1:
+            print(f"   🔁 OCR escalón {n}/{len(escalera)} ({_describir_escalon(cambios)}) "
+                  f"en {len(pendientes)} páginas")
+        with span(f"ocr.escalon_{n}"):
+            leidas = _ocr_pasada(ruta_archivo, workers, pendientes, {**parametros, **cambios},
+                                 cache, huellas, tam_bloque)
+        sin_resolver = set(a_escalar({**resultado, **leidas}, pendientes))
+        for i in pendientes:
+            if i not in sin_resolver or i not in resultado or \
+                    _puntuacion(leidas[i][0]) > _puntuacion(resultado[i][0]):
+                resultado[i] = leidas[i]
+        contar(f"ocr.escalon_ganador.{n}", len(pendientes) - len(sin_resolver))
+        siguen = [i for i in pendientes if i in sin_resolver and
+                  _merece_escalar(n, leidas[i][0], anteriores.get(i))]
+        contar("ocr.escalon_ganador.ninguno", len(sin_resolver) - len(siguen))
+        anteriores.update((i, leidas[i][0]) for i in siguen)
+        pendientes = siguen
+        if not pendientes:
+            break
+    else:
+        contar("ocr.escalon_ganador.ninguno", len(pendientes))
+    return [resultado[i] for i in paginas]
+
+
+def _merece_escalar(n, texto, anterior):
+    """
+    ¿Vale la pena releer con el siguiente escalón una página que el `n` no resolvió?
+    No si sale (casi) vacía (página en blanco, separador), si da lo mismo que el
+    escalón anterior, o si no trae firma de proveedor y ya se pasó por la receta
+    base (OCR_ESCALERA_MAX_SIN_PROVEEDOR): subir de dpi no la va a convertir en portada.
+    """
+    if len(texto.strip()) < MIN_CARACTERES_NATIVO or texto == anterior:
+        return False
+    return n < OCR_ESCALERA_MAX_SIN_PROVEEDOR or bool(analizar_documento(texto).get("proveedor_detectado"))
+
+
+def _describir_escalon(cambios):
+    return ", ".join(f"{clave} {valor}" for clave, valor in cambios.items()) or "receta base"
+
+
+def _puntuacion(texto):
+    """Para quedarse con la mejor lectura si ningún escalón resuelve: campos hallados y longitud."""
+    datos = analizar_documento(texto)
+    campos = sum(1 for clave in ("proveedor_detectado", "id_documento", "fecha_documento") if datos.get(clave))
+    return campos, len(texto.strip())
+
 
-            texto_completo = ""
-            for img in images:
-                # --- FASE DE MEJORA DE IMAGEN ---
-                # 1. Convertir a escala de grises
-                img = img.convert('L')
-                # 2. Aumentar contraste
-                enhancer = ImageEnhance.Contrast(img)
-                img = enhancer.enhance(2)
+def _ocr_pasada(ruta_archivo, workers, paginas, parametros, cache, huellas, tam_bloque):
+    """
+    Una pasada de OCR con una receta concreta. Retorna {pagina: (texto, metodo)}.
+    Las páginas que fallan quedan como ("", "error") y no se guardan en la caché.
+    """
+    resultado = {}
+    pendientes = []  # (indice, bandas ya conocidas)
+    for i in paginas:
+        conocidas = {}
+        if huellas is not None:
+            texto, conocidas = texto_desde_cache(cache, huellas[i], parametros)
+            if texto is not None:
+                resultado[i] = (texto, "cache")
+                continue
+        pendientes.append((i, conocidas))
+
+    if pendientes and len(pendientes) < len(paginas):
+        print(f"   👁️ OCR de {len(pendientes)}/{len(paginas)} páginas (resto desde caché)")
+
+    indices = [i for i, _ in pendientes]
+    fuente = lambda: zip(_imagenes(ruta_archivo, indices, parametros, tam_bloque), (c for _, c in pendientes))
+    for i, leida in zip(indices, _ocr_paginas(fuente, len(pendientes), workers, parametros)):
+        if isinstance(leida, Exception):
+            print(f"   ⚠️ Fallo OCR en página {i + 1}: {leida}")
+            resultado[i] = ("", "error")
+            continue
+        texto, nuevas, _ = leida
+        resultado[i] = (texto, "ocr")
+        if huellas is not None:
+            guardar_en_cache(cache, huellas[i], parametros, texto, nuevas)
+    return resultado
+
+
+def _imagenes(ruta_archivo, paginas, parametros=PARAMETROS_OCR, tam_bloque=1):
+    """Imágenes de las páginas pedidas, rasterizadas en streaming (tam_bloque páginas por llamada)."""
+    for _, img in renderizar_paginas(ruta_archivo, paginas, dpi=parametros["dpi"],
+                                     gris=parametros["gris"], tam_bloque=tam_bloque):
+        yield img
+
+
+# ==========================================
+# ENRUTADO POR PÁGINA (NATIVO vs OCR)
+# ==========================================
+MODO_NATIVO = "nativo"  # Solo pypdf
+MODO_AUTO = "auto"  # pypdf y OCR solo en las páginas cuya capa de texto no es fiable
+MODO_OCR = "ocr"  # OCR de todas las páginas
 
-                #Filtro imágen en los bordes
-                img = img.filter(ImageFilter.SHARPEN)
+# Palabras que esperamos en cualquier albarán/factura legible
+_RE_TOKENS_ESPERADOS = re.compile(
+    r"albar[aá]n|factura|pedido|fecha|c\.?i\.?f|n\.?i\.?f|\d{1,2}\s?[/.-]\s?\d{1,2}\s?[/.-]\s?\d{2,4}",
+    re.IGNORECASE
+)
+MIN_CARACTERES_NATIVO = 20
+MIN_RATIO_IMPRIMIBLE = 0.95
+MIN_RATIO_ALFANUMERICO = 0.5
+# Sin ninguna palabra esperada, solo nos fiamos de páginas con bastante texto
+MIN_CARACTERES_SIN_TOKENS = 200
 
-                # [CRÍTICO] Umbral 10 descubierto en pruebas.
-                # Elimina fondos grises (Europart) dejando solo tinta negra fuerte.
-                UMBRAL_CORTE = 10
-                img = img.point(lambda x: 0 if x < UMBRAL_CORTE else 255, '1')
 
+def evaluar_texto_nativo(texto):
+    """
+    ¿Es fiable la capa de texto de una página? Si no, merece OCR.
+    - Longitud mínima.
+    - Proporción de caracteres imprimibles (fuentes rotas dan basura / '\ufffd').
+    - Proporción de letras y dígitos (descarta '(cid:12)' y similares).
+    - Presencia de tokens esperados (fecha, "albarán", firma de proveedor...).
+    """
+    limpio = (texto or "").strip()
+    if len(limpio) < MIN_CARACTERES_NATIVO:
+        return False
+
+    visibles = [c for c in limpio if not c.isspace()]
+    imprimibles = sum(1 for c in visibles if c.isprintable() and c != "\ufffd")
+    if imprimibles / len(visibles) < MIN_RATIO_IMPRIMIBLE:
+        return False
+    if sum(1 for c in visibles if c.isalnum()) / len(visibles) < MIN_RATIO_ALFANUMERICO:
+        return False
+
+    if _RE_TOKENS_ESPERADOS.search(limpio) or obtener_motor().identificar(limpio.lower())[0]:
+        return True
+    return len(limpio) >= MIN_CARACTERES_SIN_TOKENS
 
 
-                # --- LECTURA ---
-                # config='--psm 3' (Auto-detectar bloques, bueno para docs torcidos)
-                # config='--psm 6' (Bloque uniforme de texto) suele ir mejor para listas/tablas
-                # config='--psm 11' (Texto disperso) a veces encuentra cosas perdidas
-                # lang='spa' es vital si tienes el paquete español instalado
-                texto_pagina = pytesseract.image_to_string(img, lang='spa', config='--psm 3')
-                texto_completo += texto_pagina + "\n"
+def comprobar_motores_ocr():
+    """Retorna None si el OCR puede usarse, o el mensaje de error."""
+    if not OCR_AVAILABLE:
+        return "Librerías OCR no instaladas."
+    try:
+        motor = motor_ocr()
+    except (RuntimeError, ValueError) as e:
+        return f"❌ {e}"
+    # tesserocr lleva Tesseract dentro: solo pytesseract necesita el ejecutable
+    if motor.nombre != "tesserocr" and not os.path.exists(TESSERACT_CMD):
+        return f"❌ Falta Tesseract: {TESSERACT_CMD}"
+    if not os.path.exists(POPPLER_PATH): return f"❌ Falta Poppler: {POPPLER_PATH}"
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return None
+
 
-            if not texto_completo.strip():
-                return None, "OCR: Imagen vacía o ilegible."
+def _escalar_documento(nativas):
+    """
+    Criterio de la escalera para un documento suelto: mientras el texto completo
+    (páginas nativas + leídas por OCR) no dé proveedor, Nº y fecha, se reintentan todas.
+    """
+    def a_escalar(leidas, indices):
+        textos = {**nativas, **{i: texto for i, (texto, _) in leidas.items()}}
+        texto = "".join(textos[i] + "\n" for i in sorted(textos) if textos[i])
+        return [] if documento_completo(analizar_documento(texto)) else indices
+    return a_escalar
 
-            return texto_completo, None
 
+def iterar_paginas_pdf(ruta_archivo, modo=MODO_AUTO, workers=None):
+    """
+    Generador de (indice, texto, metodo) en orden de página. Cada página se
+    extrae cuando se pide, así quien consume puede parar cuando tenga bastante
+    y las demás no se leen (ni se rasterizan ni pasan por OCR).
+
+    El OCR va por tandas: primero la página 1 sola (casi siempre trae proveedor,
+    Nº y fecha) y después de `workers` en `workers` páginas, en paralelo. Se usa
+    solo el primer escalón de OCR_ESCALERA; escalar es cosa de extraer_paginas_pdf.
+    """
+    reader = PdfReader(ruta_archivo)
+    if reader.is_encrypted:
+        reader.decrypt("")
+    return _iterar_paginas(reader, ruta_archivo, modo, workers or OCR_WORKERS, {})
+
+
+def _iterar_paginas(reader, ruta_archivo, modo, workers, huellas):
+    """iterar_paginas_pdf sobre un lote ya abierto; va dejando en `huellas` las de las páginas con OCR."""
+    if modo != MODO_NATIVO:
+        error = comprobar_motores_ocr()
+        if error:
+            if modo == MODO_OCR:
+                raise RuntimeError(error)
+            modo = MODO_NATIVO  # AUTO sin OCR: solo texto nativo
+
+    receta = {**PARAMETROS_OCR, **(OCR_ESCALERA[0] if OCR_ESCALERA else {})}
+    cache = obtener_cache()
+
+    inicio, tanda = 0, 1
+    while inicio < len(reader.pages):
+        indices = range(inicio, min(inicio + tanda, len(reader.pages)))
+        paginas = {}
+        if modo != MODO_OCR:
+            with span("pdf.nativo"):
+                for i in indices:
+                    t = reader.pages[i].extract_text() or ""
+                    paginas[i] = (t, "nativo" if t.strip() else "vacio")
+
+        a_ocr = [i for i in indices if modo == MODO_OCR or (modo == MODO_AUTO and not evaluar_texto_nativo(paginas[i][0]))]
+        if a_ocr:
+            if cache:
+                huellas.update((i, huella_pagina(reader.pages[i])) for i in a_ocr)
+            for i, (texto, metodo) in zip(a_ocr, ocr_documento(ruta_archivo, workers, a_ocr, receta,
+                                                                huellas if cache else None,
+                                                                tam_bloque=RASTER_TAM_BLOQUE)):
+                # Si el OCR falla y tampoco había texto nativo, la página queda como "error"
+                if texto.strip() or modo == MODO_OCR or (metodo == "error" and not paginas[i][0].strip()):
+                    paginas[i] = (texto, metodo)
+
+        for i in indices:
+            yield i, *paginas[i]
+        inicio, tanda = indices.stop, max(1, workers)
+
+
+def _extraer_hasta_completar(ruta_archivo, modo, workers):
+    """
+    Lee página a página hasta que el análisis acumulado tiene proveedor, Nº y
+    fecha; las páginas que faltan se marcan "omitida" (siguen en el PDF, solo
+    no se leen). Si el documento termina sin completarse, lo ya leído se
+    aprovecha: solo las páginas que pasaron por OCR suben al resto de la
+    escalera (el primer escalón ya está hecho). None si no se puede leer.
+    """
+    analizador = AnalizadorIncremental()
+    paginas, huellas = [], {}
+    try:
+        reader = PdfReader(ruta_archivo)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        for i, texto, metodo in _iterar_paginas(reader, ruta_archivo, modo, workers, huellas):
+            paginas.append((texto, metodo))
+            if analizador.agregar(texto) and analizador.completo:
+                break
+
+        omitidas = len(reader.pages) - len(paginas)
+        if analizador.completo:
+            contar("extraccion.paginas_omitidas", omitidas)
+            return paginas + [("", "omitida")] * omitidas
+
+        leidas = [i for i, (texto, metodo) in enumerate(paginas)
+                  if metodo in ("ocr", "cache") and _merece_escalar(1, texto, None)]
+        if leidas and len(OCR_ESCALERA) > 1:
+            nativas = {i: texto for i, (texto, _) in enumerate(paginas) if i not in leidas}
+            resultado = ocr_documento(ruta_archivo, workers, leidas, huellas=huellas or None,
+                                      tam_bloque=RASTER_TAM_BLOQUE, a_escalar=_escalar_documento(nativas),
+                                      primer_escalon=2)
+            for i, (texto, metodo) in zip(leidas, resultado):
+                if texto.strip():
+                    paginas[i] = (texto, metodo)
+    except Exception:
+        return None  # Que la lectura normal dé el error con su mensaje
+    return paginas
+
+
+def extraer_paginas_pdf(ruta_archivo, modo=MODO_NATIVO, workers=None, hasta_completar=False):
+    """
+    Extrae el texto página a página.
+    Retorna (paginas, error) con paginas = [(texto, metodo), ...] y metodo en
+    "nativo" | "ocr" | "cache" | "vacio" | "error", para poder contar qué ruta siguió cada una.
+    Con hasta_completar=True deja de leer en cuanto el texto acumulado trae
+    proveedor, Nº y fecha; el resto de páginas vienen como ("", "omitida").
+    Si no llega a completarse, lo leído se reutiliza para la escalera de OCR.
+    """
+    if not os.path.exists(ruta_archivo):
+        return None, "Archivo no encontrado"
+
+    workers = workers or OCR_WORKERS
+
+    if hasta_completar:
+        paginas = _extraer_hasta_completar(ruta_archivo, modo, workers)
+        if paginas is not None:
+            return paginas, None
+
+    # ==========================================
+    # MODO 1: OCR VISUAL (todas las páginas)
+    # ==========================================
+    if modo == MODO_OCR:
+        error = comprobar_motores_ocr()
+        if error:
+            return None, error
+        try:
+            print(f"   👁️ Motor OCR arrancando... (Procesando imagen)")
+            return ocr_documento(ruta_archivo, workers, tam_bloque=RASTER_TAM_BLOQUE,
+                                 a_escalar=_escalar_documento({})), None
         except Exception as e:
             return None, f"Fallo Crítico Motor OCR: {str(e)}"
 
     # ==========================================
-    # MODO 2: NATIVO
+    # MODO 2: NATIVO (y base del modo AUTO)
     # ==========================================
     try:
         reader = PdfReader(ruta_archivo)
-        texto_completo = ""
         if reader.is_encrypted:
             try:
                 reader.decrypt("")
             except:
                 return None, "PDF Encriptado"
 
-        for page in reader.pages:
-            t = page.extract_text()
-            if t: texto_completo += t + "\n"
+        paginas = []
+        with span("pdf.nativo"):
+            for page in reader.pages:
+                t = page.extract_text() or ""
+                paginas.append((t, "nativo" if t.strip() else "vacio"))
+    except Exception as e:
+        return None, f"Error lectura nativa: {str(e)}"
+
+    # ==========================================
+    # MODO 3: AUTO -> OCR solo donde el texto nativo no sirve
+    # ==========================================
+    if modo == MODO_AUTO:
+        a_ocr = [i for i, (t, _) in enumerate(paginas) if not evaluar_texto_nativo(t)]
+        error = comprobar_motores_ocr() if a_ocr else None
+        if error:
+            print(f"   ⚠️ OCR no disponible ({error}). Se usa solo el texto nativo.")
+        elif a_ocr:
+            try:
+                nativas = {i: t for i, (t, _) in enumerate(paginas) if i not in a_ocr}
+                leidas = ocr_documento(ruta_archivo, workers, a_ocr, tam_bloque=RASTER_TAM_BLOQUE,
+                                       a_escalar=_escalar_documento(nativas))
+                for i, (texto, metodo) in zip(a_ocr, leidas):
+                    if texto.strip() or (metodo == "error" and not paginas[i][0].strip()):
+                        paginas[i] = (texto, metodo)
+            except Exception as e:
+                return None, f"Fallo Crítico Motor OCR: {str(e)}"
 
-        if len(texto_completo.strip()) < 10:
-            return None, "PDF vacío o imagen (Activa OCR)"
+    return paginas, None
 
-        return texto_completo, None
 
-    except Exception as e:
-        return None, f"Error lectura nativa: {str(e)}"
\ No newline at end of file
+def extraer_texto_pdf(ruta_archivo, forzar_ocr=False, workers=None, modo=None, hasta_completar=False):
+    """
+    Extrae texto del PDF.
+    - Modo Rápido (Default): Usa pypdf.
+    - Modo OCR (forzar_ocr=True): Usa Tesseract + Pre-procesamiento de imagen.
+      Las páginas se reparten entre `workers` procesos (por defecto OCR_WORKERS)
+      y las ya leídas antes se sirven desde la caché OCR.
+    - modo=MODO_AUTO: pypdf en cada página y OCR solo en las que lo necesitan.
+    - hasta_completar=True: se para en cuanto aparecen proveedor, Nº y fecha
+      (el texto retornado es solo el de las páginas leídas).
+    """
+    modo = modo or (MODO_OCR if forzar_ocr else MODO_NATIVO)
+
+    paginas, error = extraer_paginas_pdf(ruta_archivo, modo=modo, workers=workers,
+                                         hasta_completar=hasta_completar)
+    if error:
+        return None, error
+
+    texto_completo = "".join(t + "\n" for t, _ in paginas if t)
+
+    if modo == MODO_OCR and not texto_completo.strip():
+        return None, "OCR: Imagen vacía o ilegible."
+    if len(texto_completo.strip()) < 10:
+        return None, "PDF vacío o imagen (Activa OCR)" if modo == MODO_NATIVO else "OCR: Imagen vacía o ilegible."
+
+    return texto_completo, None
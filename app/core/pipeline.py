@@ -0,0 +1,423 @@
+import os
+import queue
+import shutil
+import threading
+import time
+from pypdf import PdfReader
+from app.core.splitter import dividir_pdf_por_proveedor, documento_sin_dividir, reconstruir_fragmentos
+from app.core.parser import analizar_documento
+from app.core.file_manager import mover_y_renombrar, calcular_destino, IndiceDirectorios, en_revision, va_a_revision
+from app.core.diario import obtener_diario, huella_archivo, COMPLETADO, MOVIENDO, MOVIDO
+from app.core.indice_salida import obtener_indice, huella_documento, clave_documento
+from app.utils.logger import registrar_evento, vaciar_historial
+from app.utils.metrics import iniciar_ejecucion, terminar_ejecucion, documento, span, perfilar
+from app.config import (PIPELINE_WORKERS_DIVISION, PIPELINE_WORKERS_EXTRACCION,
+                        PIPELINE_WORKERS_ANALISIS, PIPELINE_TAM_COLA, PIPELINE_DIVIDIR_LOTES,
+                        METRICAS_INFORME_PATH, PERFIL_UMBRAL_S, PERFIL_DIR)
+
+# Marca de fin de cola entre etapas
+_FIN = object()
+
+
+class _Tarea:
+    """Un PDF de entrada viajando por las etapas del pipeline."""
+
+    def __init__(self, indice, ruta):
+        self.indice = indice  # Orden de llegada: el escritor confirma en este orden
+        self.ruta = ruta
+        self.nombre = os.path.basename(ruta)
+        self.fragmentos = []
+        self.textos = []  # (texto, error) por fragmento
+        self.analisis = []  # dict de analizar_documento por fragmento
+        self.error = None  # Fallo que invalida todo el archivo (ej: al dividir)
+        self.huella = None  # sha256 del PDF (clave en el diario)
+        self.ya_procesado = False  # Terminado en una ejecución anterior
+        self.duplicado = None  # Ruta del documento ya guardado con el mismo contenido
+        self.anotados = {}  # (pagina_inicio, pagina_fin) -> (estado, ruta_final) según el diario
+
+
+class PipelineLotes:
+    """
+    Procesa un lote de PDFs en etapas encadenadas con colas acotadas:
+
+        dividir -> extraer -> analizar -> mover/registrar
+
+    Cada etapa tiene su propio grupo de hilos. La última etapa es un único
+    escritor que confirma los archivos en el orden de entrada, de modo que los
+    choques de nombre en mover_y_renombrar se resuelven siempre igual.
+
+    Con reanudar=True cada paso queda anotado en el diario (app/core/diario.py):
+    los archivos ya terminados se saltan y los que se quedaron a medias siguen
+    desde el último documento movido, reutilizando el texto ya extraído.
+    Un archivo con algún documento en Revision_Manual no se da por terminado:
+    en cada ejecución esos documentos se vuelven a analizar y, si ya los
+    reconoce alguna regla, pasan a su carpeta y salen de revisión.
+
+    Lo ya guardado en la carpeta de salida está en app/core/indice_salida.py:
+    un PDF idéntico a un documento guardado se descarta antes de dividirlo
+    (sin OCR) y cada documento se compara antes de escribirlo. Con
+    filtrar_duplicados=False se procesa todo igualmente (y se sigue indexando).
+
+    Con dividir=False cada PDF es un solo documento (no se buscan cortes) y se
+    lee solo hasta tener proveedor, Nº y fecha (splitter.documento_sin_dividir).
+
+    Los tiempos de cada etapa (y de lo que hay dentro: pypdf, OCR, regex,
+    escritura...) se recogen con app/utils/metrics.py y se guardan en un
+    informe JSON al terminar (`ruta_informe`).
+
+    log, estado y progreso(archivos_terminados, paginas_terminadas) se llaman
+    desde los hilos del pipeline: quien pinte en una interfaz debe encolarlos.
+    """
+
+    def __init__(self, carpeta_salida, usar_ocr=False,
+                 workers_division=PIPELINE_WORKERS_DIVISION,
+                 workers_extraccion=PIPELINE_WORKERS_EXTRACCION,
+                 workers_analisis=PIPELINE_WORKERS_ANALISIS,
+                 tam_cola=PIPELINE_TAM_COLA, dividir=PIPELINE_DIVIDIR_LOTES,
+                 log=print, estado=None, progreso=None, reanudar=True, filtrar_duplicados=True,
+                 ruta_informe=METRICAS_INFORME_PATH, umbral_perfil=PERFIL_UMBRAL_S):
+        self.carpeta_salida = carpeta_salida
+        self.usar_ocr = usar_ocr
+        self.workers_division = max(1, workers_division)
+        self.workers_extraccion = max(1, workers_extraccion)
+        self.workers_analisis = max(1, workers_analisis)
+        self.tam_cola = max(1, tam_cola)
+        self.dividir = dividir
+        self.log = log
+        self.estado = estado or (lambda texto: None)
+        self.progreso = progreso or (lambda archivos, paginas: None)
+        self.temp_split_dir = os.path.join(carpeta_salida, "_TEMP_SPLIT")
+        self.diario = obtener_diario() if reanudar else None
+        self.indice = obtener_indice()
+        self.filtrar_duplicados = filtrar_duplicados
+        self.ruta_informe = ruta_informe
+        self.umbral_perfil = umbral_perfil
+        self._detener = threading.Event()
+        self._terminados = 0
+        self._directorios = None
+
+    def detener(self):
+        """Deja de admitir archivos nuevos; lo que ya está dentro termina."""
+        self._detener.set()
+
+    # --- EJECUCIÓN ---
+
+    def ejecutar(self, rutas_pdf):
+        """
+        Procesa los PDFs. `rutas_pdf` puede ser cualquier iterable (ej:
+        VigilanteCarpeta.rutas()): se consume según el pipeline admite archivos.
+        Retorna un resumen:
+        {"archivos": n, "procesados": n, "errores": n, "omitidos": n, "duplicados": n,
+         "revision": n (documentos en Revision_Manual, nuevos o que siguen ahí), "paginas": n,
+         "duracion": segundos,
+         "tiempos_etapa": {etapa: segundos acumulados},
+         "rutas": {"nativo"|"ocr"|"cache"|"vacio"|"error"|"omitida": nº de páginas},
+         "metricas": informe de app/utils/metrics.py}
+        """
+        t_inicio = time.perf_counter()
+        resumen = {"archivos": 0, "procesados": 0, "errores": 0, "omitidos": 0, "duplicados": 0, "revision": 0,
+                   "paginas": 0, "duracion": 0.0,
+                   "tiempos_etapa": {},
+                   "rutas": {"nativo": 0, "ocr": 0, "cache": 0, "vacio": 0, "error": 0, "omitida": 0}}
+        metricas = iniciar_ejecucion()
+        self._terminados = 0
+        # Carpetas de destino leídas una vez por ejecución (ver IndiceDirectorios)
+        self._directorios = IndiceDirectorios()
+
+        cola_division = queue.Queue(self.tam_cola)
+        cola_extraccion = queue.Queue(self.tam_cola)
+        cola_analisis = queue.Queue(self.tam_cola)
+        cola_escritura = queue.Queue(self.tam_cola)
+
+        try:
+            self._lanzar_etapa("division", self._dividir, cola_division, cola_extraccion, self.workers_division)
+            self._lanzar_etapa("extraccion", self._extraer, cola_extraccion, cola_analisis, self.workers_extraccion)
+            self._lanzar_etapa("analisis", self._analizar, cola_analisis, cola_escritura, self.workers_analisis)
+            threading.Thread(target=self._alimentar, args=(rutas_pdf, cola_division, resumen),
+                             name="pipeline-entrada", daemon=True).start()
+
+            self._escribir(cola_escritura, resumen)
+        except Exception as e:
+            self.log(f"❌ ERROR GENERAL: {str(e)}")
+            resumen["errores"] += 1
+        finally:
+            with span("historial.vaciar"):
+                vaciar_historial()
+            # Limpieza
+            if os.path.exists(self.temp_split_dir):
+                try:
+                    shutil.rmtree(self.temp_split_dir)
+                except:
+                    pass
+
+        resumen["duracion"] = time.perf_counter() - t_inicio
+        terminar_ejecucion(metricas)
+        resumen["tiempos_etapa"] = {etapa: metricas.total(f"pipeline.{etapa}")
+                                    for etapa in ("division", "extraccion", "analisis", "escritura")}
+        datos = {clave: resumen[clave] for clave in ("archivos", "procesados", "errores", "omitidos", "duplicados",
+                                                     "revision", "rutas")}
+        resumen["metricas"] = metricas.informe(**datos)
+        if self.ruta_informe:
+            try:
+                metricas.guardar(self.ruta_informe, **datos)
+            except OSError as e:
+                self.log(f"⚠️ No se pudo guardar el informe de tiempos: {e}")
+        return resumen
+
+    def _alimentar(self, rutas_pdf, cola, resumen):
+        for indice, ruta in enumerate(rutas_pdf):
+            if self._detener.is_set():
+                break
+            cola.put(_Tarea(indice, ruta))  # Bloquea si la etapa va saturada
+            resumen["archivos"] += 1
+        cola.put(_FIN)
+
+    def _lanzar_etapa(self, nombre, funcion, entrada, salida, workers):
+        hilos = [
+            threading.Thread(target=self._bucle_etapa, args=(nombre, funcion, entrada, salida),
+                             name=f"pipeline-{nombre}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for hilo in hilos:
+            hilo.start()
+
+        def cerrar():
+            # Cuando todos los hilos de la etapa acaban, avisamos a la siguiente
+            for hilo in hilos:
+                hilo.join()
+            salida.put(_FIN)
+
+        threading.Thread(target=cerrar, name=f"pipeline-{nombre}-cierre", daemon=True).start()
+
+    def _bucle_etapa(self, nombre, funcion, entrada, salida):
+        while True:
+            tarea = entrada.get()
+            if tarea is _FIN:
+                entrada.put(_FIN)  # Para que lo vean los demás hilos de la etapa
+                return
+            if tarea.error is None:
+                with documento(tarea.nombre), self._perfilar(tarea, nombre), span(f"pipeline.{nombre}"):
+                    try:
+                        funcion(tarea)
+                    except Exception as e:
+                        tarea.error = str(e)
+            salida.put(tarea)
+
+    def _perfilar(self, tarea, etapa):
+        return perfilar(f"{tarea.indice:05d}_{tarea.nombre}_{etapa}", self.umbral_perfil, PERFIL_DIR)
+
+    # --- ETAPAS ---
+
+    def _dividir(self, tarea):
+        self.estado(f"Procesando: {tarea.nombre}...")
+        # Los fragmentos se quedan en memoria; solo los enormes se vuelcan a disco.
+        # Carpeta temporal propia por archivo (se crea solo si hace falta): dos
+        # lotes en paralelo generan los mismos nombres SPLIT_PagN_<Proveedor>.pdf
+        carpeta = os.path.join(self.temp_split_dir, f"{tarea.indice:05d}")
+        try:
+            if self.diario:
+                tarea.huella = huella_archivo(tarea.ruta)
+                anterior = self.diario.archivo(tarea.huella, self.carpeta_salida)
+                if anterior and anterior["estado"] == COMPLETADO:
+                    tarea.ya_procesado = True
+                    return
+                registros = self.diario.fragmentos(tarea.huella, self.carpeta_salida)
+                # Ejecución anterior interrumpida: mismo corte y mismos textos.
+                # Si entonces no se usó OCR y ahora sí, o alguna página falló en
+                # el OCR, se vuelve a cortar (lo ya leído sale de la caché OCR).
+                fallidas = any("error" in r["metodos"] for r in registros)
+                if registros and (anterior["ocr"] or not self.usar_ocr) and not fallidas:
+                    tarea.fragmentos = reconstruir_fragmentos(tarea.ruta, registros, carpeta)
+                    self._cargar_anotados(tarea, registros)
+                    return
+
+            if self.indice and self.filtrar_duplicados:
+                # Ya guardado tal cual (ej: el mismo PDF dejado otra vez): ni dividir ni OCR
+                tarea.duplicado = self.indice.buscar(self.carpeta_salida, huella=self._huella_pdf(tarea.ruta))
+                if tarea.duplicado:
+                    return
+
+            if self.dividir:
+                tarea.fragmentos = dividir_pdf_por_proveedor(tarea.ruta, carpeta, usar_ocr=self.usar_ocr)
+            else:
+                tarea.fragmentos = documento_sin_dividir(tarea.ruta, carpeta, usar_ocr=self.usar_ocr)
+            if self.diario:
+                self.diario.registrar_division(tarea.huella, self.carpeta_salida, tarea.ruta, tarea.fragmentos,
+                                               ocr=self.usar_ocr)
+                self._cargar_anotados(tarea, self.diario.fragmentos(tarea.huella, self.carpeta_salida))
+        except Exception as e:
+            tarea.error = f"💥 Error crítico dividiendo {tarea.nombre}: {e}"
+
+    @staticmethod
+    def _huella_pdf(ruta):
+        try:
+            with span("indice.huella"):
+                return huella_documento(PdfReader(ruta).pages)
+        except Exception:
+            return None  # Si no se puede leer, ya lo dirá el splitter
+
+    @staticmethod
+    def _cargar_anotados(tarea, registros):
+        tarea.anotados = {(r["pagina_inicio"], r["pagina_fin"]): (r["estado"], r["ruta_final"]) for r in registros}
+
+    def _extraer(self, tarea):
+        # El splitter ya trae el texto de cada página (nativo u OCR): no se relee el PDF
+        for fragmento in tarea.fragmentos:
+            texto, error = fragmento.texto, None
+            if len(texto.strip()) < 10:
+                error = "OCR: Imagen vacía o ilegible." if self.usar_ocr else "PDF vacío o imagen (Activa OCR)"
+            tarea.textos.append((texto, error))
+
+    def _analizar(self, tarea):
+        for texto, error in tarea.textos:
+            tarea.analisis.append(None if error else analizar_documento(texto))
+
+    # --- ESCRITOR ÚNICO Y ORDENADO ---
+
+    def _escribir(self, cola, resumen):
+        pendientes = {}
+        siguiente = 0
+        while True:
+            tarea = cola.get()
+            if tarea is _FIN:
+                break
+            pendientes[tarea.indice] = tarea
+            while siguiente in pendientes:
+                self._confirmar_medido(pendientes.pop(siguiente), resumen)
+                siguiente += 1
+
+        # No debería quedar nada, pero nunca perdemos un archivo por el orden
+        for indice in sorted(pendientes):
+            self._confirmar_medido(pendientes[indice], resumen)
+
+    def _confirmar_medido(self, tarea, resumen):
+        with documento(tarea.nombre), self._perfilar(tarea, "escritura"), span("pipeline.escritura"):
+            self._confirmar(tarea, resumen)
+        resumen["paginas"] += sum(fragmento.num_paginas for fragmento in tarea.fragmentos)
+        self._terminados += 1
+        self.progreso(self._terminados, resumen["paginas"])
+
+    def _confirmar(self, tarea, resumen):
+        if tarea.error:
+            self.log(tarea.error)
+            resumen["errores"] += 1
+            return
+
+        if tarea.ya_procesado:
+            self.log(f"   ⏭️ {tarea.nombre}: ya procesado en una ejecución anterior")
+            resumen["omitidos"] += 1
+            return
+
+        if tarea.duplicado:
+            self.log(f"   ♻️ {tarea.nombre}: duplicado de {os.path.basename(tarea.duplicado)}, no se guarda")
+            registrar_evento(tarea.nombre, {}, tarea.duplicado, True, duplicado=True)
+            resumen["duplicados"] += 1
+            if self.diario and tarea.huella:
+                self.diario.completar_archivo(tarea.huella, self.carpeta_salida)
+            return
+
+        for fragmento in tarea.fragmentos:
+            for metodo in fragmento.metodos:
+                resumen["rutas"][metodo] = resumen["rutas"].get(metodo, 0) + 1
+
+        completo = True
+        for fragmento, (texto, error), datos in zip(tarea.fragmentos, tarea.textos, tarea.analisis):
+            nombre_sub = fragmento.nombre
+            if error:
+                self.log(f"   ⚠️ Error lectura {nombre_sub}: {error}")
+                resumen["errores"] += 1
+                completo = False  # Que se reintente (ej: la próxima vez con OCR)
+                continue
+
+            estado_previo, ruta_reservada = tarea.anotados.get((fragmento.pagina_inicio, fragmento.pagina_fin),
+                                                               (None, None))
+            ya_movido = estado_previo == MOVIDO or (estado_previo == MOVIENDO and os.path.exists(ruta_reservada))
+            en_revision_previa = None
+            if ya_movido and en_revision(self.carpeta_salida, ruta_reservada):
+                if va_a_revision(datos):
+                    # Sigue sin regla que lo reconozca: se queda donde está
+                    self.log(f"   ⏭️ {nombre_sub}: sigue en revisión ({os.path.basename(ruta_reservada)})")
+                    resumen["omitidos"] += 1
+                    resumen["revision"] += 1
+                    completo = False
+                    continue
+                # Ahora sí se clasifica (ej: regla nueva en proveedores.json): se mueve a su carpeta
+                en_revision_previa, estado_previo, ya_movido = ruta_reservada, None, False
+            if ya_movido:
+                # Ya está en su sitio desde la ejecución anterior
+                self._anotar(tarea, fragmento, MOVIDO, ruta_reservada)
+                self.log(f"   ⏭️ {nombre_sub}: ya movido a {os.path.basename(ruta_reservada)}")
+                resumen["omitidos"] += 1
+                continue
+
+            huella, clave = None, None
+            if self.indice:
+                try:
+                    with span("indice.huella"):
+                        huella = fragmento.huella_contenido()
+                except Exception:
+                    pass
+                clave = clave_documento(datos)
+                existente = None
+                if self.filtrar_duplicados:
+                    existente = self.indice.buscar(self.carpeta_salida, huella=huella, clave=clave)
+                if existente:
+                    # Mismo contenido, o mismo albarán (proveedor + Nº + fecha) escaneado otra vez
+                    self._anotar(tarea, fragmento, MOVIDO, existente)
+                    self.log(f"   ♻️ {nombre_sub}: duplicado de {os.path.basename(existente)}, no se guarda")
+                    if en_revision_previa:
+                        self._retirar_de_revision(en_revision_previa)
+                    registrar_evento(f"{tarea.nombre} -> {nombre_sub}", datos, existente, True, duplicado=True)
+                    resumen["duplicados"] += 1
+                    continue
+
+            if datos.get("proveedor_detectado"):
+                self.log(f"   ✅ {datos['proveedor_detectado']} | Doc: {datos.get('id_documento', 'N/A')}")
+            else:
+                self.log(f"   ❓ {nombre_sub} -> Desconocido")
+
+            # Mover (reservando antes el destino en el diario)
+            ruta_destino = ruta_reservada if estado_previo == MOVIENDO else None
+            if self.diario and ruta_destino is None:
+                try:
+                    ruta_destino = calcular_destino(fragmento, datos, self.carpeta_salida, self._directorios)
+                    self._anotar(tarea, fragmento, MOVIENDO, ruta_destino)
+                except Exception:
+                    ruta_destino = None
+            exito, ruta_final = mover_y_renombrar(fragmento, datos, self.carpeta_salida, ruta_destino,
+                                                  self._directorios)
+            if exito:
+                self._anotar(tarea, fragmento, MOVIDO, ruta_final)
+                if self.indice and huella:
+                    self.indice.registrar(self.carpeta_salida, ruta_final, huella, clave)
+                if en_revision_previa:
+                    self._retirar_de_revision(en_revision_previa)
+                # Lo que va a Revision_Manual deja el archivo pendiente: la próxima
+                # ejecución lo vuelve a analizar (con el texto guardado en el diario)
+                if en_revision(self.carpeta_salida, ruta_final):
+                    resumen["revision"] += 1
+                    completo = False
+            else:
+                self.log(f"   ❌ No se pudo guardar {nombre_sub}: {ruta_final}")
+                resumen["errores"] += 1
+                completo = False
+
+            # Registrar
+            registrar_evento(f"{tarea.nombre} -> {nombre_sub}", datos, ruta_final, exito)
+            resumen["procesados"] += 1
+
+        if self.diario and tarea.huella and completo:
+            self.diario.completar_archivo(tarea.huella, self.carpeta_salida)
+
+    def _retirar_de_revision(self, ruta):
+        try:
+            os.remove(ruta)
+            self.log(f"   🧹 Reclasificado: se retira {os.path.basename(ruta)} de revisión")
+        except FileNotFoundError:
+            pass  # Ya lo quitó alguien a mano
+        except OSError as e:
+            self.log(f"   ⚠️ No se pudo retirar {os.path.basename(ruta)} de revisión: {e}")
+
+    def _anotar(self, tarea, fragmento, estado, ruta_final):
+        if self.diario and tarea.huella:
+            self.diario.marcar_fragmento(tarea.huella, self.carpeta_salida, fragmento, estado, ruta_final)
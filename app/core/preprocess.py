@@ -0,0 +1,83 @@
+# Importación condicional
+try:
+    from PIL import ImageFilter
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Receta de mejora de imagen común a pdf_processor y splitter
+PARAMETROS_PREPROCESO = {
+    "contraste": 2,
+    "enfoque": True,
+    "umbral": 10,  # [CRÍTICO] Umbral 10 descubierto en pruebas: elimina fondos grises (Europart)
+}
+
+
+# Cambia cuando el resultado de preprocesar_imagen cambia para la misma receta:
+# forma parte de la clave de la caché OCR, así no se mezclan lecturas de versiones
+# distintas. 2: vuelve al orden original contraste -> enfoque -> umbral (idéntico
+# bit a bit a la receta de siempre; la 1 enfocaba antes del contraste).
+VERSION_PREPROCESO = 2
+
+
+def tabla_contraste(media, contraste):
+    """
+    LUT de 256 entradas equivalente a ImageEnhance.Contrast(img).enhance(contraste)
+    (Image.blend contra un gris liso de la media, recortado a 0..255):
+
+        v = media + contraste * (x - media)
+    """
+    tabla = []
+    for x in range(256):
+        v = int(media + contraste * (x - media))
+        tabla.append(0 if v < 0 else 255 if v > 255 else v)
+    return tabla
+
+
+def tabla_umbral(umbral):
+    """LUT de img.point(lambda x: 0 if x < umbral else 255)."""
+    return [0 if x < umbral else 255 for x in range(256)]
+
+
+def tabla_contraste_umbral(media, contraste, umbral):
+    """Contraste y umbral en una sola tabla (solo vale si no hay nada entre medias)."""
+    umbralizar = tabla_umbral(umbral)
+    return [umbralizar[v] for v in tabla_contraste(media, contraste)]
+
+
+def media_gris(img):
+    """
+    Brillo medio de una imagen 'L' a partir de su histograma, redondeado como
+    lo hace ImageEnhance.Contrast (ImageStat: int(media + 0.5)).
+    """
+    histograma = img.histogram()
+    total = sum(histograma)
+    if not total:
+        return 0
+    return int(sum(i * n for i, n in enumerate(histograma)) / total + 0.5)
+
+
+def preprocesar_imagen(img, contraste=2, enfoque=True, umbral=10):
+    """
+    Prepara una página para Tesseract y la devuelve binarizada (modo '1').
+
+    Mismo resultado, bit a bit, que la receta de siempre (gris -> contraste ->
+    enfoque -> umbral), con menos pasadas y sin copias intermedias:
+      1. Gris solo si hace falta (el rasterizador ya la entrega en 'L').
+      2. Contraste con una tabla de consulta (sin la imagen gris de ImageEnhance).
+      3. Enfoque (filtro 3x3) y umbral con otra tabla; sin enfoque, contraste
+         y umbral van en una sola.
+    El enfoque no se puede adelantar al contraste: el recorte a 0..255 del
+    contraste cambia los bordes y con ellos ~1,5 % de los píxeles binarizados.
+    """
+    if img.mode != 'L':
+        img = img.convert('L')
+
+    media = media_gris(img)
+    if not enfoque:
+        return img.point(tabla_contraste_umbral(media, contraste, umbral), '1')
+
+    img = img.point(tabla_contraste(media, contraste))
+    img = img.filter(ImageFilter.SHARPEN)
+    return img.point(tabla_umbral(umbral), '1')
@@ -1,6 +1,7 @@
 import json
 import os
 from app.config import PROVIDERS_JSON_PATH
+from app.core.rule_engine import obtener_motor
 
 
 def cargar_proveedores():
@@ -33,6 +34,8 @@ def _escribir_json(datos):
     try:
         with open(PROVIDERS_JSON_PATH, 'w', encoding='utf-8') as f:
             json.dump(datos, f, indent=4, ensure_ascii=False)
+        # El motor de reglas relee el JSON en la siguiente consulta
+        obtener_motor().invalidar()
         return True
     except Exception as e:
         print(f"❌ Error guardando JSON: {e}")
@@ -0,0 +1,103 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+from app.config import POPPLER_PATH, RASTER_A_DISCO, RASTER_PREFETCH
+from app.utils.metrics import span
+
+# Importación condicional
+try:
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    RASTER_AVAILABLE = True
+except ImportError:
+    RASTER_AVAILABLE = False
+
+_FIN = object()
+
+
+def _bloques(paginas, tam_bloque):
+    """Agrupa índices 0-based en rangos contiguos de como mucho tam_bloque páginas."""
+    bloques = []
+    for i in paginas:
+        if bloques and bloques[-1][1] == i - 1 and i - bloques[-1][0] < tam_bloque:
+            bloques[-1] = (bloques[-1][0], i)
+        else:
+            bloques.append((i, i))
+    return bloques
+
+
+def renderizar_paginas(ruta_pdf, paginas, dpi=200, gris=True, a_disco=RASTER_A_DISCO,
+                       tam_bloque=1, prefetch=RASTER_PREFETCH):
+    """
+    Generador que rasteriza las páginas indicadas (índices 0-based) de una en una:
+        for indice, img in renderizar_paginas(ruta, [0, 1, 2]): ...
+
+    - Renderiza directamente en escala de grises (gris=True) al DPI pedido.
+    - Un hilo prepara la(s) siguiente(s) página(s) mientras se procesa la actual,
+      con como mucho `prefetch` páginas esperando: la memoria no crece con el documento.
+    - a_disco=True: Poppler escribe la imagen en un temporal y solo se abre al usarla.
+    - tam_bloque > 1: varias páginas contiguas por cada llamada a pdftoppm.
+    """
+    paginas = list(paginas)
+    if not paginas:
+        return
+
+    cola = queue.Queue(max(1, prefetch))
+    parar = threading.Event()
+    carpeta_tmp = tempfile.mkdtemp(prefix="docengine_raster_") if a_disco else None
+
+    def producir():
+        try:
+            for primera, ultima in _bloques(paginas, max(1, tam_bloque)):
+                if parar.is_set():
+                    break
+                opciones = dict(dpi=dpi, first_page=primera + 1, last_page=ultima + 1,
+                                grayscale=gris, poppler_path=POPPLER_PATH)
+                with span("raster.pdftoppm"):
+                    if carpeta_tmp:
+                        rutas = convert_from_path(ruta_pdf, output_folder=carpeta_tmp, paths_only=True, **opciones)
+                        resultados = sorted(rutas)
+                    else:
+                        resultados = convert_from_path(ruta_pdf, **opciones)
+
+                for indice, resultado in zip(range(primera, ultima + 1), resultados):
+                    if parar.is_set():
+                        break
+                    cola.put((indice, resultado))
+        except Exception as e:
+            cola.put(e)
+        finally:
+            cola.put(_FIN)
+
+    hilo = threading.Thread(target=producir, name="rasterizador", daemon=True)
+    hilo.start()
+
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                break
+            if isinstance(elemento, Exception):
+                raise elemento
+
+            indice, resultado = elemento
+            if carpeta_tmp:
+                img = Image.open(resultado)
+                img.load()  # Lee los píxeles y suelta el archivo
+                yield indice, img
+                os.remove(resultado)
+            else:
+                yield indice, resultado
+    finally:
+        # Si el consumidor se va antes de tiempo, liberamos al productor
+        parar.set()
+        while hilo.is_alive():
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if carpeta_tmp:
+            shutil.rmtree(carpeta_tmp, ignore_errors=True)
@@ -0,0 +1,127 @@
+from app.core.parser import analizar_documento, documento_completo
+from app.core.preprocess import preprocesar_imagen
+from app.core.rule_engine import obtener_motor
+from app.core.ocr_cache import clave_ocr
+from app.config import OCR_ROI_ACTIVO, OCR_ROI_CABECERA
+from app.core.ocr_engine import motor_ocr
+from app.utils.metrics import span
+
+# Margen (fracción de la altura) en el que buscamos una fila en blanco para cortar
+# sin partir una línea de texto por la mitad
+MARGEN_CORTE = 0.02
+
+
+class _BandaPendiente(Exception):
+    """La banda pedida no está en caché: hay que rasterizar la página."""
+
+
+def leer_por_regiones(leer_banda, roi_cabecera=OCR_ROI_CABECERA):
+    """
+    Estrategia "cabecera primero". `leer_banda(inicio, fin)` devuelve el texto
+    de la franja horizontal [inicio, fin) expresada en fracciones de la altura.
+
+    1. Lee la cabecera [0, roi_cabecera) y la analiza.
+    2. Si falta algo y el proveedor tiene "roi_cabecera" propio en proveedores.json
+       mayor que el general, lee hasta ahí y vuelve a analizar.
+    3. Si aún falta algo, lee el resto de la página.
+
+    Retorna (texto, fraccion_leida).
+    """
+    texto = leer_banda(0.0, roi_cabecera)
+    datos = analizar_documento(texto)
+    if documento_completo(datos):
+        return texto, roi_cabecera
+
+    fin = roi_cabecera
+    regla = obtener_motor().reglas().get(datos.get("proveedor_detectado"))
+    pista = regla.roi_cabecera if regla else None
+    if pista and fin < pista < 1.0:
+        texto += "\n" + leer_banda(fin, pista)
+        fin = pista
+        if documento_completo(analizar_documento(texto)):
+            return texto, fin
+
+    texto += "\n" + leer_banda(fin, 1.0)
+    return texto, 1.0
+
+
+def _fila_de_corte(img_bin, fraccion):
+    """Fila en blanco más cercana al corte nominal (o el nominal si no hay ninguna)."""
+    alto = img_bin.height
+    nominal = int(alto * fraccion)
+    if fraccion <= 0.0 or fraccion >= 1.0:
+        return nominal
+    margen = int(alto * MARGEN_CORTE)
+    for d in range(margen + 1):
+        for y in (nominal - d, nominal + d):
+            if 0 < y < alto and img_bin.crop((0, y, img_bin.width, y + 1)).histogram()[0] == 0:
+                return y
+    return nominal
+
+
+def clave_banda(huella, parametros, inicio, fin):
+    return clave_ocr(huella, {**parametros, "banda": [round(inicio, 4), round(fin, 4)]})
+
+
+def ocr_por_regiones(img, parametros, conocidas=None, roi=OCR_ROI_ACTIVO):
+    """
+    Pre-procesa la página y la lee por regiones (o entera si roi=False).
+    `conocidas` = {(inicio, fin): texto} con bandas ya leídas (ej: de la caché).
+    Retorna (texto, bandas_nuevas, fraccion_leida).
+    """
+    with span("ocr.preprocesado"):
+        img_bin = preprocesar_imagen(img, contraste=parametros["contraste"],
+                                     enfoque=parametros["enfoque"], umbral=parametros["umbral"])
+    motor = motor_ocr()
+
+    if not roi:
+        with span("ocr.tesseract"):
+            return motor.leer(img_bin, parametros["lang"], parametros["psm"]), {}, 1.0
+
+    conocidas = conocidas or {}
+    nuevas = {}
+
+    def leer_banda(inicio, fin):
+        if (inicio, fin) in conocidas:
+            return conocidas[(inicio, fin)]
+        recorte = img_bin.crop((0, _fila_de_corte(img_bin, inicio), img_bin.width, _fila_de_corte(img_bin, fin)))
+        with span("ocr.tesseract"):
+            texto = motor.leer(recorte, parametros["lang"], parametros["psm"])
+        nuevas[(inicio, fin)] = texto
+        return texto
+
+    texto, fraccion = leer_por_regiones(leer_banda)
+    return texto, nuevas, fraccion
+
+
+def texto_desde_cache(cache, huella, parametros, roi=OCR_ROI_ACTIVO):
+    """
+    Intenta resolver la página solo con bandas guardadas en caché.
+    Retorna (texto o None, bandas_conocidas) -> si el texto es None hay que
+    rasterizar, pero las bandas conocidas se reaprovechan.
+    """
+    conocidas = {}
+    if not roi:
+        texto = cache.obtener(clave_ocr(huella, parametros))
+        return texto, conocidas
+
+    def leer_banda(inicio, fin):
+        texto = cache.obtener(clave_banda(huella, parametros, inicio, fin))
+        if texto is None:
+            raise _BandaPendiente()
+        conocidas[(inicio, fin)] = texto
+        return texto
+
+    try:
+        texto, _ = leer_por_regiones(leer_banda)
+        return texto, conocidas
+    except _BandaPendiente:
+        return None, conocidas
+
+
+def guardar_en_cache(cache, huella, parametros, texto, bandas_nuevas, roi=OCR_ROI_ACTIVO):
+    if not roi:
+        cache.guardar(clave_ocr(huella, parametros), texto)
+        return
+    for (inicio, fin), texto_banda in bandas_nuevas.items():
+        cache.guardar(clave_banda(huella, parametros, inicio, fin), texto_banda)
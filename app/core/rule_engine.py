@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from app.config import PROVIDERS_JSON_PATH, PROVIDERS_RELOAD_INTERVAL
+from app.core.fuzzy_index import IndiceFirmasDifuso
+from app.core.matcher import AutomataFirmas
+
+FLAGS_REGEX = re.IGNORECASE | re.MULTILINE
+
+
+class ReglaProveedor:
+    """Reglas de un proveedor ya preparadas: firmas en minúsculas y regex compiladas."""
+
+    def __init__(self, nombre, reglas):
+        self.nombre = nombre
+        self.datos = reglas
+        self.firmas = [f.lower() for f in reglas.get("firma", []) if f]
+        self.patron_documento = _compilar(nombre, "patron_documento", reglas.get("patron_documento"))
+        self.patron_fecha = _compilar(nombre, "patron_fecha", reglas.get("patron_fecha"))
+        self.formato_fecha = reglas.get("formato_fecha_origen", "%d/%m/%Y")
+        self.carpeta_destino = reglas.get("carpeta_destino")
+        # Pista opcional: hasta qué fracción de la altura llegan sus datos (OCR por regiones)
+        self.roi_cabecera = reglas.get("roi_cabecera")
+
+
+def _compilar(nombre, clave, patron):
+    """Compila una regex del JSON. Si está mal escrita se avisa y se ignora."""
+    if not patron:
+        return None
+    try:
+        return re.compile(patron, FLAGS_REGEX)
+    except re.error as e:
+        print(f"❌ Regex inválida en {nombre}.{clave}: {e}")
+        return None
+
+
+class MotorReglas:
+    """
+    Motor de reglas de proveedores con recarga en caliente ("Hot-Swap").
+    - Lee y compila proveedores.json una sola vez (regex + autómata de firmas
+      + índice difuso para firmas deformadas por el OCR).
+    - Como mucho cada `intervalo` segundos mira el mtime/tamaño del archivo;
+      solo si ha cambiado lo relee, y solo recompila si su hash es distinto.
+    """
+
+    def __init__(self, ruta_json=PROVIDERS_JSON_PATH, intervalo=PROVIDERS_RELOAD_INTERVAL):
+        self.ruta_json = ruta_json
+        self.intervalo = intervalo
+        self._estado = _estado_vacio()  # (reglas, autómata, índice difuso): se sustituyen juntos
+        self._firma_archivo = None  # (mtime, tamaño)
+        self._hash = None
+        self._ultima_comprobacion = None
+        self._lock = threading.Lock()
+
+    def reglas(self):
+        """Devuelve {nombre: ReglaProveedor} en el orden del JSON (prioridad)."""
+        if self._toca_comprobar():
+            self.comprobar_cambios()
+        return self._estado[0]
+
+    def _toca_comprobar(self):
+        ultima = self._ultima_comprobacion
+        return ultima is None or time.monotonic() - ultima >= self.intervalo
+
+    def identificar(self, texto_min):
+        """
+        Busca todas las firmas en una sola pasada sobre el texto (ya en minúsculas).
+        Retorna (regla_elegida, coincidencias) donde coincidencias es una
+        lista de (posicion, proveedor, firma) en orden de aparición.
+
+        Política de desempate si firman varios proveedores:
+          1. Gana el que aparece antes en proveedores.json (prioridad histórica).
+          2. Dentro del mismo proveedor, la coincidencia más temprana en el texto.
+        """
+        self.reglas()  # Comprueba recarga
+        reglas, automata, _ = self._estado
+        coincidencias = automata.buscar(texto_min)
+        if not coincidencias:
+            return None, []
+
+        orden = {nombre: i for i, nombre in enumerate(reglas)}
+        elegido = min(coincidencias, key=lambda c: (orden[c[1]], c[0]))
+        return reglas[elegido[1]], coincidencias
+
+    def identificar_aproximado(self, texto):
+        """
+        Segunda fase, solo si identificar() no encontró nada: busca firmas con
+        ruido de OCR (confusión letra/dígito, espacios, 1-2 caracteres erróneos).
+        Retorna (regla_elegida, coincidencias) con coincidencias como lista de
+        (distancia, posicion, proveedor, firma).
+
+        Desempate: menor distancia, luego orden en proveedores.json, luego posición.
+        """
+        self.reglas()
+        reglas, _, indice = self._estado
+        coincidencias = indice.buscar(texto)
+        if not coincidencias:
+            return None, []
+
+        orden = {nombre: i for i, nombre in enumerate(reglas)}
+        elegido = min(coincidencias, key=lambda c: (c[0], orden[c[2]], c[1]))
+        return reglas[elegido[2]], coincidencias
+
+    def invalidar(self):
+        """Fuerza la comprobación del archivo en la próxima consulta."""
+        self._ultima_comprobacion = None
+
+    def comprobar_cambios(self, forzar=False):
+        with self._lock:
+            # Otro hilo puede haberlo comprobado mientras esperábamos el candado
+            if not forzar and not self._toca_comprobar():
+                return
+            try:
+                self._recargar_si_cambia()
+            finally:
+                # Se marca al terminar: hasta entonces el resto de hilos espera
+                # aquí en vez de ver unas reglas a medio cargar
+                self._ultima_comprobacion = time.monotonic()
+
+    def _recargar_si_cambia(self):
+        try:
+            st = os.stat(self.ruta_json)
+        except OSError:
+            self._estado = _estado_vacio()
+            self._firma_archivo, self._hash = None, None
+            return
+
+        firma_archivo = (st.st_mtime_ns, st.st_size)
+        if firma_archivo == self._firma_archivo:
+            return
+
+        try:
+            with open(self.ruta_json, 'rb') as f:
+                contenido = f.read()
+            hash_actual = hashlib.sha1(contenido).hexdigest()
+            if hash_actual != self._hash:
+                datos = json.loads(contenido.decode('utf-8'))
+                reglas = {nombre: ReglaProveedor(nombre, r) for nombre, r in datos.items()}
+                firmas = [(firma, nombre) for nombre, r in datos.items() for firma in r.get("firma", [])]
+                automata = AutomataFirmas((firma.lower(), nombre) for firma, nombre in firmas)
+                self._estado = (reglas, automata, IndiceFirmasDifuso(firmas))
+                self._hash = hash_actual
+            self._firma_archivo = firma_archivo
+        except Exception as e:
+            # Mantenemos las reglas anteriores para no romper un lote a medias
+            print(f"❌ Error crítico cargando proveedores: {e}")
+
+
+def _estado_vacio():
+    return {}, AutomataFirmas([]), IndiceFirmasDifuso([])
+
+
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def obtener_motor():
+    """Instancia compartida del motor de reglas (se crea la primera vez)."""
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = MotorReglas()
+    return _motor
+
+
+def _reiniciar_en_hijo():
+    # Los workers del pool OCR se crean con fork y consultan las reglas (OCR por
+    # regiones, escalera). Si un hilo del padre estaba recargando proveedores.json,
+    # los locks llegarían cogidos y el worker se quedaría esperando para siempre.
+    # Las reglas ya compiladas sí se heredan.
+    global _lock_motor
+    _lock_motor = threading.Lock()
+    if _motor is not None:
+        _motor._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
@@ -1,25 +1,126 @@
+from dataclasses import dataclass, field
+from io import BytesIO
 from pypdf import PdfReader, PdfWriter
-from app.core.parser import analizar_documento
-from app.config import TESSERACT_CMD, POPPLER_PATH
+from app.core.parser import analizar_documento, documento_completo
+from app.core.pdf_processor import (evaluar_texto_nativo, comprobar_motores_ocr, ocr_documento,
+                                    extraer_paginas_pdf, MODO_AUTO, MODO_NATIVO)
+from app.core.ocr_cache import obtener_cache, huella_pagina
+from app.core.indice_salida import huella_documento
+from app.core.file_manager import publicar_sin_pisar
+from app.core.preprocess import PARAMETROS_PREPROCESO
+from app.config import FRAGMENTO_MAX_MEMORIA_MB, OCR_WORKERS, RASTER_TAM_BLOQUE
+from app.utils.metrics import span
 import os
+import time
 
-# Importación condicional para OCR
-try:
-    import pytesseract
-    from pdf2image import convert_from_path
+# Receta del OCR del splitter. Forma parte de la clave de la caché.
+# Mismo pre-procesado que pdf_processor; solo cambia el modo de segmentación.
+PARAMETROS_OCR_SPLITTER = {
+    **PARAMETROS_PREPROCESO,
+    "dpi": 200,
+    "gris": True,
+    "psm": 6,  # Usamos psm 6 como acordamos (bloque de texto)
+    "lang": "spa",
+}
 
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
 
+@dataclass
+class Fragmento:
+    """
+    Documento individual resultante de cortar un lote.
+    Lleva consigo el texto ya extraído de cada página para que la fase de
+    clasificación no tenga que volver a leer (ni a pasar por OCR) el PDF.
 
-def dividir_pdf_por_proveedor(ruta_pdf_masivo, carpeta_temporal, usar_ocr=False):
+    Vive en memoria (índices de página sobre el lote ya abierto) y solo se
+    serializa al escribirlo en su destino final. Si el lote es muy grande,
+    todos sus fragmentos se vuelcan a temporales (`ruta`) y el lote no se
+    queda en memoria: pypdf lo tiene cargado entero mientras alguno lo use.
+    """
+    nombre: str  # SPLIT_Pag<N>_<Proveedor>.pdf (nombre si va a Revision_Manual)
+    ruta_lote: str  # PDF original del que sale
+    proveedor: str
+    pagina_inicio: int  # Índice 0-based de la primera página en el lote
+    pagina_fin: int  # Índice 0-based de la última página (inclusive)
+    textos: list = field(default_factory=list)  # Texto de cada página
+    # "nativo" | "ocr" | "cache" | "vacio" | "error" | "omitida" por página
+    metodos: list = field(default_factory=list)
+    tiempo_extraccion: float = 0.0  # Segundos invertidos en leer sus páginas
+    ruta: str = None  # Solo si se volcó a un temporal
+    reader: PdfReader = field(default=None, repr=False)  # Lote abierto (modo en memoria)
+
+    @property
+    def num_paginas(self):
+        return self.pagina_fin - self.pagina_inicio + 1
+
+    @property
+    def texto(self):
+        """Texto completo del fragmento (mismo formato que extraer_texto_pdf)"""
+        return "".join(t + "\n" for t in self.textos if t)
+
+    def _writer(self):
+        writer = PdfWriter()
+        for i in range(self.pagina_inicio, self.pagina_fin + 1):
+            writer.add_page(self.reader.pages[i])
+        return writer
+
+    def a_bytes(self):
+        """PDF del fragmento serializado (bajo demanda)."""
+        if self.ruta:
+            with open(self.ruta, "rb") as f:
+                return f.read()
+        buffer = BytesIO()
+        self._writer().write(buffer)
+        return buffer.getvalue()
+
+    def escribir(self, ruta_destino):
+        """
+        Escribe el fragmento en su destino final (una sola escritura).
+        Se escribe a un ".part" y se publica al terminar: si existe el destino,
+        el PDF está completo. Si el archivo ya existe lanza FileExistsError (sin
+        mirar antes: también si otro proceso lo crea mientras tanto, ver publicar_sin_pisar).
+        """
+        if self.ruta:
+            raise ValueError("Fragmento volcado a temporal: se mueve, no se escribe")
+        ruta_parcial = ruta_destino + ".part"
+        try:
+            with open(ruta_parcial, "wb") as f:
+                self._writer().write(f)
+            publicar_sin_pisar(ruta_parcial, ruta_destino)
+        except Exception:
+            # No dejamos PDFs a medias en la carpeta de destino
+            if os.path.exists(ruta_parcial):
+                os.remove(ruta_parcial)
+            raise
+
+    def huella_contenido(self):
+        """Huella de sus páginas (ver indice_salida.huella_documento)."""
+        if self.ruta:
+            return huella_documento(PdfReader(self.ruta).pages)
+        return huella_documento(self.reader.pages[i] for i in range(self.pagina_inicio, self.pagina_fin + 1))
+
+    def volcar(self, carpeta):
+        """Serializa el fragmento a un temporal y suelta la referencia al lote."""
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, self.nombre)
+        with open(ruta, "wb") as f:
+            self._writer().write(f)
+        self.ruta = ruta
+        self.reader = None
+
+
+def dividir_pdf_por_proveedor(ruta_pdf_masivo, carpeta_temporal=None, usar_ocr=False,
+                              max_memoria_mb=FRAGMENTO_MAX_MEMORIA_MB):
     """
     Recorre un PDF multipágina (Lote).
     Estrategia de Guillotina: Si detecta un proveedor en una página,
     asume que es el inicio de un nuevo documento.
 
-    Soporta OCR si usar_ocr=True y la página no tiene texto nativo.
+    Soporta OCR si usar_ocr=True y la página no tiene texto nativo fiable
+    (ver evaluar_texto_nativo): las páginas digitales nunca pasan por OCR y las
+    escaneadas se rasterizan y leen todas juntas antes de cortar.
+    Retorna una lista de Fragmento (con el texto de cada página ya extraído).
+    Los fragmentos se quedan en memoria salvo que el lote supere `max_memoria_mb`:
+    entonces todos se vuelcan a `carpeta_temporal` (ver _volcar_lote).
     """
     if not os.path.exists(ruta_pdf_masivo):
         return []
@@ -30,87 +131,195 @@ def dividir_pdf_por_proveedor(ruta_pdf_masivo, carpeta_temporal, usar_ocr=False)
         print(f"❌ Error abriendo lote PDF: {e}")
         return []
 
-    archivos_generados = []
-
-    writer_actual = None
-    proveedor_actual = "Desconocido"
-    pagina_inicio_actual = 0
+    total_paginas = len(reader.pages)
+    volcar = _volcar_lote(ruta_pdf_masivo, carpeta_temporal, max_memoria_mb)
+    print(f"🔄 Analizando lote masivo de {total_paginas} páginas (OCR={usar_ocr})...")
 
-    # Configurar Tesseract si hace falta
-    if usar_ocr and OCR_AVAILABLE:
-        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    # 1. Primera pasada: extracción nativa de todo el lote (Rápida)
+    textos, metodos, tiempos = [], [], []
+    with span("splitter.nativo"):
+        for page in reader.pages:
+            t_inicio = time.perf_counter()
+            try:
+                textos.append(page.extract_text() or "")
+            except:
+                textos.append("")
+            metodos.append("nativo")
+            tiempos.append(time.perf_counter() - t_inicio)
 
-    os.makedirs(carpeta_temporal, exist_ok=True)
+    # 2. Las páginas sin texto nativo fiable pasan por OCR todas juntas (Lento):
+    # rasterizado por bloques y reparto entre los procesos del pool
+    if usar_ocr:
+        a_ocr = [i for i, t in enumerate(textos) if not evaluar_texto_nativo(t)]
+        if a_ocr:
+            _ocr_lote(ruta_pdf_masivo, reader, a_ocr, textos, metodos, tiempos)
 
-    total_paginas = len(reader.pages)
-    print(f"🔄 Analizando lote masivo de {total_paginas} páginas (OCR={usar_ocr})...")
+    # 3. Guillotina página a página
+    fragmentos = []
+    fragmento_actual = None
 
-    for i, page in enumerate(reader.pages):
-        # 1. Intentar extracción nativa (Rápida)
-        try:
-            text = page.extract_text() or ""
-        except:
-            text = ""
+    for i, text in enumerate(textos):
+        metodo = metodos[i] if text.strip() else "vacio"
+        t_pagina = tiempos[i]
 
-        # 2. Si no hay texto y el OCR está activado, mirar la imagen (Lento)
-        if not text.strip() and usar_ocr and OCR_AVAILABLE:
-            try:
-                # Convertimos SOLO esta página a imagen (índices 1-based)
-                # Esto evita convertir todo el PDF cada vez
-                imagenes = convert_from_path(
-                    ruta_pdf_masivo,
-                    first_page=i + 1,
-                    last_page=i + 1,
-                    poppler_path=POPPLER_PATH
-                )
-                for img in imagenes:
-                    # Usamos psm 6 como acordamos (bloque de texto)
-                    text += pytesseract.image_to_string(img, lang='spa', config='--psm 6')
-            except Exception as e:
-                print(f"   ⚠️ Fallo OCR en página {i + 1} del splitter: {e}")
-
-        # 3. Analizar: ¿Hay firma de algún proveedor conocido?
+        # ¿Hay firma de algún proveedor conocido?
         analisis = analizar_documento(text)
         nuevo_proveedor = analisis.get("proveedor_detectado")
 
         # --- LÓGICA DE GUILLOTINA ---
-        if nuevo_proveedor:
-            # ¡HAY FIRMA! -> PORTADA
-            if writer_actual:
-                print(f"   ✂️ Corte en pág {i + 1}. Fin del doc anterior ({proveedor_actual}).")
-                ruta = _guardar_fragmento(writer_actual, proveedor_actual, pagina_inicio_actual, carpeta_temporal)
-                archivos_generados.append(ruta)
+        if nuevo_proveedor or not fragmento_actual:
+            # ¡HAY FIRMA! -> PORTADA (o Documento Huérfano al inicio)
+            if fragmento_actual:
+                print(f"   ✂️ Corte en pág {i + 1}. Fin del doc anterior ({fragmento_actual.proveedor}).")
+                fragmentos.append(_cerrar_fragmento(fragmento_actual, volcar, carpeta_temporal))
 
             # Nuevo documento
-            writer_actual = PdfWriter()
-            writer_actual.add_page(page)
-            proveedor_actual = nuevo_proveedor
-            pagina_inicio_actual = i
-
-        else:
-            # CONTINUACIÓN
-            if writer_actual:
-                writer_actual.add_page(page)
-            else:
-                # Documento Huérfano al inicio
-                writer_actual = PdfWriter()
-                writer_actual.add_page(page)
-                proveedor_actual = "Desconocido"
-                pagina_inicio_actual = i
+            proveedor = nuevo_proveedor or "Desconocido"
+            fragmento_actual = Fragmento(
+                nombre=f"SPLIT_Pag{i}_{proveedor}.pdf",
+                ruta_lote=ruta_pdf_masivo,
+                proveedor=proveedor,
+                pagina_inicio=i,
+                pagina_fin=i,
+                reader=reader
+            )
+
+        # CONTINUACIÓN (o primera página del documento nuevo)
+        fragmento_actual.pagina_fin = i
+        fragmento_actual.textos.append(text)
+        fragmento_actual.metodos.append(metodo)
+        fragmento_actual.tiempo_extraccion += t_pagina
 
     # Guardar último bloque
-    if writer_actual:
-        ruta = _guardar_fragmento(writer_actual, proveedor_actual, pagina_inicio_actual, carpeta_temporal)
-        archivos_generados.append(ruta)
-        print(f"   🏁 Guardado bloque final ({proveedor_actual}).")
+    if fragmento_actual:
+        fragmentos.append(_cerrar_fragmento(fragmento_actual, volcar, carpeta_temporal))
+        print(f"   🏁 Guardado bloque final ({fragmento_actual.proveedor}).")
+
+    return fragmentos
+
+
+def documento_sin_dividir(ruta_pdf, carpeta_temporal=None, usar_ocr=False,
+                          max_memoria_mb=FRAGMENTO_MAX_MEMORIA_MB):
+    """
+    El PDF entero como un solo Fragmento (PIPELINE_DIVIDIR_LOTES = False: el
+    escáner ya deja un documento por archivo). Sin cortes que buscar, la lectura
+    para en cuanto aparecen proveedor, Nº y fecha: el resto de páginas van al
+    destino igual, pero sin leerse (método "omitida").
+    """
+    t_inicio = time.perf_counter()
+    paginas, error = extraer_paginas_pdf(ruta_pdf, modo=MODO_AUTO if usar_ocr else MODO_NATIVO,
+                                         hasta_completar=True)
+    if error:
+        raise RuntimeError(error)
 
-    return archivos_generados
+    reader = PdfReader(ruta_pdf)
+    if reader.is_encrypted:
+        reader.decrypt("")
+    textos = [texto for texto, _ in paginas]
+    proveedor = analizar_documento("".join(t + "\n" for t in textos if t)).get("proveedor_detectado")
+    fragmento = Fragmento(
+        nombre=os.path.basename(ruta_pdf),
+        ruta_lote=ruta_pdf,
+        proveedor=proveedor or "Desconocido",
+        pagina_inicio=0,
+        pagina_fin=len(paginas) - 1,
+        textos=textos,
+        metodos=[metodo for _, metodo in paginas],
+        tiempo_extraccion=time.perf_counter() - t_inicio,
+        reader=reader
+    )
+    return [_cerrar_fragmento(fragmento, _volcar_lote(ruta_pdf, carpeta_temporal, max_memoria_mb),
+                              carpeta_temporal)]
+
+
+def _ocr_lote(ruta_pdf, reader, paginas, textos, metodos, tiempos):
+    """
+    OCR de las páginas indicadas del lote en una sola tanda, consultando antes la
+    caché. Actualiza en sitio textos/métodos/tiempos de las páginas que se leen.
+    """
+    error = comprobar_motores_ocr()
+    if error:
+        print(f"   ⚠️ OCR no disponible ({error}). Se usa solo el texto nativo.")
+        return
+
+    huellas = None
+    if obtener_cache():
+        try:
+            with span("ocr.huellas"):
+                huellas = {i: huella_pagina(reader.pages[i]) for i in paginas}
+        except Exception:
+            huellas = None
+
+    print(f"   👁️ OCR de {len(paginas)}/{len(textos)} páginas sin texto nativo")
+    t_inicio = time.perf_counter()
+    try:
+        leidas = ocr_documento(ruta_pdf, OCR_WORKERS, paginas, PARAMETROS_OCR_SPLITTER,
+                               huellas=huellas, tam_bloque=RASTER_TAM_BLOQUE, a_escalar=_escalar_paginas)
+    except Exception as e:
+        print(f"   ⚠️ Fallo OCR en el splitter: {e}")
+        return
+
+    # El OCR va en paralelo: repartimos su coste entre las páginas leídas
+    t_pagina = (time.perf_counter() - t_inicio) / len(paginas)
+    for i, (texto, metodo) in zip(paginas, leidas):
+        tiempos[i] += t_pagina
+        if texto.strip() or (metodo == "error" and not textos[i].strip()):
+            textos[i], metodos[i] = texto, metodo
+
+
+def _pagina_resuelta(texto):
+    """
+    Criterio de la escalera de OCR para una página de un lote: si trae firma de
+    proveedor (empieza un documento), que tenga también Nº y fecha; si no
+    (página de continuación), basta con que el texto sea legible.
+    """
+    datos = analizar_documento(texto)
+    if datos.get("proveedor_detectado"):
+        return documento_completo(datos)
+    return evaluar_texto_nativo(texto)
+
+
+def _escalar_paginas(leidas, indices):
+    return [i for i in indices if not _pagina_resuelta(leidas[i][0])]
+
+
+def reconstruir_fragmentos(ruta_pdf_masivo, registros, carpeta_temporal=None,
+                           max_memoria_mb=FRAGMENTO_MAX_MEMORIA_MB):
+    """
+    Vuelve a montar los Fragmento de un lote a partir de lo anotado en el diario
+    (rangos de página + textos ya extraídos), sin releer texto ni pasar por OCR.
+    """
+    reader = PdfReader(ruta_pdf_masivo)
+    volcar = _volcar_lote(ruta_pdf_masivo, carpeta_temporal, max_memoria_mb)
+
+    fragmentos = []
+    for registro in registros:
+        fragmento = Fragmento(
+            nombre=f"SPLIT_Pag{registro['pagina_inicio']}_{registro['proveedor']}.pdf",
+            ruta_lote=ruta_pdf_masivo,
+            proveedor=registro["proveedor"],
+            pagina_inicio=registro["pagina_inicio"],
+            pagina_fin=registro["pagina_fin"],
+            textos=registro["textos"],
+            metodos=registro["metodos"],
+            reader=reader
+        )
+        fragmentos.append(_cerrar_fragmento(fragmento, volcar, carpeta_temporal))
+    return fragmentos
+
+
+def _volcar_lote(ruta_pdf, carpeta, max_memoria_mb):
+    """
+    ¿Van a temporales los fragmentos de este lote? Sí si el PDF pasa de
+    `max_memoria_mb` (y hay carpeta temporal). Se decide por lote, no por
+    fragmento: basta un fragmento en memoria para retener el lote entero, y
+    entre etapas del pipeline puede haber varios lotes esperando.
+    """
+    return carpeta is not None and os.path.getsize(ruta_pdf) > max_memoria_mb * 1024 * 1024
 
 
-def _guardar_fragmento(writer, proveedor, indice_pag, carpeta):
-    """Escribe el PDF temporal en disco"""
-    nombre = f"SPLIT_Pag{indice_pag}_{proveedor}.pdf"
-    ruta = os.path.join(carpeta, nombre)
-    with open(ruta, "wb") as f:
-        writer.write(f)
-    return ruta
\ No newline at end of file
+def _cerrar_fragmento(fragmento, volcar, carpeta):
+    """Fragmento terminado: se queda en memoria salvo que su lote sea demasiado grande."""
+    if volcar:
+        fragmento.volcar(carpeta)
+    return fragmento
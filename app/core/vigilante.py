@@ -0,0 +1,215 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from app.config import VIGILANCIA_INTERVALO, VIGILANCIA_ESPERA, VIGILANCIA_TAM_COLA
+
+# --- inotify (Linux) vía ctypes, sin dependencias externas ---
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_CABECERA_EVENTO = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Avisos del kernel cuando cambia algo en la carpeta. Lanza OSError si no está disponible."""
+
+    def __init__(self, carpeta):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify solo existe en Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mascara = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MODIFY | _IN_DELETE | _IN_MOVED_FROM
+        if libc.inotify_add_watch(self.fd, os.fsencode(carpeta), mascara) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch")
+
+    def esperar(self, timeout):
+        """
+        Espera eventos como mucho `timeout` segundos.
+        Retorna la lista de nombres tocados, o None si el kernel perdió eventos (hay que releer).
+        """
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+        nombres = []
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        pos = 0
+        while pos + _CABECERA_EVENTO.size <= len(datos):
+            _, mascara, _, longitud = _CABECERA_EVENTO.unpack_from(datos, pos)
+            pos += _CABECERA_EVENTO.size
+            nombre = datos[pos:pos + longitud].rstrip(b"\0")
+            pos += longitud
+            if mascara & _IN_Q_OVERFLOW:
+                return None
+            if nombre:
+                nombres.append(os.fsdecode(nombre))
+        return nombres
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+class VigilanteCarpeta:
+    """
+    Vigila una carpeta de entrada y entrega los PDFs nuevos en cuanto terminan
+    de escribirse (el escáner suele ir copiando el archivo poco a poco):
+
+        vigilante = VigilanteCarpeta("data/input")
+        vigilante.iniciar()
+        pipeline.ejecutar(vigilante.rutas())   # Hasta vigilante.detener()
+
+    - inotify en Linux; en el resto (o si falla) se relee la carpeta cada `intervalo`.
+    - Un PDF se entrega cuando su tamaño y fecha no cambian durante `espera` segundos.
+    - La cola de entrega está acotada: si el pipeline va saturado, se espera.
+    - detener() deja de vigilar, pero rutas() sigue entregando lo ya encolado.
+    - Lo entregado se recuerda mientras el archivo siga en la carpeta (para no
+      volver a entregarlo); al desaparecer se olvida.
+    """
+
+    def __init__(self, carpeta, intervalo=VIGILANCIA_INTERVALO, espera=VIGILANCIA_ESPERA,
+                 tam_cola=VIGILANCIA_TAM_COLA, log=print):
+        self.carpeta = carpeta
+        self.intervalo = intervalo
+        self.espera = espera
+        self.log = log
+        self._cola = queue.Queue(max(1, tam_cola))
+        self._detener = threading.Event()
+        self._terminado = threading.Event()
+        self._candidatos = {}  # ruta -> (tamaño, mtime_ns, instante del último cambio)
+        self._entregados = {}  # ruta -> (tamaño, mtime_ns) ya enviados al pipeline
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="vigilante-carpeta", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        """Cierre ordenado: no se admiten archivos nuevos, lo encolado se procesa."""
+        self._detener.set()
+
+    @property
+    def detenido(self):
+        return self._detener.is_set()
+
+    def rutas(self):
+        """Generador de rutas listas para procesar. Termina tras detener() y vaciar la cola."""
+        while True:
+            try:
+                yield self._cola.get(timeout=0.5)
+            except queue.Empty:
+                if self._terminado.is_set():
+                    return
+
+    # --- BUCLE DE VIGILANCIA ---
+
+    def _bucle(self):
+        try:
+            inotify = _Inotify(self.carpeta)
+            self.log(f"👀 Vigilando {self.carpeta} (inotify)")
+        except (OSError, AttributeError) as e:
+            inotify = None
+            self.log(f"👀 Vigilando {self.carpeta} (sondeo cada {self.intervalo}s; inotify no disponible: {e})")
+
+        try:
+            self._releer_carpeta()
+            while not self._detener.is_set():
+                if inotify:
+                    nombres = inotify.esperar(self.intervalo)
+                    if nombres is None:
+                        self._releer_carpeta()  # Se desbordó la cola del kernel
+                    else:
+                        for nombre in nombres:
+                            self._anotar(os.path.join(self.carpeta, nombre))
+                else:
+                    self._detener.wait(self.intervalo)
+                    self._releer_carpeta()
+                self._entregar_estables()
+        except Exception as e:
+            self.log(f"❌ Error vigilando {self.carpeta}: {e}")
+        finally:
+            if inotify:
+                inotify.cerrar()
+            self._terminado.set()
+
+    def _releer_carpeta(self):
+        presentes = set()
+        try:
+            with os.scandir(self.carpeta) as entradas:
+                for entrada in entradas:
+                    presentes.add(entrada.path)
+                    self._anotar(entrada.path)
+        except FileNotFoundError:
+            pass
+        # Borrados o movidos sin que nos enteráramos (sondeo, desbordamiento de inotify)
+        for ruta in [r for r in self._entregados if r not in presentes]:
+            del self._entregados[ruta]
+        for ruta in [r for r in self._candidatos if r not in presentes]:
+            del self._candidatos[ruta]
+
+    def _anotar(self, ruta):
+        """Registra (o actualiza) un PDF candidato con su tamaño y fecha actuales."""
+        if not ruta.lower().endswith(".pdf"):
+            return
+        try:
+            info = os.stat(ruta)
+        except OSError:
+            # Ya no está: si vuelve a aparecer un PDF con ese nombre, es uno nuevo
+            self._candidatos.pop(ruta, None)
+            self._entregados.pop(ruta, None)
+            return
+        firma = (info.st_size, info.st_mtime_ns)
+        if self._entregados.get(ruta) == firma:
+            return
+        previo = self._candidatos.get(ruta)
+        if previo is None or previo[:2] != firma:
+            self._candidatos[ruta] = (*firma, time.monotonic())
+
+    def _entregar_estables(self):
+        ahora = time.monotonic()
+        for ruta, (tam, mtime, cambio) in sorted(self._candidatos.items()):
+            if self._detener.is_set():
+                return
+            # inotify no avisa de nada mientras el archivo está quieto: comprobamos a mano
+            self._anotar(ruta)
+            if self._candidatos.get(ruta, (None, None, None))[:2] != (tam, mtime):
+                continue
+            if ahora - cambio < self.espera or tam == 0 or not self._se_puede_abrir(ruta):
+                continue
+            while not self._detener.is_set():
+                try:
+                    self._cola.put(ruta, timeout=0.5)  # Contrapresión del pipeline
+                    break
+                except queue.Full:
+                    continue
+            else:
+                return
+            del self._candidatos[ruta]
+            self._entregados[ruta] = (tam, mtime)
+
+    @staticmethod
+    def _se_puede_abrir(ruta):
+        # En Windows el escáner mantiene el archivo bloqueado mientras escribe
+        try:
+            with open(ruta, "rb"):
+                return True
+        except OSError:
+            return False
@@ -0,0 +1,47 @@
+import queue
+
+
+class CanalUI:
+    """
+    Eventos del hilo de procesamiento hacia la ventana. Tk no es thread-safe:
+    el hilo de trabajo solo encola (log, estado, progreso...) y la ventana
+    recoge todo lo pendiente cada pocos ms con after() y lo pinta de una vez.
+    """
+
+    def __init__(self):
+        self._cola = queue.SimpleQueue()
+
+    # --- Lado del hilo de trabajo (cualquier hilo) ---
+
+    def inicio(self, total_archivos):
+        self._cola.put(("inicio", total_archivos))
+
+    def log(self, mensaje):
+        self._cola.put(("log", mensaje))
+
+    def estado(self, texto):
+        self._cola.put(("estado", texto))
+
+    def progreso(self, archivos, paginas):
+        self._cola.put(("progreso", (archivos, paginas)))
+
+    def fin(self, procesados, errores):
+        self._cola.put(("fin", (procesados, errores)))
+
+    # --- Lado de Tk ---
+
+    def recoger(self):
+        """
+        Vacía la cola y agrupa los eventos: todas las líneas de log en orden,
+        y del estado y el progreso solo el último (los intermedios ya no se verían).
+        """
+        lote = {"inicio": None, "log": [], "estado": None, "progreso": None, "fin": None}
+        while True:
+            try:
+                tipo, valor = self._cola.get_nowait()
+            except queue.Empty:
+                return lote
+            if tipo == "log":
+                lote["log"].append(valor)
+            else:
+                lote[tipo] = valor
@@ -3,14 +3,11 @@ from tkinter import filedialog
 import os
 import threading
 import sys
-import shutil
 import time
-from app.core.pdf_processor import extraer_texto_pdf
-from app.core.parser import analizar_documento
-from app.core.file_manager import mover_y_renombrar
-from app.core.splitter import dividir_pdf_por_proveedor
-from app.utils.logger import registrar_evento
-from app.config import DEFAULT_INPUT_DIR, DEFAULT_OUTPUT_DIR, TITULO_APP, VERSION_ACTUAL
+from app.core.pipeline import PipelineLotes
+from app.gui.components import CanalUI
+from app.config import (DEFAULT_INPUT_DIR, DEFAULT_OUTPUT_DIR, TITULO_APP, VERSION_ACTUAL,
+                        GUI_REFRESCO_MS, GUI_MAX_LINEAS_LOG, PIPELINE_DIVIDIR_LOTES)
 
 
 # --- CONFIGURACIÓN DE COLORES  ---
@@ -37,6 +34,12 @@ class PDFClassifierApp(ctk.CTk):
         self.output_folder = ctk.StringVar(value=os.path.abspath(DEFAULT_OUTPUT_DIR))
         self.is_running = False
         self.usar_ocr = ctk.BooleanVar(value=True) #Se deja True por defecto.
+        self.un_documento_por_pdf = ctk.BooleanVar(value=not PIPELINE_DIVIDIR_LOTES)
+
+        # El hilo de procesamiento no toca widgets: encola aquí y _drenar_eventos pinta
+        self.canal = CanalUI()
+        self._total_archivos = 0
+        self._t_inicio = None
 
         # --- LAYOUT PRINCIPAL (GRID) ---
         self.grid_columnconfigure(0, weight=1)
@@ -114,7 +117,7 @@ class PDFClassifierApp(ctk.CTk):
 
         self.check_ocr = ctk.CTkCheckBox(
             self.frame_config,
-            text="Habilitar OCR Extendido (Lento - Úsalo si los PDFs son imágenes escaneadas)",
+            text="Habilitar OCR Extendido (solo en páginas escaneadas; las digitales se leen directamente)",
             variable=self.usar_ocr,
             onvalue=True, offvalue=False,
             font=("Roboto", 12, "bold"),
@@ -122,7 +125,16 @@ class PDFClassifierApp(ctk.CTk):
             hover_color="#9A03FF",
             fg_color="#200065"
         )
-        self.check_ocr.grid(row=4, column=0, columnspan=3, sticky="w", padx=20, pady=(5, 20))
+        self.check_ocr.grid(row=4, column=0, columnspan=3, sticky="w", padx=20, pady=(5, 5))
+
+        self.check_sin_dividir = ctk.CTkCheckBox(
+            self.frame_config,
+            text="Un documento por PDF (no dividir lotes; se lee solo hasta encontrar proveedor, Nº y fecha)",
+            variable=self.un_documento_por_pdf,
+            onvalue=True, offvalue=False,
+            font=("Roboto", 12)
+        )
+        self.check_sin_dividir.grid(row=5, column=0, columnspan=3, sticky="w", padx=20, pady=(5, 20))
 
         # --- Botón de Acción Principal ---
         self.btn_run = ctk.CTkButton(
@@ -135,7 +147,7 @@ class PDFClassifierApp(ctk.CTk):
             corner_radius=25,
             command=self.start_processing_thread
         )
-        self.btn_run.grid(row=5, column=0, columnspan=3, padx=20, pady=(0, 20), sticky="ew")
+        self.btn_run.grid(row=6, column=0, columnspan=3, padx=20, pady=(0, 20), sticky="ew")
 
         # CONSOLA DE REGISTRO (LOG)
         self.frame_log = ctk.CTkFrame(self, fg_color="transparent")
@@ -155,6 +167,15 @@ class PDFClassifierApp(ctk.CTk):
         )
         self.textbox_log.grid(row=1, column=0, sticky="nsew")
 
+        # Barra de progreso (archivos terminados) + ritmo y tiempo restante
+        self.barra_progreso = ctk.CTkProgressBar(self.frame_log, progress_color=COLOR_SUCCESS)
+        self.barra_progreso.set(0)
+        self.barra_progreso.grid(row=2, column=0, sticky="ew", pady=(10, 0))
+
+        self.lbl_progreso = ctk.CTkLabel(self.frame_log, text="", anchor="w", text_color="gray",
+                                         font=("Roboto", 12))
+        self.lbl_progreso.grid(row=3, column=0, sticky="ew")
+
         # Mensaje inicial
         self.log_message(f"Sistema listo {VERSION_ACTUAL}. Esperando archivos...")
 
@@ -190,6 +211,9 @@ class PDFClassifierApp(ctk.CTk):
         #--- ATAJOS DEL TECLADO ---
         self.bind('<Return>', lambda e: self.start_processing_thread())
         self.bind('<Escape>', lambda e: self.cerrar_app())
+
+        # Bucle de refresco de la interfaz
+        self.after(GUI_REFRESCO_MS, self._drenar_eventos)
     # --- FUNCIONES DE LÓGICA UI ---
 
     def cambiar_tema(self):
@@ -214,12 +238,52 @@ class PDFClassifierApp(ctk.CTk):
             self.check_ocr.configure(text_color=COLOR_OCR_WARNING)
 
     def log_message(self, message):
-        """ Escribe en el log y hace autoscroll """
-        # Desbloqueamos temporalmente si quisieramos hacerlo read-only estricto,
-        # pero por simplicidad de V1 dejamos escribir directo
-        self.textbox_log.insert("end", f">> {message}\n")
+        """ Encola una línea para el log (se puede llamar desde cualquier hilo) """
+        self.canal.log(message)
+
+    def _drenar_eventos(self):
+        """ Pinta de una vez todo lo encolado desde el último refresco """
+        try:
+            lote = self.canal.recoger()
+            if lote["inicio"] is not None:
+                self._total_archivos = lote["inicio"]
+                self._t_inicio = time.monotonic()
+                self.barra_progreso.set(0)
+                self._pintar_progreso(0, 0)
+            if lote["log"]:
+                self._escribir_log(lote["log"])
+            if lote["estado"] is not None:
+                self.lbl_status.configure(text=lote["estado"])
+            if lote["progreso"] is not None:
+                self._pintar_progreso(*lote["progreso"])
+            if lote["fin"] is not None:
+                self.reset_ui(*lote["fin"])
+        finally:
+            self.after(GUI_REFRESCO_MS, self._drenar_eventos)
+
+    def _escribir_log(self, lineas):
+        """ Un solo insert por refresco, autoscroll y recorte de las líneas más antiguas """
+        lineas = lineas[-GUI_MAX_LINEAS_LOG:]
+        self.textbox_log.insert("end", "".join(f">> {linea}\n" for linea in lineas))
+        sobrantes = int(self.textbox_log.index("end-1c").split(".")[0]) - 1 - GUI_MAX_LINEAS_LOG
+        if sobrantes > 0:
+            self.textbox_log.delete("1.0", f"{sobrantes + 1}.0")
         self.textbox_log.see("end")
 
+    def _pintar_progreso(self, archivos, paginas):
+        total = self._total_archivos
+        transcurrido = time.monotonic() - self._t_inicio if self._t_inicio else 0.0
+        self.barra_progreso.set(archivos / total if total else 0)
+
+        ritmo = paginas / transcurrido if transcurrido > 0 else 0.0
+        if archivos and total > archivos:
+            restante = transcurrido / archivos * (total - archivos)
+            eta = f"ETA {int(restante // 60):02d}:{int(restante % 60):02d}"
+        else:
+            eta = "ETA --:--"
+        self.lbl_progreso.configure(
+            text=f"{archivos}/{total} archivos | {paginas} págs | {ritmo:.1f} págs/s | {eta}")
+
     def select_input(self):
         """ Permite ver archivos en las carpetas de entrada """
 
@@ -264,96 +328,46 @@ class PDFClassifierApp(ctk.CTk):
         input_dir = self.input_folder.get()
         base_output_dir = self.output_folder.get()
         usar_ocr_activo = self.usar_ocr.get()  # Obtenemos estado del Checkbox
-        temp_split_dir = os.path.join(base_output_dir, "_TEMP_SPLIT")
 
         archivos_origen = [f for f in os.listdir(input_dir) if f.lower().endswith(".pdf")]
 
+        self.canal.inicio(len(archivos_origen))
         self.log_message("━" * 40)
         self.log_message(f"🚀 INICIO DE PROCESO | Archivos: {len(archivos_origen)}")
         if usar_ocr_activo:
             self.log_message(f"👁️ MODO OCR EXTENDIDO: ACTIVADO. Puede tardar unos segundos")
-        self.lbl_status.configure(text="Estado: Procesando lotes...")
-
-        procesados_finales = 0
-        errores = 0
-
-        # Crear carpeta temporal si no existe
-        if not os.path.exists(temp_split_dir):
-            os.makedirs(temp_split_dir, exist_ok=True)
-
+        self.canal.estado("Estado: Procesando lotes...")
+
+        # Pipeline por etapas: dividir -> extraer -> analizar -> mover/registrar.
+        # Todo lo que muestra pasa por el canal: este hilo no toca widgets
+        pipeline = PipelineLotes(
+            base_output_dir,
+            usar_ocr=usar_ocr_activo,
+            dividir=not self.un_documento_por_pdf.get(),
+            log=self.canal.log,
+            estado=self.canal.estado,
+            progreso=self.canal.progreso
+        )
+        resumen = {"procesados": 0, "errores": 0}
         try:
-            for archivo in archivos_origen:
-                ruta_completa_origen = os.path.join(input_dir, archivo)
-                self.lbl_status.configure(text=f"Procesando: {archivo}...")
-
-                # 1. DIVIDIR (SPLITTER)
-                try:
-                    if dividir_pdf_por_proveedor:
-                        # [CAMBIO] Ahora pasamos el argumento usar_ocr
-                        sub_archivos = dividir_pdf_por_proveedor(
-                            ruta_completa_origen,
-                            temp_split_dir,
-                            usar_ocr=usar_ocr_activo  # <--- AQUÍ ESTÁ LA CLAVE
-                        )
-                    else:
-                        sub_archivos = [ruta_completa_origen]
-                except Exception as e:
-                    self.log_message(f"💥 Error crítico dividiendo {archivo}: {e}")
-                    errores += 1
-                    continue
-
-                # 2. PROCESAR CADA TROZO
-                for sub_ruta in sub_archivos:
-                    nombre_sub = os.path.basename(sub_ruta)
-
-                    # A) Leer (Pasamos forzar_ocr si la función lo soporta)
-                    try:
-                        # Asumiendo que extraer_texto_pdf fue actualizado para aceptar el argumento
-                        # Si tu función core no acepta argumentos, elimina 'forzar_ocr=usar_ocr_activo'
-                        texto, error = extraer_texto_pdf(sub_ruta, forzar_ocr=usar_ocr_activo)
-                    except TypeError:
-                        # Si la función del core antigua no acepta el parametro OCR, lo llamamos normal
-                        texto, error = extraer_texto_pdf(sub_ruta)
-
-                    if error:
-                        self.log_message(f"   ⚠️ Error lectura {nombre_sub}: {error}")
-                        errores += 1
-                        continue
-
-                    # B) Analizar
-                    datos = analizar_documento(texto)
-
-                    if datos.get("proveedor_detectado"):
-                        self.log_message(
-                            f"   ✅ {datos['proveedor_detectado']} | Doc: {datos.get('id_documento', 'N/A')}")
-                    else:
-                        self.log_message(f"   ❓ {nombre_sub} -> Desconocido")
-
-                    # C) Mover
-                    exito, ruta_final = mover_y_renombrar(sub_ruta, datos, base_output_dir)
-
-                    # D) Registrar
-                    registrar_evento(f"{archivo} -> {nombre_sub}", datos, ruta_final, exito)
-                    procesados_finales += 1
-
+            resumen = pipeline.ejecutar([os.path.join(input_dir, f) for f in archivos_origen])
+            rutas = resumen["rutas"]
+            self.log_message(f"📊 Páginas: nativo {rutas['nativo']} | OCR {rutas['ocr']} | "
+                             f"caché {rutas['cache']} | vacías {rutas['vacio']} | fallos OCR {rutas['error']} | "
+                             f"sin leer {rutas['omitida']}")
+            if resumen["omitidos"]:
+                self.log_message(f"⏭️ Ya procesados anteriormente (omitidos): {resumen['omitidos']}")
+            if resumen["duplicados"]:
+                self.log_message(f"♻️ Duplicados de documentos ya guardados (no se guardan): {resumen['duplicados']}")
         except Exception as e:
             self.log_message(f"❌ ERROR GENERAL: {str(e)}")
         finally:
-            # Limpieza
-            if os.path.exists(temp_split_dir):
-                try:
-                    shutil.rmtree(temp_split_dir)
-                except:
-                    pass
-
-            self.reset_ui(procesados_finales, errores)
+            self.canal.fin(resumen["procesados"], resumen["errores"])
 
     def reset_ui(self, procesados=0, errores=0):
-        """ Restaura la interfaz al terminar el hilo """
+        """ Restaura la interfaz al terminar el hilo (se llama desde _drenar_eventos) """
         self.is_running = False
 
-        # Debemos usar after para modificar UI desde hilo de forma segura,
-        # aunque CTK suele tolerarlo, es buena práctica o hacerlo directo si no falla.
         self.btn_run.configure(state="normal", text="▶ INICIAR PROCESAMIENTO", fg_color=COLOR_SUCCESS)
         self.btn_exit.configure(state="normal")
 
@@ -0,0 +1,192 @@
+import atexit
+import csv
+import os
+import queue
+import sqlite3
+import threading
+from app.config import HISTORIAL_DB_PATH, HISTORIAL_CSV_LEGADO, HISTORIAL_LOTE, HISTORIAL_INTERVALO
+
+# Columnas del historial (mismo orden que el CSV de siempre)
+CABECERA_CSV = ["Fecha", "Archivo Original", "Proveedor", "Pedido/Doc", "Estado", "Ruta Final"]
+_COLUMNAS = ("fecha", "archivo", "proveedor", "documento", "estado", "ruta_final")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT NOT NULL,
+    archivo TEXT,
+    proveedor TEXT,
+    documento TEXT,
+    estado TEXT,
+    ruta_final TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_fecha ON eventos (fecha);
+CREATE INDEX IF NOT EXISTS idx_eventos_proveedor_fecha ON eventos (proveedor, fecha);
+CREATE INDEX IF NOT EXISTS idx_eventos_estado ON eventos (estado);
+"""
+
+_VACIAR = object()  # Petición de volcado inmediato (ver vaciar)
+
+
+class HistorialProcesos:
+    """
+    Historial de documentos procesados en SQLite.
+
+    registrar() solo encola la fila: un hilo escritor las agrupa y las guarda
+    en una única transacción cada HISTORIAL_LOTE filas o HISTORIAL_INTERVALO
+    segundos, lo que llegue antes. Las consultas vacían antes la cola para
+    ver siempre lo último registrado.
+    """
+
+    def __init__(self, ruta_db=HISTORIAL_DB_PATH, csv_legado=None,
+                 tam_lote=HISTORIAL_LOTE, intervalo=HISTORIAL_INTERVALO):
+        self.ruta_db = ruta_db
+        self.tam_lote = max(1, tam_lote)
+        self.intervalo = intervalo
+        self._cola = queue.Queue()
+
+        os.makedirs(os.path.dirname(ruta_db), exist_ok=True)
+        conexion = self._conectar()
+        try:
+            conexion.executescript(_ESQUEMA)
+            if csv_legado:
+                self._importar_csv_legado(conexion, csv_legado)
+        finally:
+            conexion.close()
+
+        self._hilo = threading.Thread(target=self._escritor, name="historial-escritor", daemon=True)
+        self._hilo.start()
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_db, timeout=30, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        return conexion
+
+    def _importar_csv_legado(self, conexion, ruta_csv):
+        """Carga una sola vez el historial_procesos.csv de versiones anteriores."""
+        if conexion.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+        filas = []
+        if os.path.exists(ruta_csv):
+            try:
+                with open(ruta_csv, newline="", encoding="utf-8") as f:
+                    lector = csv.reader(f)
+                    next(lector, None)  # Cabecera
+                    for fila in lector:
+                        if fila:
+                            filas.append((fila + [""] * len(_COLUMNAS))[:len(_COLUMNAS)])
+            except Exception as e:
+                print(f"⚠️ No se pudo importar el historial CSV antiguo: {e}")
+                return
+        with conexion:
+            conexion.executemany(
+                f"INSERT INTO eventos ({', '.join(_COLUMNAS)}) VALUES (?, ?, ?, ?, ?, ?)", filas)
+            conexion.execute("PRAGMA user_version = 1")
+        if filas:
+            print(f"📥 Historial: importadas {len(filas)} líneas de {os.path.basename(ruta_csv)}")
+
+    # --- ESCRITURA ---
+
+    def registrar(self, fecha, archivo, proveedor, documento, estado, ruta_final):
+        """Encola un evento. No toca disco: lo guarda el hilo escritor."""
+        self._cola.put((fecha, archivo, proveedor, documento, estado, ruta_final))
+
+    def vaciar(self, timeout=None):
+        """Bloquea hasta que todo lo registrado hasta ahora está en la base de datos."""
+        hecho = threading.Event()
+        self._cola.put((_VACIAR, hecho))
+        return hecho.wait(timeout)
+
+    def _escritor(self):
+        conexion = self._conectar()
+        while True:
+            lote, avisos = [], []
+            elemento = self._cola.get()
+            while True:
+                if isinstance(elemento, tuple) and elemento and elemento[0] is _VACIAR:
+                    avisos.append(elemento[1])
+                    break  # Guardamos ya lo acumulado
+                lote.append(elemento)
+                if len(lote) >= self.tam_lote:
+                    break
+                try:
+                    elemento = self._cola.get(timeout=self.intervalo)
+                except queue.Empty:
+                    break
+            if lote:
+                try:
+                    with conexion:
+                        conexion.executemany(
+                            f"INSERT INTO eventos ({', '.join(_COLUMNAS)}) VALUES (?, ?, ?, ?, ?, ?)", lote)
+                except Exception as e:
+                    print(f"❌ Error crítico escribiendo log: {e}")
+            for aviso in avisos:
+                aviso.set()
+
+    # --- CONSULTA ---
+
+    def consultar(self, proveedor=None, desde=None, hasta=None, estado=None, limite=None):
+        """
+        Eventos filtrados, del más antiguo al más reciente, como lista de dict.
+        `desde`/`hasta` son fechas "YYYY-MM-DD" (o "YYYY-MM-DD HH:MM:SS"), ambas inclusive.
+        Ej: consultar(proveedor="CBM_IBERICA", desde="2025-01-01", hasta="2025-03-31")
+        """
+        self.vaciar()
+        condiciones, parametros = [], []
+        if proveedor is not None:
+            condiciones.append("proveedor = ?")
+            parametros.append(proveedor)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            # "2025-03-31" debe incluir todo ese día
+            condiciones.append("fecha <= ?")
+            parametros.append(hasta if len(hasta) > 10 else hasta + " 23:59:59")
+        if estado is not None:
+            condiciones.append("estado = ?")
+            parametros.append(estado)
+
+        sql = f"SELECT {', '.join(_COLUMNAS)} FROM eventos"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += " ORDER BY fecha, id"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+
+        conexion = self._conectar()
+        try:
+            return [dict(zip(_COLUMNAS, fila)) for fila in conexion.execute(sql, parametros)]
+        finally:
+            conexion.close()
+
+    def exportar_csv(self, ruta_csv, **filtros):
+        """Vuelca el historial (o lo que cumpla los filtros de consultar) al formato CSV clásico."""
+        eventos = self.consultar(**filtros)
+        carpeta = os.path.dirname(ruta_csv)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with open(ruta_csv, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CABECERA_CSV)
+            for evento in eventos:
+                writer.writerow([evento[c] for c in _COLUMNAS])
+        return len(eventos)
+
+
+# Instancia compartida por toda la aplicación
+_historial = None
+_lock_historial = threading.Lock()
+
+
+def obtener_historial():
+    global _historial
+    if _historial is None:
+        with _lock_historial:
+            if _historial is None:
+                _historial = HistorialProcesos(csv_legado=HISTORIAL_CSV_LEGADO)
+                # Que no se pierdan los últimos eventos al cerrar la aplicación
+                atexit.register(_historial.vaciar, 10)
+    return _historial
@@ -1,42 +1,50 @@
-import csv
 import os
 from datetime import datetime
-from app.config import BASE_DIR  # <-- Importamos la ruta base segura
-
-# Construimos la ruta absoluta: .../pdf_classifier_app/data/logs/historial.csv
-LOG_DIR = os.path.join(BASE_DIR, "data", "logs")
-LOG_FILE = os.path.join(LOG_DIR, "historial_procesos.csv")
-
-
-def inicializar_csv():
-    """Crea el archivo CSV y la cabecera si no existen"""
-    # Asegura que la carpeta logs existe
-    os.makedirs(LOG_DIR, exist_ok=True)
-
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(["Fecha", "Archivo Original", "Proveedor", "Pedido/Doc", "Estado", "Ruta Final"])
-
-
-def registrar_evento(origen, resultado_analisis, ruta_final, exito_movimiento):
-    """Escribe una nueva línea en el CSV"""
-    inicializar_csv()
-
+from app.utils.historial import obtener_historial
+from app.utils.metrics import cronometrado
+from app.config import HISTORIAL_CSV_LEGADO
+
+# CSV clásico (.../pdf_classifier_app/data/logs/historial_procesos.csv).
+# Ya no se escribe en cada evento: el historial vive en SQLite (app/utils/historial.py)
+# y este archivo se regenera bajo demanda con exportar_historial_csv().
+LOG_FILE = HISTORIAL_CSV_LEGADO
+
+
+@cronometrado("historial.registrar")
+def registrar_evento(origen, resultado_analisis, ruta_final, exito_movimiento, duplicado=False):
+    """
+    Añade un evento al historial (se guarda por lotes en segundo plano).
+    duplicado=True: no se guardó porque ya estaba en `ruta_final`.
+    """
     fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     archivo_orig = os.path.basename(origen)
     prov = resultado_analisis.get("proveedor_detectado", "N/A")
     # Guardamos el ID del documento o el pedido, lo que hayamos encontrado
     doc_id = resultado_analisis.get("id_documento") or resultado_analisis.get("numero_pedido", "N/A")
 
-    if exito_movimiento:
+    if duplicado:
+        estado = "DUPLICADO"
+    elif exito_movimiento:
         estado = "OK" if prov != "N/A" else "REVISIÓN MANUAL"
     else:
         estado = "ERROR SISTEMA"
 
     try:
-        with open(LOG_FILE, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow([fecha, archivo_orig, prov, doc_id, estado, ruta_final])
+        obtener_historial().registrar(fecha, archivo_orig, prov, doc_id, estado, ruta_final)
     except Exception as e:
-        print(f"❌ Error crítico escribiendo log: {e}")
\ No newline at end of file
+        print(f"❌ Error crítico escribiendo log: {e}")
+
+
+def vaciar_historial():
+    """Espera a que los eventos pendientes queden guardados (fin de una ejecución)."""
+    obtener_historial().vaciar()
+
+
+def consultar_historial(**filtros):
+    """Atajo a HistorialProcesos.consultar (proveedor, desde, hasta, estado, limite)."""
+    return obtener_historial().consultar(**filtros)
+
+
+def exportar_historial_csv(ruta_csv=LOG_FILE, **filtros):
+    """Regenera el CSV clásico a partir del historial. Retorna el nº de filas escritas."""
+    return obtener_historial().exportar_csv(ruta_csv, **filtros)
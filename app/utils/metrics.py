@@ -0,0 +1,266 @@
+import cProfile
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from app.config import METRICAS_MUESTRAS, METRICAS_DOCUMENTOS
+
+# Ejecución activa (la del pipeline en marcha) y documento del hilo actual
+_actual = None
+_local = threading.local()
+_lock_perfil = threading.Lock()  # cProfile: un solo perfil a la vez
+
+
+def _reiniciar_en_hijo():
+    # Los procesos del pool OCR se crean con fork en mitad de una ejecución: no deben
+    # heredar la ejecución activa (ni sus locks, que podrían estar cogidos)
+    global _actual, _lock_perfil
+    _actual = None
+    _lock_perfil = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
+
+
+class _Etapa:
+    """Acumulado de una etapa: contadores exactos + muestra acotada para percentiles."""
+    __slots__ = ("n", "total", "maximo", "muestras")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.muestras = []
+
+    def sumar(self, segundos, max_muestras):
+        self.n += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+        if len(self.muestras) < max_muestras:
+            self.muestras.append(segundos)
+        else:
+            # Muestreo de reservorio: el modo vigilancia puede durar semanas
+            i = random.randrange(self.n)
+            if i < max_muestras:
+                self.muestras[i] = segundos
+
+    def resumen(self):
+        orden = sorted(self.muestras)
+        return {
+            "n": self.n,
+            "total_s": round(self.total, 4),
+            "p50_ms": round(_percentil(orden, 50) * 1000, 3),
+            "p95_ms": round(_percentil(orden, 95) * 1000, 3),
+            "max_ms": round(self.maximo * 1000, 3),
+        }
+
+
+def _percentil(orden, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not orden:
+        return 0.0
+    return orden[max(0, math.ceil(p / 100 * len(orden)) - 1)]
+
+
+class Metricas:
+    """
+    Tiempos de una ejecución: por etapa (n, total, p50, p95, máx) y por documento.
+    Se alimenta con span(...) desde cualquier hilo.
+    Solo se guarda el desglose de los últimos `max_documentos` documentos: en
+    modo vigilancia una ejecución dura lo que dure el proceso.
+    """
+
+    def __init__(self, max_muestras=METRICAS_MUESTRAS, max_documentos=METRICAS_DOCUMENTOS):
+        self.max_muestras = max_muestras
+        self.max_documentos = max_documentos
+        self.inicio = time.time()
+        self._lock = threading.Lock()
+        self._etapas = defaultdict(_Etapa)
+        self._documentos = OrderedDict()  # documento -> {etapa: segundos}, el más antiguo primero
+        self._descartados = 0
+        self._contadores = defaultdict(int)
+
+    def registrar(self, etapa, segundos, documento=None):
+        with self._lock:
+            self._etapas[etapa].sumar(segundos, self.max_muestras)
+            if documento is not None:
+                self._tiempos_documento(documento)[etapa] += segundos
+
+    def _tiempos_documento(self, documento):
+        tiempos = self._documentos.get(documento)
+        if tiempos is None:
+            tiempos = self._documentos[documento] = defaultdict(float)
+            if len(self._documentos) > self.max_documentos:
+                self._documentos.popitem(last=False)
+                self._descartados += 1
+        else:
+            self._documentos.move_to_end(documento)  # Sigue en marcha: no es de los antiguos
+        return tiempos
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self._contadores[nombre] += n
+
+    def total(self, etapa):
+        with self._lock:
+            return self._etapas[etapa].total if etapa in self._etapas else 0.0
+
+    def informe(self, **extra):
+        """Informe JSON-serializable de la ejecución."""
+        with self._lock:
+            etapas = {nombre: etapa.resumen() for nombre, etapa in sorted(self._etapas.items())}
+            documentos = {doc: {e: round(s, 4) for e, s in sorted(tiempos.items())}
+                          for doc, tiempos in self._documentos.items()}
+            contadores = dict(sorted(self._contadores.items()))
+            descartados = self._descartados
+        return {
+            "inicio": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.inicio)),
+            "duracion_s": round(time.time() - self.inicio, 3),
+            **extra,
+            "etapas": etapas,
+            "contadores": contadores,
+            "documentos": documentos,
+            "documentos_descartados": descartados,
+        }
+
+    def guardar(self, ruta, **extra):
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(self.informe(**extra), f, indent=2, ensure_ascii=False)
+
+
+def iniciar_ejecucion(max_muestras=METRICAS_MUESTRAS, max_documentos=METRICAS_DOCUMENTOS):
+    """Activa una nueva recogida de tiempos; los span() de todos los hilos van a ella."""
+    global _actual
+    _actual = Metricas(max_muestras, max_documentos)
+    return _actual
+
+
+def terminar_ejecucion(metricas):
+    global _actual
+    if _actual is metricas:
+        _actual = None
+
+
+def contar(nombre, n=1):
+    """Suma `n` a un contador de la ejecución activa (ej: qué escalón de OCR resolvió cada página)."""
+    metricas = _actual
+    if metricas is not None:
+        metricas.contar(nombre, n)
+
+
+@contextmanager
+def capturar_spans():
+    """
+    Guarda los span() de este hilo en una lista [(etapa, segundos)] en vez de
+    sumarlos a la ejecución. Para los procesos del pool OCR, que no ven la
+    ejecución activa del proceso principal: devuelven la lista con su resultado
+    y el principal la pasa a registrar_spans().
+    """
+    anterior = getattr(_local, "captura", None)
+    _local.captura = tiempos = []
+    try:
+        yield tiempos
+    finally:
+        _local.captura = anterior
+
+
+def registrar_spans(tiempos):
+    """Suma a la ejecución activa (y al documento de este hilo) lo recogido con capturar_spans()."""
+    metricas = _actual
+    if metricas is not None:
+        doc = getattr(_local, "documento", None)
+        for etapa, segundos in tiempos:
+            metricas.registrar(etapa, segundos, doc)
+
+
+@contextmanager
+def documento(nombre):
+    """Atribuye los span() de este hilo a un documento (ej: el PDF de entrada)."""
+    anterior = getattr(_local, "documento", None)
+    _local.documento = nombre
+    try:
+        yield
+    finally:
+        _local.documento = anterior
+
+
+class span:
+    """
+    Cronometra un bloque y lo suma a la ejecución activa (si la hay):
+
+        with span("splitter.ocr"):
+            ...
+
+    Sin ejecución activa solo cuesta dos lecturas de reloj.
+    """
+    __slots__ = ("etapa", "t_inicio")
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.t_inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        captura = getattr(_local, "captura", None)
+        if captura is not None:
+            captura.append((self.etapa, time.perf_counter() - self.t_inicio))
+            return False
+        metricas = _actual
+        if metricas is not None:
+            metricas.registrar(self.etapa, time.perf_counter() - self.t_inicio,
+                               getattr(_local, "documento", None))
+        return False
+
+
+def cronometrado(etapa):
+    """Decorador: cada llamada a la función cuenta como un span(etapa)."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with span(etapa):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+@contextmanager
+def perfilar(nombre, umbral_s, carpeta):
+    """
+    Opcional: pasa el bloque por cProfile y guarda el perfil (<carpeta>/<nombre>.prof)
+    solo si tarda más de `umbral_s` segundos. Con umbral_s=None no hace nada.
+    Solo se perfila un bloque a la vez; el resto se ejecuta sin perfil.
+    """
+    if umbral_s is None or not _lock_perfil.acquire(blocking=False):
+        yield
+        return
+    perfil = cProfile.Profile()
+    t_inicio = time.perf_counter()
+    try:
+        perfil.enable()
+    except ValueError:  # Otro perfilador activo
+        _lock_perfil.release()
+        yield
+        return
+    try:
+        yield
+    finally:
+        perfil.disable()
+        _lock_perfil.release()
+        if time.perf_counter() - t_inicio > umbral_s:
+            try:
+                os.makedirs(carpeta, exist_ok=True)
+                nombre_seguro = "".join(c if c.isalnum() or c in "-_." else "_" for c in nombre)
+                perfil.dump_stats(os.path.join(carpeta, f"{nombre_seguro}.prof"))
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar el perfil de {nombre}: {e}")
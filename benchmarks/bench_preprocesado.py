@@ -0,0 +1,78 @@
+"""
+Micro-benchmark del pre-procesado de imagen para OCR (ms/página).
+
+    python -m benchmarks.bench_preprocesado [--paginas 20] [--dpi 200]
+
+Compara la receta antigua (gris -> contraste -> enfoque -> umbral, cuatro
+pasadas) con preprocesar_imagen (contraste y umbral por tablas de consulta) sobre una página
+A4 sintética con fondo gris tipo Europart, y mide la concordancia de píxeles.
+"""
+import argparse
+import random
+import time
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+from app.core.preprocess import preprocesar_imagen
+
+
+def pagina_sintetica(dpi=200, semilla=0):
+    """Página A4 en RGB: fondo blanco, banda gris y líneas de 'texto' oscuro."""
+    rnd = random.Random(semilla)
+    ancho, alto = int(8.27 * dpi), int(11.69 * dpi)
+    img = Image.new("RGB", (ancho, alto), "white")
+    dibujo = ImageDraw.Draw(img)
+    dibujo.rectangle([0, alto // 8, ancho, alto // 4], fill=(190, 190, 190))
+    for fila in range(60):
+        y = 40 + fila * (alto // 62)
+        x = 40
+        while x < ancho - 80:
+            w = rnd.randint(10, 60)
+            tinta = rnd.randint(0, 40)
+            dibujo.rectangle([x, y, x + w, y + dpi // 12], fill=(tinta, tinta, tinta))
+            x += w + rnd.randint(8, 20)
+    return img
+
+
+def preprocesado_antiguo(img, contraste=2, umbral=10):
+    """Receta anterior de extraer_texto_pdf, tal cual."""
+    img = img.convert('L')
+    img = ImageEnhance.Contrast(img).enhance(contraste)
+    img = img.filter(ImageFilter.SHARPEN)
+    return img.point(lambda x: 0 if x < umbral else 255, '1')
+
+
+def medir(funcion, paginas):
+    t_inicio = time.perf_counter()
+    for img in paginas:
+        funcion(img)
+    return (time.perf_counter() - t_inicio) * 1000 / len(paginas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--dpi", type=int, default=200)
+    args = parser.parse_args()
+
+    rgb = [pagina_sintetica(args.dpi, semilla=i) for i in range(args.paginas)]
+    gris = [img.convert('L') for img in rgb]  # Lo que entrega ahora el rasterizador
+
+    ms_antiguo = medir(preprocesado_antiguo, rgb)
+    ms_antiguo_gris = medir(preprocesado_antiguo, gris)
+    ms_nuevo_rgb = medir(preprocesar_imagen, rgb)
+    ms_nuevo_gris = medir(preprocesar_imagen, gris)
+
+    a = preprocesado_antiguo(rgb[0]).tobytes()
+    b = preprocesar_imagen(gris[0]).tobytes()
+    bits_distintos = sum(bin(x ^ y).count("1") for x, y in zip(a, b))
+    concordancia = 100 * (1 - bits_distintos / (rgb[0].width * rgb[0].height))
+
+    print(f"Página {rgb[0].width}x{rgb[0].height} px ({args.dpi} DPI), {args.paginas} páginas")
+    print(f"  Antiguo (RGB, 4 pasadas):       {ms_antiguo:7.1f} ms/página")
+    print(f"  Antiguo (entrada gris):         {ms_antiguo_gris:7.1f} ms/página")
+    print(f"  Nuevo   (entrada RGB):          {ms_nuevo_rgb:7.1f} ms/página")
+    print(f"  Nuevo   (entrada gris, actual): {ms_nuevo_gris:7.1f} ms/página")
+    print(f"  Concordancia de píxeles:        {concordancia:7.3f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark de extremo a extremo sobre un corpus sintético (ver benchmarks/corpus.py).
+
+    python -m benchmarks.bench_suite [--docs 40] [--json informe.json] [--conservar] [--tam-bloque 8]
+
+Mide por separado cada etapa y las páginas/segundo de cada una:
+  extraccion_nativa  pypdf extract_text sobre los PDFs digitales
+  rasterizado        pdftoppm (renderizar_paginas) sobre los escaneados   [requiere Poppler]
+  preprocesado       preprocesar_imagen sobre las páginas rasterizadas
+  ocr                ocr_por_regiones, un solo proceso                    [requiere Tesseract]
+  analisis           analizar_documento sobre el texto de cada página
+  division           dividir_pdf_por_proveedor sobre los lotes
+  movimiento         mover_y_renombrar de los fragmentos
+  pipeline           PipelineLotes completo sobre todo el corpus
+
+Las etapas cuya herramienta no está instalada se marcan como omitidas.
+Junto a cada etapa se muestra el pico de memoria (RSS) del proceso hasta ese
+momento y el de los procesos hijo (pdftoppm / tesseract).
+El benchmark rasteriza por bloques de páginas (--tam-bloque, 8 por defecto;
+la aplicación usa RASTER_TAM_BLOQUE, 1 = página a página): --tam-bloque 1
+da la comparación en tiempo y memoria.
+Todo se hace en un directorio temporal con historial, diario, índice de
+salida y caché OCR propios: no toca data/.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pypdf import PdfReader
+from benchmarks.corpus import generar_corpus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def pico_rss_mb():
+    """(proceso, hijos) en MB. None si la plataforma no lo da."""
+    if resource is None:
+        return None, None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor)
+
+
+class Informe:
+    def __init__(self):
+        self.etapas = {}
+
+    def medir(self, nombre, paginas, funcion):
+        """Ejecuta `funcion`; si retorna un dict, se añade a los datos de la etapa."""
+        t_inicio = time.perf_counter()
+        extra = funcion()
+        if not isinstance(extra, dict):
+            extra = None
+        segundos = time.perf_counter() - t_inicio
+        rss, rss_hijos = pico_rss_mb()
+        self.etapas[nombre] = {
+            "paginas": paginas,
+            "segundos": round(segundos, 4),
+            "paginas_por_segundo": round(paginas / segundos, 2) if segundos > 0 else None,
+            "pico_rss_mb": round(rss, 1) if rss is not None else None,
+            "pico_rss_hijos_mb": round(rss_hijos, 1) if rss_hijos is not None else None,
+            **(extra or {}),
+        }
+        return extra
+
+    def omitir(self, nombre, motivo):
+        self.etapas[nombre] = {"omitida": motivo}
+
+    def imprimir(self):
+        print(f"{'Etapa':18s} {'Págs':>6s} {'Seg':>8s} {'Págs/s':>9s} {'RSS MB':>8s} {'Hijos MB':>9s}")
+        for nombre, datos in self.etapas.items():
+            if "omitida" in datos:
+                print(f"{nombre:18s} {'-':>6s} {'-':>8s} {'-':>9s} {'-':>8s} {'-':>9s}  (omitida: {datos['omitida']})")
+                continue
+            print(f"{nombre:18s} {datos['paginas']:6d} {datos['segundos']:8.3f} "
+                  f"{datos['paginas_por_segundo'] or 0:9.1f} {datos['pico_rss_mb'] or 0:8.1f} "
+                  f"{datos['pico_rss_hijos_mb'] or 0:9.1f}")
+
+
+def _aislar(carpeta):
+    """Historial, diario, índice de salida y caché OCR dentro de la carpeta del benchmark."""
+    import app.core.diario as diario
+    import app.core.indice_salida as indice_salida
+    import app.core.ocr_cache as ocr_cache
+    import app.utils.historial as historial
+
+    historial._historial = historial.HistorialProcesos(os.path.join(carpeta, "historial.sqlite"))
+    diario._diario = diario.DiarioProcesos(os.path.join(carpeta, "diario.sqlite"))
+    indice_salida._indice = indice_salida.IndiceSalida(os.path.join(carpeta, "indice_salida.sqlite"))
+    ocr_cache._cache = ocr_cache.CacheOCR(os.path.join(carpeta, "ocr_cache.sqlite"))
+
+
+def _herramientas():
+    """Qué herramientas externas hay: (poppler, tesseract) -> None o motivo."""
+    from app.config import POPPLER_PATH, TESSERACT_CMD
+    from app.core.rasterizer import RASTER_AVAILABLE
+    from app.core.pdf_processor import OCR_AVAILABLE
+    from app.core.ocr_engine import TESSEROCR_AVAILABLE
+
+    poppler = None if RASTER_AVAILABLE and POPPLER_PATH and os.path.exists(POPPLER_PATH) else "Poppler no encontrado"
+    tesseract = (None if OCR_AVAILABLE and (TESSEROCR_AVAILABLE or (TESSERACT_CMD and os.path.exists(TESSERACT_CMD)))
+                 else "Tesseract no encontrado")
+    return poppler, tesseract
+
+
+def ejecutar(docs=40, carpeta=None, usar_ocr=None, tam_bloque=8):
+    import app.core.pdf_processor as pdf_processor
+    import app.core.splitter as splitter
+    from app.core.file_manager import mover_y_renombrar
+    from app.core.ocr_engine import motor_ocr
+    from app.core.parser import analizar_documento
+    from app.core.pipeline import PipelineLotes
+    from app.core.preprocess import preprocesar_imagen, PARAMETROS_PREPROCESO
+    from app.core.rasterizer import renderizar_paginas
+    from app.core.roi import ocr_por_regiones
+    from app.core.splitter import dividir_pdf_por_proveedor, PARAMETROS_OCR_SPLITTER
+
+    _aislar(carpeta)
+    pdf_processor.RASTER_TAM_BLOQUE = splitter.RASTER_TAM_BLOQUE = tam_bloque
+    sin_poppler, sin_tesseract = _herramientas()
+    if usar_ocr is None:
+        usar_ocr = not (sin_poppler or sin_tesseract)
+
+    informe = Informe()
+    corpus = generar_corpus(os.path.join(carpeta, "corpus"), docs=docs)
+
+    digitales = corpus["digital_simple"] + corpus["digital_lote"]
+    escaneados = corpus["imagen_simple"] + corpus["imagen_lote"]
+    pags_digitales = corpus["paginas"]["digital_simple"] + corpus["paginas"]["digital_lote"]
+    pags_escaneadas = corpus["paginas"]["imagen_simple"] + corpus["paginas"]["imagen_lote"]
+
+    # 1. Extracción nativa
+    textos = []
+    informe.medir("extraccion_nativa", pags_digitales,
+                  lambda: textos.extend(p.extract_text() or "" for r in digitales for p in PdfReader(r).pages))
+
+    # 2. Rasterizado (+ 3. preprocesado y 4. OCR sobre esas imágenes)
+    imagenes = []
+    if sin_poppler:
+        informe.omitir("rasterizado", sin_poppler)
+    else:
+        def rasterizar():
+            for ruta in escaneados:
+                paginas = range(len(PdfReader(ruta).pages))
+                imagenes.extend(img for _, img in renderizar_paginas(ruta, paginas, dpi=PARAMETROS_OCR_SPLITTER["dpi"],
+                                                                     tam_bloque=tam_bloque))
+        informe.medir("rasterizado", pags_escaneadas, rasterizar)
+
+    if not imagenes:
+        informe.omitir("preprocesado", "sin páginas rasterizadas")
+    else:
+        informe.medir("preprocesado", len(imagenes), lambda: [preprocesar_imagen(img, **PARAMETROS_PREPROCESO)
+                                                                for img in imagenes])
+
+    if sin_tesseract or not imagenes:
+        informe.omitir("ocr", sin_tesseract or "sin páginas rasterizadas")
+    else:
+        def leer():
+            fracciones = [ocr_por_regiones(img, PARAMETROS_OCR_SPLITTER)[2] for img in imagenes]
+            return {"fraccion_media_leida": round(sum(fracciones) / len(fracciones), 3)}
+        informe.medir("ocr", len(imagenes), leer)
+    imagenes.clear()
+
+    # 5. Análisis (regex / firmas) por página
+    informe.medir("analisis", len(textos), lambda: [analizar_documento(t) for t in textos])
+
+    # 6. División de lotes (y 7. movimiento de los fragmentos resultantes)
+    fragmentos = []
+    lotes = corpus["digital_lote"] + (corpus["imagen_lote"] if usar_ocr else [])
+    pags_lotes = corpus["paginas"]["digital_lote"] + (corpus["paginas"]["imagen_lote"] if usar_ocr else 0)
+
+    def dividir():
+        for ruta in lotes:
+            fragmentos.extend(dividir_pdf_por_proveedor(ruta, os.path.join(carpeta, "split"), usar_ocr=usar_ocr))
+        return {"documentos": len(fragmentos)}
+    informe.medir("division", pags_lotes, dividir)
+
+    analisis_fragmentos = [analizar_documento(f.texto) for f in fragmentos]
+
+    def mover():
+        salida = os.path.join(carpeta, "salida_mover")
+        exitos = sum(mover_y_renombrar(f, datos, salida)[0] for f, datos in zip(fragmentos, analisis_fragmentos))
+        return {"documentos": len(fragmentos), "movidos": exitos}
+    informe.medir("movimiento", sum(f.num_paginas for f in fragmentos), mover)
+
+    # 8. Pipeline completo
+    def pipeline():
+        rutas = digitales + (escaneados if usar_ocr else [])
+        resumen = PipelineLotes(os.path.join(carpeta, "salida_pipeline"), usar_ocr=usar_ocr,
+                                log=lambda mensaje: None, ruta_informe=None).ejecutar(rutas)
+        # Los escaneados son copias de los digitales: llegan como duplicados
+        documentos = resumen["procesados"] + resumen["duplicados"]
+        return {"documentos": documentos, "duplicados": resumen["duplicados"], "errores": resumen["errores"],
+                "docs_por_segundo": round(documentos / resumen["duracion"], 2)}
+    informe.medir("pipeline", pags_digitales + (pags_escaneadas if usar_ocr else 0), pipeline)
+
+    return {"docs": docs, "ocr": usar_ocr, "tam_bloque": tam_bloque, "motor_ocr": motor_ocr().nombre,
+            "proveedores": corpus["proveedores"],
+            "paginas": corpus["paginas"], "etapas": informe.etapas}, informe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40, help="Albaranes sintéticos por tipo de PDF")
+    parser.add_argument("--sin-ocr", action="store_true", help="No pasar los escaneados por OCR aunque haya Tesseract")
+    parser.add_argument("--json", dest="ruta_json", help="Guardar el informe JSON en este archivo")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio temporal al terminar")
+    parser.add_argument("--tam-bloque", type=int, default=8,
+                        help="Páginas por llamada a pdftoppm (la aplicación usa RASTER_TAM_BLOQUE)")
+    args = parser.parse_args()
+
+    carpeta = tempfile.mkdtemp(prefix="docengine_bench_")
+    try:
+        # Los print de las etapas (splitter, etc.) no interesan aquí
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            datos, informe = ejecutar(args.docs, carpeta, usar_ocr=False if args.sin_ocr else None,
+                                      tam_bloque=args.tam_bloque)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        print(f"Corpus: {datos['docs']} albaranes por tipo, proveedores: {', '.join(datos['proveedores'])} "
+              f"| OCR: {'sí (' + datos['motor_ocr'] + ')' if datos['ocr'] else 'no'} "
+              f"| páginas por llamada a pdftoppm: {datos['tam_bloque']}\n")
+        informe.imprimir()
+        if args.ruta_json:
+            with open(args.ruta_json, "w", encoding="utf-8") as f:
+                json.dump(datos, f, indent=2, ensure_ascii=False)
+    finally:
+        if args.conservar:
+            print(f"\nDirectorio conservado: {carpeta}")
+        else:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
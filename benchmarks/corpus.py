@@ -0,0 +1,197 @@
+"""
+Corpus sintético de albaranes para los benchmarks (sin dependencias externas
+salvo Pillow para las versiones escaneadas).
+
+    python -m benchmarks.corpus --destino /tmp/corpus --docs 20
+
+Cada albarán lleva la firma de un proveedor de data/proveedores.json y un
+Nº de documento + fecha con el formato que esperan sus patrones. Solo se usan
+los proveedores para los que alguna plantilla se clasifica bien con
+analizar_documento, así el corpus sigue valiendo si cambian las reglas.
+
+Genera cuatro tipos de PDF:
+  - digital_simple/  un albarán por archivo, con texto nativo
+  - digital_lote/    lotes multi-proveedor (varios albaranes seguidos)
+  - imagen_simple/   como digital_simple, pero la página es solo una imagen
+  - imagen_lote/     como digital_lote, escaneado
+"""
+import argparse
+import json
+import os
+import random
+from app.config import PROVIDERS_JSON_PATH
+from app.core.parser import analizar_documento
+
+# Plantillas de cabecera. La primera que el parser clasifica entera
+# (proveedor + Nº documento + fecha) es la que se usa para ese proveedor.
+PLANTILLAS_CABECERA = [
+    "{firma}\nALBARAN\nFecha {fecha} {n7}",
+    "{firma}\nALBARAN\n{fecha} {aa}AL{n6}",
+    "{firma}\nPedido: {n7}\nFecha: {fecha_corta}",
+    "{firma}\nAlbaran {n10}\nFecha {fecha}",
+    "{firma}\nAlbaran {n8}\nFecha {fecha}",
+]
+
+ARTICULOS = ["Tornillo M8x20", "Arandela plana", "Filtro aceite", "Junta culata", "Rodamiento 6204",
+             "Manguito radiador", "Correa auxiliar", "Lampara H7", "Pastilla freno", "Abrazadera"]
+
+LINEAS_POR_PAGINA = 30
+
+
+def cargar_firmas(ruta_json=PROVIDERS_JSON_PATH):
+    """{proveedor: firma legible} tal como aparece en el JSON (primera firma)."""
+    with open(ruta_json, "r", encoding="utf-8") as f:
+        datos = json.load(f)
+    return {nombre: regla["firma"][0] for nombre, regla in datos.items() if regla.get("firma")}
+
+
+def _valores(rnd):
+    dia, mes, anio = rnd.randint(1, 28), rnd.randint(1, 12), rnd.randint(2023, 2025)
+    return {
+        "fecha": f"{dia:02d}/{mes:02d}/{anio}",
+        "fecha_corta": f"{dia:02d}.{mes:02d}.{anio % 100:02d}",
+        "aa": f"{anio % 100:02d}",
+        "n6": f"{rnd.randint(0, 999999):06d}",
+        "n7": f"{rnd.randint(1000000, 9999999)}",
+        "n8": f"{rnd.randint(10000000, 99999999)}",
+        "n10": f"{rnd.randint(1000000000, 9999999999)}",
+    }
+
+
+def elegir_plantillas(firmas, semilla=0):
+    """{proveedor: plantilla} solo con los proveedores que se clasifican bien."""
+    rnd = random.Random(semilla)
+    elegidas = {}
+    for proveedor, firma in firmas.items():
+        for plantilla in PLANTILLAS_CABECERA:
+            texto = plantilla.format(firma=firma, **_valores(rnd))
+            datos = analizar_documento(texto)
+            if (datos.get("proveedor_detectado") == proveedor and datos.get("id_documento")
+                    and datos.get("fecha_documento")):
+                elegidas[proveedor] = plantilla
+                break
+    return elegidas
+
+
+def _lineas_relleno(rnd, n):
+    # Números cortos: no deben parecerse a ninguna firma ni Nº de documento
+    return [f"{rnd.randint(1, 999):03d} {rnd.choice(ARTICULOS)} x{rnd.randint(1, 50)} {rnd.randint(1, 99)},{rnd.randint(0, 99):02d}"
+            for _ in range(n)]
+
+
+def albaran(proveedor, firma, plantilla, rnd, paginas=1):
+    """Lista de textos de página de un albarán (la firma solo en la primera)."""
+    cabecera = plantilla.format(firma=firma, **_valores(rnd)).split("\n")
+    textos = ["\n".join(cabecera + _lineas_relleno(rnd, LINEAS_POR_PAGINA - len(cabecera)))]
+    for _ in range(paginas - 1):
+        textos.append("\n".join(["Continuacion"] + _lineas_relleno(rnd, LINEAS_POR_PAGINA - 1)))
+    return textos
+
+
+# --- ESCRITURA DE PDFs ---
+
+def _escapar(linea):
+    return linea.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_digital(paginas, ruta):
+    """PDF con texto nativo (Helvetica, A4) escrito a mano: sin librerías."""
+    objetos = [None, "<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    hijos = []
+    for texto in paginas:
+        id_pagina, id_contenido = len(objetos), len(objetos) + 1
+        lineas = " ".join(f"({_escapar(l)}) '" for l in texto.split("\n"))
+        stream = f"BT /F1 11 Tf 50 800 Td 14 TL {lineas} ET"
+        objetos.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {id_contenido} 0 R >>")
+        objetos.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        hijos.append(f"{id_pagina} 0 R")
+    objetos[2] = f"<< /Type /Pages /Kids [{' '.join(hijos)}] /Count {len(paginas)} >>"
+
+    contenido = b"%PDF-1.4\n"
+    posiciones = []
+    for i in range(1, len(objetos)):
+        posiciones.append(len(contenido))
+        contenido += f"{i} 0 obj\n{objetos[i]}\nendobj\n".encode("latin-1")
+    inicio_xref = len(contenido)
+    contenido += f"xref\n0 {len(objetos)}\n0000000000 65535 f \n".encode()
+    contenido += b"".join(f"{p:010d} 00000 n \n".encode() for p in posiciones)
+    contenido += f"trailer\n<< /Size {len(objetos)} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode()
+    with open(ruta, "wb") as f:
+        f.write(contenido)
+
+
+def pdf_imagen(paginas, ruta, dpi=150):
+    """PDF escaneado: cada página es solo una imagen (sin texto nativo)."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    ancho, alto = int(8.27 * dpi), int(11.69 * dpi)
+    fuente = ImageFont.load_default(size=max(10, dpi // 6))
+    imagenes = []
+    for texto in paginas:
+        img = Image.new("L", (ancho, alto), 255)
+        dibujo = ImageDraw.Draw(img)
+        y = dpi // 2
+        for linea in texto.split("\n"):
+            dibujo.text((dpi // 2, y), linea, fill=0, font=fuente)
+            y += dpi // 5
+        imagenes.append(img)
+    imagenes[0].save(ruta, "PDF", resolution=dpi, save_all=True, append_images=imagenes[1:])
+
+
+# --- CORPUS COMPLETO ---
+
+def generar_corpus(destino, docs=20, docs_por_lote=6, max_paginas=3, imagenes=True, semilla=0):
+    """
+    Crea el corpus en `destino` y retorna
+    {tipo: [rutas]} y el nº de páginas de cada tipo en "paginas".
+    """
+    rnd = random.Random(semilla)
+    firmas = cargar_firmas()
+    plantillas = elegir_plantillas(firmas, semilla)
+    if not plantillas:
+        raise RuntimeError("Ninguna plantilla encaja con las reglas de proveedores.json")
+    proveedores = sorted(plantillas)
+
+    def nuevo_albaran():
+        proveedor = rnd.choice(proveedores)
+        return albaran(proveedor, firmas[proveedor], plantillas[proveedor], rnd, rnd.randint(1, max_paginas))
+
+    simples = [nuevo_albaran() for _ in range(docs)]
+    lotes = []
+    for i in range(0, docs, docs_por_lote):
+        lotes.append([pagina for _ in range(min(docs_por_lote, docs - i)) for pagina in nuevo_albaran()])
+
+    tipos = {"digital_simple": (simples, pdf_digital), "digital_lote": (lotes, pdf_digital)}
+    if imagenes:
+        tipos.update({"imagen_simple": (simples, pdf_imagen), "imagen_lote": (lotes, pdf_imagen)})
+
+    corpus = {"paginas": {}, "proveedores": proveedores}
+    for tipo, (documentos, escribir) in tipos.items():
+        carpeta = os.path.join(destino, tipo)
+        os.makedirs(carpeta, exist_ok=True)
+        corpus[tipo] = []
+        for i, paginas in enumerate(documentos):
+            ruta = os.path.join(carpeta, f"{tipo}_{i:04d}.pdf")
+            escribir(paginas, ruta)
+            corpus[tipo].append(ruta)
+        corpus["paginas"][tipo] = sum(len(p) for p in documentos)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destino", required=True)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--sin-imagenes", action="store_true")
+    args = parser.parse_args()
+
+    corpus = generar_corpus(args.destino, docs=args.docs, imagenes=not args.sin_imagenes)
+    print(f"Proveedores: {', '.join(corpus['proveedores'])}")
+    for tipo, paginas in corpus["paginas"].items():
+        print(f"  {tipo:15s} {len(corpus[tipo]):4d} PDFs, {paginas:5d} páginas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import sys
 import subprocess
+import multiprocessing
 from app.gui.main_window import PDFClassifierApp
 
 # =========================================================================
@@ -32,5 +33,7 @@ if sys.platform.startswith("win"):
 # =========================================================================
 
 if __name__ == "__main__":
+    # Necesario en el .exe (PyInstaller) para que el pool de OCR pueda lanzar procesos
+    multiprocessing.freeze_support()
     app = PDFClassifierApp()
     app.mainloop()
\ No newline at end of file
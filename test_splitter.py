@@ -23,8 +23,12 @@ archivos = dividir_pdf_por_proveedor(PDF_MASIVO, CARPETA_TEMP)
 print("\n📦 --- RESULTADOS ---")
 if archivos:
     print(f"✅ Se han generado {len(archivos)} documentos individuales:")
-    for arch in archivos:
-        print(f"   📄 {arch}")
+    os.makedirs(CARPETA_TEMP, exist_ok=True)
+    for frag in archivos:
+        # Los fragmentos vienen en memoria: los escribimos para poder revisarlos
+        if not frag.ruta:
+            frag.escribir(os.path.join(CARPETA_TEMP, frag.nombre))
+        print(f"   📄 {frag.nombre} (págs {frag.pagina_inicio + 1}-{frag.pagina_fin + 1}, {frag.metodos})")
 
     print("\n💡 AHORA: Si esto fuera la app real, cada uno de estos archivos")
     print("   pasaría por el proceso normal de clasificación (Lectura -> Regex -> Mover).")
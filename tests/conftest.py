@@ -0,0 +1,49 @@
+import pytest
+
+import app.core.diario as diario
+import app.core.indice_salida as indice_salida
+import app.core.ocr_cache as ocr_cache
+import app.utils.historial as historial
+
+
+def _pdf_texto(paginas, ruta):
+    """PDF mínimo con una capa de texto por página (Helvetica, una línea por renglón)."""
+    objetos = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    hijos = []
+    for texto in paginas:
+        lineas = " ".join("(%s) '" % l for l in texto.split("\n"))
+        contenido = f"BT /F1 12 Tf 50 750 Td 14 TL {lineas} ET"
+        hijos.append(f"{len(objetos) + 1} 0 R")
+        objetos.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objetos) + 2} 0 R >>")
+        objetos.append(f"<< /Length {len(contenido)} >>\nstream\n{contenido}\nendstream")
+    objetos[1] = f"<< /Type /Pages /Kids [{' '.join(hijos)}] /Count {len(paginas)} >>"
+
+    datos, posiciones = b"%PDF-1.4\n", []
+    for n, objeto in enumerate(objetos, start=1):
+        posiciones.append(len(datos))
+        datos += f"{n} 0 obj\n{objeto}\nendobj\n".encode("latin-1")
+    xref = len(datos)
+    datos += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+    datos += b"".join(f"{p:010d} 00000 n \n".encode() for p in posiciones)
+    datos += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(ruta, "wb") as f:
+        f.write(datos)
+    return ruta
+
+
+@pytest.fixture
+def pdf_texto():
+    return _pdf_texto
+
+
+@pytest.fixture(autouse=True)
+def cache_aislada(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache, "_cache", ocr_cache.CacheOCR(str(tmp_path / "cache.sqlite")))
+
+
+@pytest.fixture
+def estado_aislado(tmp_path, monkeypatch):
+    monkeypatch.setattr(historial, "_historial", historial.HistorialProcesos(str(tmp_path / "historial.sqlite")))
+    monkeypatch.setattr(diario, "_diario", diario.DiarioProcesos(str(tmp_path / "diario.sqlite")))
+    monkeypatch.setattr(indice_salida, "_indice", indice_salida.IndiceSalida(str(tmp_path / "indice.sqlite")))
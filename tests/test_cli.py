@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from app import cli
+
+CABECERA_CBM = "CBM Iberica ESB85631083\nFecha 12/03/2025 1234560 albaran"
+
+
+@pytest.mark.parametrize("paginas, codigo", [
+    ([CABECERA_CBM], cli.SALIDA_OK),
+    (["Talleres Perez\nAlbaran 445566 del 03/02/2025"], cli.SALIDA_REVISION),  # Sin regla
+    ([""], cli.SALIDA_ERRORES),  # Sin texto y sin OCR
+])
+def test_codigo_de_salida(tmp_path, estado_aislado, pdf_texto, capsys, paginas, codigo):
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    pdf_texto(paginas, str(entrada / "scan.pdf"))
+
+    resultado = cli.main(["--entrada", str(entrada), "--salida", str(tmp_path / "salida"),
+                          "--informe", str(tmp_path / "informe.json"), "--silencioso"])
+
+    assert resultado == codigo
+    resumen = json.loads(capsys.readouterr().out)
+    assert resumen["errores"] == (codigo == cli.SALIDA_ERRORES)
+    assert resumen["revision"] == (codigo == cli.SALIDA_REVISION)
+
+
+def test_entrada_inexistente(tmp_path):
+    assert cli.main(["--entrada", str(tmp_path / "no_existe")]) == cli.SALIDA_ENTRADA
@@ -0,0 +1,46 @@
+import pytest
+from pypdf import PdfReader
+from pypdf._page import PageObject
+
+from app.core.pdf_processor import extraer_paginas_pdf, MODO_NATIVO
+from app.core.pipeline import PipelineLotes
+
+CABECERA_CBM = "CBM Iberica ESB85631083\nFecha 12/03/2025 1234560 albaran"
+
+
+@pytest.fixture
+def lecturas(monkeypatch):
+    """Cuántas veces se extrae el texto nativo de una página."""
+    contador = {"n": 0}
+    original = PageObject.extract_text
+
+    def contar(self, *args, **kwargs):
+        contador["n"] += 1
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(PageObject, "extract_text", contar)
+    return contador
+
+
+def test_pipeline_sin_dividir_deja_de_leer_al_completar(tmp_path, estado_aislado, lecturas, pdf_texto):
+    entrada = pdf_texto([CABECERA_CBM, "Linea 1 tornillos", "Linea 2 tuercas"], str(tmp_path / "scan.pdf"))
+    salida = tmp_path / "salida"
+
+    pipeline = PipelineLotes(str(salida), dividir=False, log=lambda mensaje: None, ruta_informe=None)
+    resumen = pipeline.ejecutar([entrada])
+
+    assert resumen["procesados"] == 1
+    assert resumen["rutas"]["nativo"] == 1 and resumen["rutas"]["omitida"] == 2
+    assert lecturas["n"] == 1  # Solo la primera página
+    guardado = salida / "CBM_Albaranes" / "2025-03-12_1234560.pdf"
+    assert len(PdfReader(str(guardado)).pages) == 3  # Las omitidas también se guardan
+
+
+def test_sin_completar_no_se_relee(tmp_path, lecturas, pdf_texto):
+    ruta = pdf_texto(["Hoja sin proveedor", "Otra hoja", "Y otra"], str(tmp_path / "suelto.pdf"))
+
+    paginas, error = extraer_paginas_pdf(ruta, modo=MODO_NATIVO, hasta_completar=True)
+
+    assert error is None
+    assert [metodo for _, metodo in paginas] == ["nativo"] * 3
+    assert lecturas["n"] == 3
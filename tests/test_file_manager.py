@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import pytest
+
+from app.core.file_manager import publicar_sin_pisar
+
+
+@pytest.fixture(params=["enlace", "sin_enlace"])
+def publicar(request, monkeypatch):
+    """Con enlaces duros y sin ellos (FAT, recursos SMB); en ningún caso se copia."""
+    if request.param == "sin_enlace":
+        def sin_enlaces(origen, destino):
+            raise PermissionError("enlaces no soportados")
+        monkeypatch.setattr(os, "link", sin_enlaces)
+
+    def sin_copias(*args, **kwargs):
+        raise AssertionError("el archivo se ha copiado en vez de moverse")
+    monkeypatch.setattr(shutil, "copy2", sin_copias)
+    return publicar_sin_pisar
+
+
+def test_publica_sin_copiar(tmp_path, publicar):
+    origen, destino = tmp_path / "doc.part", tmp_path / "doc.pdf"
+    origen.write_bytes(b"nuevo")
+
+    publicar(str(origen), str(destino))
+
+    assert destino.read_bytes() == b"nuevo" and not origen.exists()
+
+
+def test_no_pisa_un_archivo_existente(tmp_path, publicar):
+    origen, destino = tmp_path / "doc.part", tmp_path / "doc.pdf"
+    origen.write_bytes(b"nuevo")
+    destino.write_bytes(b"original")
+
+    with pytest.raises(FileExistsError):
+        publicar(str(origen), str(destino))
+
+    assert destino.read_bytes() == b"original" and origen.read_bytes() == b"nuevo"
@@ -0,0 +1,14 @@
+from app.utils.metrics import Metricas
+
+
+def test_el_desglose_por_documento_esta_acotado():
+    metricas = Metricas(max_documentos=3)
+    for n in range(5):
+        metricas.registrar("pipeline.division", 0.1, documento=f"doc{n}.pdf")
+    metricas.registrar("pipeline.escritura", 0.2, documento="doc2.pdf")  # Sigue en marcha
+    metricas.registrar("pipeline.division", 0.1, documento="doc5.pdf")
+
+    informe = metricas.informe()
+    assert list(informe["documentos"]) == ["doc4.pdf", "doc2.pdf", "doc5.pdf"]
+    assert informe["documentos_descartados"] == 3
+    assert informe["etapas"]["pipeline.division"]["n"] == 6  # Las etapas lo cuentan todo
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import app.core.pdf_processor as pp
+from app.config import OCR_ROI_CABECERA
+from app.core.ocr_engine import motor_ocr
+from app.core.rule_engine import obtener_motor
+from app.utils.metrics import span, documento, iniciar_ejecucion, terminar_ejecucion
+
+# El OCR falso se hereda en los workers al hacer fork
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                                reason="los workers solo heredan el OCR falso con fork")
+
+
+def _identidad_worker(img, parametros, conocidas):
+    """Sustituye a ocr_por_regiones: en vez de texto, qué proceso y qué motor la leyó."""
+    time.sleep(0.02)
+    return f"{os.getpid()}:{id(motor_ocr())}", {}, 1.0
+
+
+@pytest.fixture
+def pool_limpio(monkeypatch):
+    pp._descartar_pool()
+    monkeypatch.setattr(pp, "OCR_WORKERS", 2)
+    monkeypatch.setattr(pp, "ocr_por_regiones", _identidad_worker)
+    yield
+    pp._descartar_pool()
+
+
+def _paginas(n):
+    return lambda: ((i, {}) for i in range(n))
+
+
+def _identidades(resultados):
+    return dict(texto.split(":") for texto, _, _ in resultados)
+
+
+def test_workers_y_motor_se_reutilizan_entre_llamadas(pool_limpio):
+    primera = _identidades(pp._ocr_paginas(_paginas(3), 3, workers=3))
+    pool = pp._pool
+    segunda = _identidades(pp._ocr_paginas(_paginas(8), 8, workers=8))
+
+    assert pp._pool is pool
+    comunes = primera.keys() & segunda.keys()
+    assert comunes  # Los mismos procesos...
+    assert all(primera[pid] == segunda[pid] for pid in comunes)  # ...con el mismo motor
+    assert len(primera.keys() | segunda.keys()) <= pp.OCR_WORKERS
+
+
+def _ocr_con_span(img, parametros, conocidas):
+    with span("ocr.tesseract"):
+        time.sleep(0.01)
+    return "texto", {}, 1.0
+
+
+def test_tiempos_de_los_workers_llegan_al_informe(pool_limpio, monkeypatch):
+    monkeypatch.setattr(pp, "ocr_por_regiones", _ocr_con_span)
+    metricas = iniciar_ejecucion()
+    try:
+        with documento("lote.pdf"):
+            resultados = pp._ocr_paginas(_paginas(4), 4, workers=2)
+    finally:
+        terminar_ejecucion(metricas)
+
+    assert resultados == [("texto", {}, 1.0)] * 4
+    informe = metricas.informe()
+    assert informe["etapas"]["ocr.tesseract"]["n"] == 4
+    assert informe["documentos"]["lote.pdf"]["ocr.tesseract"] >= 0.04
+
+
+def _ocr_con_pagina_rota(img, parametros, conocidas):
+    """Lee la cabecera (el texto) y el resto de la página (vacío), salvo la página 2, que revienta."""
+    if img == 2:
+        raise ValueError("página rota")
+    return f"texto {img}\n", {(0.0, OCR_ROI_CABECERA): f"texto {img}", (OCR_ROI_CABECERA, 1.0): ""}, 1.0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_una_pagina_rota_no_tira_el_resto(pool_limpio, monkeypatch, workers):
+    monkeypatch.setattr(pp, "ocr_por_regiones", _ocr_con_pagina_rota)
+    monkeypatch.setattr(pp, "_imagenes", lambda ruta, paginas, *args: iter(paginas))
+    cache = pp.obtener_cache()
+    huellas = [f"huella{i}" for i in range(4)]
+
+    primera = pp._ocr_pasada("lote.pdf", workers, range(4), pp.PARAMETROS_OCR, cache, huellas, 1)
+    segunda = pp._ocr_pasada("lote.pdf", workers, range(4), pp.PARAMETROS_OCR, cache, huellas, 1)
+
+    assert [primera[i] for i in range(4)] == [("texto 0\n", "ocr"), ("texto 1\n", "ocr"), ("", "error"),
+                                              ("texto 3\n", "ocr")]
+    # Las buenas quedaron en la caché; la rota se vuelve a intentar
+    assert [metodo for _, metodo in (segunda[i] for i in range(4))] == ["cache", "cache", "error", "cache"]
+
+
+def test_si_falla_el_rasterizado_se_conserva_lo_ya_leido(pool_limpio, monkeypatch):
+    def imagenes(ruta, paginas, *args):
+        yield from paginas[:2]
+        raise RuntimeError("pdftoppm ha muerto")
+
+    monkeypatch.setattr(pp, "ocr_por_regiones", _ocr_con_pagina_rota)
+    monkeypatch.setattr(pp, "_imagenes", imagenes)
+
+    leidas = pp._ocr_pasada("lote.pdf", 2, range(4), pp.PARAMETROS_OCR, None, None, 1)
+
+    assert [leidas[i] for i in range(4)] == [("texto 0\n", "ocr"), ("texto 1\n", "ocr"), ("", "error"), ("", "error")]
+
+
+def _reglas_en_worker(img, parametros, conocidas):
+    return ",".join(obtener_motor().reglas()), {}, 1.0
+
+
+def test_workers_no_heredan_el_lock_de_las_reglas_cogido(pool_limpio, monkeypatch):
+    monkeypatch.setattr(pp, "ocr_por_regiones", _reglas_en_worker)
+    motor = obtener_motor()
+    motor.invalidar()  # El worker tendrá que comprobar proveedores.json
+    with motor._lock:  # Un hilo recargando las reglas justo cuando se crea el pool
+        resultados = pp._ocr_paginas(_paginas(2), 2, workers=2)
+
+    assert [texto for texto, _, _ in resultados] == [",".join(motor.reglas())] * 2
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import app.core.rule_engine as rule_engine
+from app.core.pipeline import PipelineLotes
+
+TALLER = {"TALLERES_PEREZ": {
+    "firma": ["Talleres Perez"],
+    "patron_documento": "Albaran (\\d{6})",
+    "patron_fecha": "(\\d{2}/\\d{2}/\\d{4})",
+    "carpeta_destino": "Perez_Albaranes"
+}}
+
+
+@pytest.fixture
+def reglas(tmp_path, monkeypatch):
+    """proveedores.json propio (vacío al empezar); devuelve cómo escribirlo."""
+    ruta = tmp_path / "proveedores.json"
+    ruta.write_text("{}", encoding="utf-8")
+    monkeypatch.setattr(rule_engine, "_motor", rule_engine.MotorReglas(str(ruta), intervalo=0))
+
+    def escribir(datos):
+        ruta.write_text(json.dumps(datos), encoding="utf-8")
+        rule_engine.obtener_motor().comprobar_cambios(forzar=True)
+
+    return escribir
+
+
+def _ejecutar(entrada, salida):
+    pipeline = PipelineLotes(str(salida), log=lambda mensaje: None, ruta_informe=None)
+    return pipeline.ejecutar([entrada])
+
+
+def test_lo_que_va_a_revision_se_reclasifica_al_anadir_la_regla(tmp_path, estado_aislado, reglas, pdf_texto):
+    entrada = pdf_texto(["Talleres Perez\nAlbaran 445566 del 03/02/2025"], str(tmp_path / "lote.pdf"))
+    salida = tmp_path / "salida"
+
+    primera = _ejecutar(entrada, salida)
+    revision = list((salida / "Revision_Manual").iterdir())
+    assert primera["procesados"] == 1 and len(revision) == 1
+
+    # Sin regla nueva, sigue esperando en revisión (sin copias _DUPLICADO_n)
+    segunda = _ejecutar(entrada, salida)
+    assert segunda["omitidos"] == 1 and segunda["procesados"] == 0
+    assert list((salida / "Revision_Manual").iterdir()) == revision
+
+    reglas(TALLER)
+    tercera = _ejecutar(entrada, salida)
+    assert tercera["procesados"] == 1
+    assert [p.name for p in (salida / "Perez_Albaranes").iterdir()] == ["2025-02-03_445566.pdf"]
+    assert not list((salida / "Revision_Manual").iterdir())
+
+    # Ya clasificado: ahora sí está terminado
+    cuarta = _ejecutar(entrada, salida)
+    assert cuarta["omitidos"] == 1 and cuarta["procesados"] == 0
@@ -0,0 +1,29 @@
+from app.core.vigilante import VigilanteCarpeta
+
+
+def _pendientes(vigilante):
+    rutas = []
+    while not vigilante._cola.empty():
+        rutas.append(vigilante._cola.get_nowait())
+    return rutas
+
+
+def test_lo_entregado_se_olvida_al_salir_de_la_carpeta(tmp_path):
+    vigilante = VigilanteCarpeta(str(tmp_path), espera=0, log=lambda mensaje: None)
+    pdf = tmp_path / "scan.pdf"
+    pdf.write_bytes(b"%PDF-1.4 uno")
+
+    vigilante._releer_carpeta()
+    vigilante._entregar_estables()
+    vigilante._releer_carpeta()
+    vigilante._entregar_estables()
+    assert _pendientes(vigilante) == [str(pdf)]  # Una sola vez
+
+    pdf.unlink()
+    vigilante._releer_carpeta()
+    assert not vigilante._entregados and not vigilante._candidatos
+
+    pdf.write_bytes(b"%PDF-1.4 otro escaneo")
+    vigilante._releer_carpeta()
+    vigilante._entregar_estables()
+    assert _pendientes(vigilante) == [str(pdf)]